@@ -1,74 +1,142 @@
-from flask import Flask, render_template, jsonify
-from flask_sqlalchemy import SQLAlchemy
-from flask_cors import CORS
-from flask_socketio import SocketIO
-from backend.routes import blueprints
-from flask_jwt_extended import JWTManager
-import os
-import dotenv
-from backend.models import db
-from backend.config import JWT_SECRET_KEY, SECRET_KEY
-from backend.socketio_instance import socketio
-
-dotenv.load_dotenv()
-CONNECTION_STRING = os.getenv('CONNECTION_STRING')
-FRONTEND_ORIGIN = os.getenv('FRONTEND_ORIGIN')
-BACKEND_DEPLOYMENT = os.getenv('BACKEND_DEPLOYMENT')
-
-def create_app():
-    app = Flask(__name__, template_folder="../frontend/")
-    CORS(app, supports_credentials=True, origins=[FRONTEND_ORIGIN, BACKEND_DEPLOYMENT], methods=['GET','POST','PUT','DELETE','OPTIONS'],
-        allow_headers=['Content-Type', 'Authorization'])
-    JWTManager(app)
-
-    app.config["SQLALCHEMY_DATABASE_URI"] = CONNECTION_STRING
-    app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
-    # Not sure why I had to enable jwt stuff with app.config (I thought that was what config file was for), but here we are
-    app.config["JWT_SECRET_KEY"] = JWT_SECRET_KEY
-    app.config["SECRET_KEY"] = SECRET_KEY
-    app.config["JWT_TOKEN_LOCATION"] = ["headers", "cookies"]
-    app.config["JWT_ACCESS_COOKIE_NAME"] = "access_token"
-
-    db.init_app(app)
-    
-    # Register all blueprints
-    for blueprint in blueprints:
-        app.register_blueprint(blueprint)
-
-    # @app.route("/")
-    # def hello():
-    #     return jsonify({"msg": "backend is running"}), 200
-    
-    '''
-    FRONTEND IS SERVING THE PAGES, 
-    SO WE ARE NOT USING FLASK'S RENDER_TEMPLATE
-    FOR THESE ROUTES ANYMORE
-    '''
-
-    # @app.route("/admin")
-    # def admin():
-    #     return render_template("admin.html")
-    
-    # @app.route("/view-credentials")
-    # def view_credentials():
-    #     return render_template("view-credentials.html")
-
-    # @app.route("/register-issuer")
-    # def register_issuer():
-    #     return render_template("register-issuer.html")
-    
-    # @app.route("/admin-multi_sig")
-    # def admine_multi():
-    #     return render_template("admin-multi.html")
-
-    return app
-
-if __name__ == "__main__":
-    app = create_app()
-    socketio.init_app(app)
-
-    #use the $PORT environment variable provided by Heroku
-    port = int(os.environ.get("PORT", 5000))
-    socketio.run(app, host="0.0.0.0", port=port) 
-    #no longer using app.run() since socketio is handling the server
+from flask import Flask, render_template, jsonify
+from flask_sqlalchemy import SQLAlchemy
+from flask_cors import CORS
+from flask_socketio import SocketIO
+from backend.routes import blueprints
+import os
+import sys
+import dotenv
+from backend.models import db
+from backend.config import JWT_SECRET_KEY, SECRET_KEY, DB_POOL_MAX_SIZE, DB_POOL_TIMEOUT, DB_POOL_HEALTH_CHECK_AFTER, CHAIN_POLL_INTERVAL, BLOCK_POLL_INTERVAL, DB_AUTO_MIGRATE, SOCKETIO_MESSAGE_QUEUE
+from backend.classes.connection_pool import db_pool
+from backend.classes.credential_cache import credential_cache
+from backend.classes.issuance_queue import issuance_queue
+from backend.classes.issue_verification import issuer_verification
+from backend.classes.block_tracker import block_tracker
+from backend.classes.rpc_provider import PooledHTTPProvider
+from backend.classes.password_hasher import password_hasher
+from backend.classes.jwt_cache import CachingJWTManager
+from backend.classes.migrations import schema_migrator
+from backend.classes.pg_pubsub import PostgresManager
+from backend.socketio_instance import socketio
+
+dotenv.load_dotenv()
+CONNECTION_STRING = os.getenv('CONNECTION_STRING')
+FRONTEND_ORIGIN = os.getenv('FRONTEND_ORIGIN')
+BACKEND_DEPLOYMENT = os.getenv('BACKEND_DEPLOYMENT')
+
+# Background tasks run once per process, however many apps create_app builds
+_background_started = False
+
+def create_app(background_tasks=True):
+    """
+    Build the app and attach Socket.IO to it.
+
+    Args:
+        background_tasks (bool): Also start this process's background tasks
+            (see start_background_tasks); leave them off to start them later
+    """
+    app = Flask(__name__, template_folder="../frontend/")
+    CORS(app, supports_credentials=True, origins=[FRONTEND_ORIGIN, BACKEND_DEPLOYMENT], methods=['GET','POST','PUT','DELETE','OPTIONS'],
+        allow_headers=['Content-Type', 'Authorization'])
+    # Verified tokens are cached until they expire, see jwt_cache
+    CachingJWTManager(app)
+
+    app.config["SQLALCHEMY_DATABASE_URI"] = CONNECTION_STRING
+    app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+    # Not sure why I had to enable jwt stuff with app.config (I thought that was what config file was for), but here we are
+    app.config["JWT_SECRET_KEY"] = JWT_SECRET_KEY
+    app.config["SECRET_KEY"] = SECRET_KEY
+    app.config["JWT_TOKEN_LOCATION"] = ["headers", "cookies"]
+    app.config["JWT_ACCESS_COOKIE_NAME"] = "access_token"
+
+    app.config["DB_POOL_MAX_SIZE"] = DB_POOL_MAX_SIZE
+    app.config["DB_POOL_TIMEOUT"] = DB_POOL_TIMEOUT
+    app.config["DB_POOL_HEALTH_CHECK_AFTER"] = DB_POOL_HEALTH_CHECK_AFTER
+
+    db.init_app(app)
+    db_pool.init_app(app)
+    PooledHTTPProvider.init_app(app)
+    password_hasher.init_app(app)
+    
+    # Register all blueprints
+    for blueprint in blueprints:
+        app.register_blueprint(blueprint)
+
+    # Share emits with the other workers' clients, see SOCKETIO_MESSAGE_QUEUE
+    if SOCKETIO_MESSAGE_QUEUE.startswith('postgres'):
+        dsn = SOCKETIO_MESSAGE_QUEUE if '://' in SOCKETIO_MESSAGE_QUEUE else CONNECTION_STRING
+        socketio.init_app(app, client_manager=PostgresManager(dsn))
+    elif SOCKETIO_MESSAGE_QUEUE:
+        socketio.init_app(app, message_queue=SOCKETIO_MESSAGE_QUEUE)
+    else:
+        socketio.init_app(app)
+    if background_tasks:
+        start_background_tasks()
+
+    # @app.route("/")
+    # def hello():
+    #     return jsonify({"msg": "backend is running"}), 200
+    
+    '''
+    FRONTEND IS SERVING THE PAGES, 
+    SO WE ARE NOT USING FLASK'S RENDER_TEMPLATE
+    FOR THESE ROUTES ANYMORE
+    '''
+
+    # @app.route("/admin")
+    # def admin():
+    #     return render_template("admin.html")
+    
+    # @app.route("/view-credentials")
+    # def view_credentials():
+    #     return render_template("view-credentials.html")
+
+    # @app.route("/register-issuer")
+    # def register_issuer():
+    #     return render_template("register-issuer.html")
+    
+    # @app.route("/admin-multi_sig")
+    # def admine_multi():
+    #     return render_template("admin-multi.html")
+
+    return app
+
+def start_background_tasks():
+    """
+    Start the tasks every serving process needs, on the socketio async mode.
+    create_app calls this, so it runs under gunicorn as well as app.py;
+    later calls in the same process do nothing.
+    """
+    global _background_started
+    if _background_started:
+        return
+    _background_started = True
+    # Keep the latest block header in memory for issuance, fees and the watchers
+    socketio.start_background_task(block_tracker.watch, BLOCK_POLL_INTERVAL)
+    # Keep the holder credential cache current from CredentialStored logs
+    socketio.start_background_task(credential_cache.watch, CHAIN_POLL_INTERVAL)
+    # Send issued credentials and track their receipts off the request path
+    issuance_queue.start(socketio)
+    # Keep the cached issuer tree in step with the other workers' writes
+    socketio.start_background_task(issuer_verification.watch, CONNECTION_STRING)
+
+if __name__ == "__main__":
+    # The tasks start once the schema is up to date
+    app = create_app(background_tasks=False)
+    # The routes rely on the indexes and tables the migrations add (ON CONFLICT
+    # on lower(id) needs one), don't serve on an older schema
+    try:
+        if DB_AUTO_MIGRATE:
+            schema_migrator.migrate()
+        schema_migrator.require_current()
+    except Exception as e:
+        print(f"Error while applying schema migrations: {e}")
+        sys.exit(1)
+    start_background_tasks()
+
+    #use the $PORT environment variable provided by Heroku
+    port = int(os.environ.get("PORT", 5000))
+    socketio.run(app, host="0.0.0.0", port=port) 
+    #no longer using app.run() since socketio is handling the server
     #app.run(debug=True, port=5000)
\ No newline at end of file
@@ -0,0 +1,158 @@
+import functools
+from eth_abi.abi import default_codec
+from eth_abi.decoding import TupleDecoder
+from eth_abi.encoding import TupleEncoder
+from eth_utils import function_abi_to_4byte_selector, to_checksum_address
+from eth_utils.abi import collapse_if_tuple
+from backend.classes.rpc_provider import RPCError
+
+
+# The same issuers and holders come back over and over, checksumming is a keccak each
+_checksum = functools.lru_cache(maxsize=4096)(to_checksum_address)
+
+
+def _normalizer(abi_type):
+    """
+    Function that turns a decoded value of `abi_type` into what web3 returns
+    (checksummed addresses), or None when the value needs no change.
+    """
+    if abi_type.endswith(']'):
+        item = _normalizer(abi_type[:abi_type.rindex('[')])
+        return (lambda values: [item(value) for value in values]) if item else None
+    if abi_type.startswith('('):
+        items = [_normalizer(component) for component in _split_tuple(abi_type)]
+        if not any(items):
+            return None
+        return lambda values: tuple(item(value) if item else value for item, value in zip(items, values))
+    if abi_type == 'address':
+        return _checksum
+    return None
+
+
+def _split_tuple(abi_type):
+    """'(bytes32,(address,uint256)[],string)' -> ['bytes32', '(address,uint256)[]', 'string']"""
+    components = []
+    depth = 0
+    start = 1
+    for i, char in enumerate(abi_type[1:abi_type.rindex(')')], start=1):
+        if char == '(':
+            depth += 1
+        elif char == ')':
+            depth -= 1
+        elif char == ',' and depth == 0:
+            components.append(abi_type[start:i])
+            start = i + 1
+    components.append(abi_type[start:abi_type.rindex(')')])
+    return components
+
+
+class FunctionCodec:
+    """
+    Calldata encoder and return data decoder for one contract function.
+
+    `contract.functions.X(...)` looks the function up in the ABI, validates
+    and normalises the arguments and builds the type encoders again on every
+    call. Here all of that is done once: the selector, the tuple encoder of
+    the inputs and the decoder of the outputs are built on first use and
+    reused, so a hot call goes straight from Python values to calldata and
+    from return data to Python values. Arguments aren't validated, callers
+    pass what the ABI expects (bytes for bytesN, checksum addresses...).
+    """
+
+    def __init__(self, contract, abi, name):
+        entries = [entry for entry in abi if entry.get('type') == 'function' and entry['name'] == name]
+        if len(entries) != 1:
+            raise ValueError(f"Expected one ABI entry for {name}, found {len(entries)}")
+        self.contract = contract
+        self.abi = entries[0]
+        self.name = name
+        self.input_types = [collapse_if_tuple(arg) for arg in self.abi['inputs']]
+        self.output_types = [collapse_if_tuple(arg) for arg in self.abi['outputs']]
+        self.selector = None
+
+    def _compile(self):
+        registry = default_codec._registry
+        self.encoder = TupleEncoder(encoders=[registry.get_encoder(t) for t in self.input_types])
+        self.decoder = TupleDecoder(decoders=[registry.get_decoder(t) for t in self.output_types])
+        self.normalizers = [_normalizer(t) for t in self.output_types]
+        self.selector = function_abi_to_4byte_selector(self.abi)
+
+    def encode(self, *args):
+        """Calldata (selector + encoded arguments) for a call with `args`"""
+        if self.selector is None:
+            self._compile()
+        return self.selector + self.encoder(args)
+
+    def decode(self, data):
+        """
+        Decode return data like web3 does.
+        Returns:
+            The single return value, or a tuple when the function has several
+        """
+        if self.selector is None:
+            self._compile()
+        values = self.decoder(default_codec.stream_class(bytes(data)))
+        values = [normalize(value) if normalize else value for normalize, value in zip(self.normalizers, values)]
+        return values[0] if len(values) == 1 else tuple(values)
+
+    def __call__(self, *args):
+        return PreparedCall(self, self.encode(*args))
+
+
+class PreparedCall:
+    """
+    An encoded contract call. It has the parts of web3's ContractFunction the
+    backend uses (call, estimate_gas, build_transaction), so it can be passed
+    to the fee oracle and the nonce manager as is.
+    """
+
+    def __init__(self, codec, data):
+        self.codec = codec
+        self.data = data
+
+    def _transaction(self, transaction):
+        return dict(transaction or {}, to=self.codec.contract.address, data=self.data)
+
+    def call(self, transaction=None, block_identifier='latest'):
+        """
+        eth_call the function and decode what it returns.
+
+        The request goes to the provider as is: the calldata is final, so
+        web3's middleware and request/result formatters have nothing to do
+        (they were most of the cost of a call).
+
+        Raises:
+            RPCError: If the node returns an error (e.g. the call reverted)
+        """
+        tx = {'to': self.codec.contract.address, 'data': '0x' + self.data.hex()}
+        if transaction and 'from' in transaction:
+            tx['from'] = transaction['from']
+        if isinstance(block_identifier, int):
+            block_identifier = hex(block_identifier)
+        response = self.codec.contract.w3.provider.make_request('eth_call', [tx, block_identifier])
+        if 'error' in response:
+            raise RPCError(response['error'])
+        return self.codec.decode(bytes.fromhex(response['result'][2:]))
+
+    def estimate_gas(self, transaction=None):
+        return self.codec.contract.w3.eth.estimate_gas(self._transaction(transaction))
+
+    def build_transaction(self, transaction):
+        """The transaction dict to sign, `transaction` has to carry gas, fees and nonce"""
+        return dict(self._transaction(transaction), value=transaction.get('value', 0))
+
+
+class ContractCodec:
+    """
+    Precompiled codecs for a contract's hot functions, used like
+    `contract.functions`: `codec.verifyCredential(hash).call()`.
+    """
+
+    def __init__(self, contract, abi, names):
+        self.codecs = {name: FunctionCodec(contract, abi, name) for name in names}
+
+    def __getattr__(self, name):
+        codecs = self.__dict__.get('codecs', {})
+        if name not in codecs:
+            raise AttributeError(f"No precompiled codec for {name}")
+        return codecs[name]
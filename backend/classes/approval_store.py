@@ -0,0 +1,212 @@
+import threading
+import time
+from backend.config import MULTISIG_CACHE_TTL, MULTISIG_CLAIM_TIMEOUT
+from backend.classes.connection_pool import db_pool
+
+# Pending roots and both results in one round trip
+SNAPSHOT = """
+    SELECT 'pending', merkle_root, first_admin FROM multisig_pending
+    UNION ALL
+    SELECT name, merkle_root, transaction_hash FROM multisig_results
+"""
+
+# Only one worker gets to send a root's transaction: the row is claimed for
+# it, and a claim left behind by a worker that died before sending expires
+CLAIM = """
+    UPDATE multisig_pending SET claimed_at = now()
+    WHERE merkle_root = %s AND first_admin <> %s AND transaction_hash IS NULL
+      AND (claimed_at IS NULL OR claimed_at < now() - %s * interval '1 second')
+    RETURNING first_admin
+"""
+
+SAVE_RESULT = """
+    INSERT INTO multisig_results (name, merkle_root, transaction_hash) VALUES (%s, %s, %s)
+    ON CONFLICT (name) DO UPDATE SET merkle_root = EXCLUDED.merkle_root,
+        transaction_hash = EXCLUDED.transaction_hash, updated_at = now()
+"""
+
+# What record_signature tells the route
+FIRST = 'first'
+READY = 'ready'
+SAME_ADMIN = 'same_admin'
+IN_PROGRESS = 'in_progress'
+SUBMITTED = 'submitted'
+
+
+class ApprovalStore:
+    """
+    Multi-sig Merkle root approvals in Postgres, shared by all the workers.
+
+    The first admin's signature for a root is stored until a second admin
+    signs it; that second signature claims the root so exactly one worker
+    sends the update. Once sent, the transaction hash is stored with the
+    claim, which then only ends by completing (recording the result and
+    dropping the pending row in one transaction) or by releasing it when
+    the transaction was dropped. Decisions always go to the database.
+
+    Reads for the polling routes (pending roots, last updates) are served
+    from an in-process snapshot for `ttl` seconds. A worker's own writes
+    refresh it right away; changes made by other workers show up within
+    `ttl`, and clients are pushed the pending_updates and
+    merkle_root_updated events through the Socket.IO message queue anyway.
+    """
+
+    def __init__(self, ttl=MULTISIG_CACHE_TTL, claim_timeout=MULTISIG_CLAIM_TIMEOUT):
+        self.ttl = ttl
+        self.claim_timeout = claim_timeout
+        self.lock = threading.Lock()
+        self.snapshot = None
+        self.expires = 0
+        self.metrics = {
+            'hits': 0,
+            'misses': 0
+        }
+
+    def _read(self):
+        with self.lock:
+            if self.snapshot is not None and time.monotonic() < self.expires:
+                self.metrics['hits'] += 1
+                return self.snapshot
+            self.metrics['misses'] += 1
+
+        with db_pool.connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(SNAPSHOT)
+                rows = cur.fetchall()
+        snapshot = {'pending': [], 'last_successful_update': None, 'last_update': None}
+        for kind, merkle_root, value in rows:
+            if kind == 'pending':
+                snapshot['pending'].append({'merkleRoot': merkle_root, 'firstAdmin': value})
+            else:
+                snapshot[kind] = {'merkleRoot': merkle_root, 'transactionHash': value}
+        snapshot['pending'].sort(key=lambda pending: pending['merkleRoot'])
+
+        with self.lock:
+            self.snapshot = snapshot
+            self.expires = time.monotonic() + self.ttl
+        return snapshot
+
+    def invalidate(self):
+        with self.lock:
+            self.snapshot = None
+
+    def pending(self):
+        """
+        Roots waiting for a second signature.
+        Returns:
+            list: {'merkleRoot', 'firstAdmin'} dicts
+        """
+        return list(self._read()['pending'])
+
+    def last_successful_update(self):
+        """The {'merkleRoot', 'transactionHash'} of the last update, cleared by the next first signature"""
+        return self._read()['last_successful_update']
+
+    def last_update(self):
+        """The {'merkleRoot', 'transactionHash'} of the last update, until clear_last_update"""
+        return self._read()['last_update']
+
+    def record_signature(self, merkle_root, admin_address, signature):
+        """
+        Record an admin's (already verified) signature for a root.
+
+        Args:
+            merkle_root (str): The hex root being approved
+            admin_address (str): The lowercase admin address
+            signature (str): The admin's signature
+
+        Returns:
+            tuple: (status, transaction hash). The status is FIRST when it's
+            the first signature (stored, and the last successful update
+            cleared), READY when it's a second admin's and the caller must now
+            send the update, then call mark_sent() and complete(), or release()
+            if nothing was sent, SAME_ADMIN when the first admin signed again,
+            SUBMITTED when the update was already sent (the hash comes with
+            it) but isn't known to be mined, or IN_PROGRESS when another
+            worker is sending it
+        """
+        try:
+            with db_pool.connection() as conn:
+                with conn.cursor() as cur:
+                    cur.execute("""
+                        INSERT INTO multisig_pending (merkle_root, first_admin, first_signature) VALUES (%s, %s, %s)
+                        ON CONFLICT DO NOTHING
+                        RETURNING merkle_root
+                        """,
+                        (merkle_root, admin_address, signature)
+                    )
+                    if cur.fetchone() is not None:
+                        cur.execute("DELETE FROM multisig_results WHERE name = 'last_successful_update'")
+                        return FIRST, None
+
+                    cur.execute(CLAIM, (merkle_root, admin_address, self.claim_timeout))
+                    if cur.fetchone() is not None:
+                        return READY, None
+
+                    cur.execute("SELECT first_admin, transaction_hash FROM multisig_pending WHERE merkle_root = %s",
+                                (merkle_root,))
+                    row = cur.fetchone()
+                    if row is not None and row[0] == admin_address:
+                        return SAME_ADMIN, None
+                    if row is not None and row[1] is not None:
+                        return SUBMITTED, row[1]
+                    # Claimed by another worker, or it completed since the insert
+                    return IN_PROGRESS, None
+        finally:
+            self.invalidate()
+
+    def mark_sent(self, merkle_root, transaction_hash):
+        """Record the transaction sent for a READY claim, the claim no longer expires"""
+        with db_pool.connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute("UPDATE multisig_pending SET transaction_hash = %s WHERE merkle_root = %s",
+                            (transaction_hash, merkle_root))
+        self.invalidate()
+
+    def release(self, merkle_root):
+        """
+        Give up a claim so a signature can retry the root: nothing was sent,
+        or the transaction sent was dropped or reverted
+        """
+        with db_pool.connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute("UPDATE multisig_pending SET claimed_at = NULL, transaction_hash = NULL WHERE merkle_root = %s",
+                            (merkle_root,))
+        self.invalidate()
+
+    def complete(self, merkle_root, transaction_hash):
+        """
+        Record the mined update and drop its pending row.
+        Returns:
+            dict: The {'merkleRoot', 'transactionHash'} result
+        """
+        with db_pool.connection() as conn:
+            with conn.cursor() as cur:
+                for name in ('last_successful_update', 'last_update'):
+                    cur.execute(SAVE_RESULT, (name, merkle_root, transaction_hash))
+                cur.execute("DELETE FROM multisig_pending WHERE merkle_root = %s", (merkle_root,))
+        self.invalidate()
+        return {'merkleRoot': merkle_root, 'transactionHash': transaction_hash}
+
+    def clear_last_update(self):
+        """
+        Forget the last update.
+        Returns:
+            bool: Whether there was one
+        """
+        with db_pool.connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute("DELETE FROM multisig_results WHERE name = 'last_update' RETURNING name")
+                cleared = cur.fetchone() is not None
+        self.invalidate()
+        return cleared
+
+    def stats(self):
+        with self.lock:
+            stats = dict(self.metrics)
+            stats['ttl'] = self.ttl
+            return stats
+
+
+# Shared instance used by the multi-sig routes
+approval_store = ApprovalStore()
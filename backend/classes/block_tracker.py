@@ -0,0 +1,135 @@
+import threading
+import time
+from backend.config import w3, BLOCK_HEAD_MAX_AGE
+
+
+class BlockTracker:
+    """
+    Keeps the latest block header in memory for everything that needs "now".
+
+    A background task polls eth_blockNumber and only fetches the header
+    when the number moves. Readers get the cached head as long as it was
+    confirmed within `max_age` seconds; past that (e.g. the poller isn't
+    running, as in scripts) they read the chain themselves. Every read is
+    counted per consumer so the metrics show how many RPC calls the cache
+    saved.
+    """
+
+    def __init__(self, max_age=BLOCK_HEAD_MAX_AGE):
+        self.max_age = max_age
+        self.lock = threading.Lock()
+        self.current = None
+        self.checked_at = 0
+        self.metrics = {
+            'polls': 0,
+            'headerFetches': 0,
+            'pollErrors': 0
+        }
+        self.consumers = {}
+
+    def _fresh(self):
+        """Cached head if it is within the staleness bound, caller holds the lock"""
+        if self.current is not None and time.monotonic() - self.checked_at <= self.max_age:
+            return self.current
+        return None
+
+    def _count(self, consumer, cached):
+        """Record one read by `consumer`, caller holds the lock"""
+        counts = self.consumers.setdefault(consumer, {'reads': 0, 'cached': 0})
+        counts['reads'] += 1
+        if cached:
+            counts['cached'] += 1
+
+    def head(self, consumer='other'):
+        """
+        Get the latest block header.
+
+        Args:
+            consumer (str): Name the read is counted under in the metrics
+
+        Returns:
+            dict: number, hash, timestamp, gasLimit and baseFeePerGas (None before London)
+        """
+        with self.lock:
+            head = self._fresh()
+            self._count(consumer, head is not None)
+            if head is not None:
+                return head
+        return self._store(w3.eth.get_block('latest'))
+
+    def block_number(self, consumer='other'):
+        """Latest block number, from the cache or one eth_blockNumber call"""
+        with self.lock:
+            head = self._fresh()
+            self._count(consumer, head is not None)
+            if head is not None:
+                return head['number']
+        return w3.eth.block_number
+
+    def poll(self):
+        """Check the chain head, fetching the header only when there is a new block"""
+        number = w3.eth.block_number
+        with self.lock:
+            self.metrics['polls'] += 1
+            if self.current is not None and self.current['number'] == number:
+                self.checked_at = time.monotonic()
+                return self.current
+        return self._store(w3.eth.get_block(number))
+
+    def _store(self, block):
+        """Keep a fetched header unless a newer one is already cached"""
+        head = {
+            'number': block['number'],
+            'hash': block['hash'],
+            'timestamp': block['timestamp'],
+            'gasLimit': block['gasLimit'],
+            'baseFeePerGas': block.get('baseFeePerGas')
+        }
+        with self.lock:
+            self.metrics['headerFetches'] += 1
+            if self.current is None or head['number'] >= self.current['number']:
+                self.current = head
+                self.checked_at = time.monotonic()
+            return self.current
+
+    def watch(self, poll_interval):
+        """Background task: keep the cached head current"""
+        from backend.socketio_instance import socketio
+
+        while True:
+            try:
+                self.poll()
+            except Exception as e:
+                # Readers fall back to the RPC once the head goes stale
+                print(f"Error while polling the chain head: {e}")
+                with self.lock:
+                    self.metrics['pollErrors'] += 1
+            socketio.sleep(poll_interval)
+
+    def stats(self):
+        """
+        Tracker metrics for the admin metrics route.
+        Returns:
+            dict: Poll counters, the cached head and per-consumer reads with
+            the share answered from memory (each one an RPC call saved)
+        """
+        with self.lock:
+            stats = dict(self.metrics)
+            stats['head'] = None
+            if self.current is not None:
+                stats['head'] = {
+                    'number': self.current['number'],
+                    'timestamp': self.current['timestamp'],
+                    'age': time.monotonic() - self.checked_at
+                }
+            stats['consumers'] = {}
+            for consumer, counts in self.consumers.items():
+                stats['consumers'][consumer] = dict(
+                    counts,
+                    rpcCallsSavedPerRead=counts['cached'] / counts['reads'] if counts['reads'] else 0.0
+                )
+            return stats
+
+
+# Shared instance, polled by a background task started from app.py
+block_tracker = BlockTracker()
@@ -0,0 +1,265 @@
+import time
+from psycopg2.extras import execute_values
+from web3 import Web3
+from backend.config import (
+    w3, credential_verification, issuer_registry,
+    INDEXER_CONFIRMATIONS, INDEXER_BATCH_SIZE, INDEXER_START_BLOCK
+)
+from backend.classes.connection_pool import db_pool
+from backend.classes.block_tracker import block_tracker
+from backend.classes.migrations import schema_migrator
+
+CREDENTIAL_STORED_TOPIC = Web3.keccak(text="CredentialStored(bytes32,address,address,uint256,string)")
+MERKLE_ROOT_UPDATED_TOPIC = Web3.keccak(text="MerkleRootUpdated(bytes32)")
+
+
+def hex32(value):
+    """bytes32 as the 0x-prefixed lowercase hex string stored in the index"""
+    return '0x' + bytes(value).hex()
+
+
+class ChainIndexer:
+    """
+    Mirrors CredentialStored and MerkleRootUpdated events into Postgres.
+
+    Logs are read with eth_getLogs in ranges of `batch_size` blocks and only
+    up to `confirmations` blocks behind the head, so normal reorgs never
+    reach the index. The last indexed block and its hash are checkpointed
+    with the rows in the same transaction; if that hash changes (a reorg
+    deeper than the confirmation depth) the indexer deletes the affected
+    rows and indexes those blocks again.
+    """
+
+    def __init__(self, name='main', confirmations=INDEXER_CONFIRMATIONS, batch_size=INDEXER_BATCH_SIZE,
+                 start_block=INDEXER_START_BLOCK):
+        self.name = name
+        self.confirmations = confirmations
+        self.batch_size = batch_size
+        self.start_block = start_block
+
+    def ensure_schema(self):
+        """
+        Check the index tables exist. They come with the versioned migrations,
+        which are a deploy step (scripts/migrate.py up) rather than something
+        the indexer runs itself.
+
+        Raises:
+            RuntimeError: If the migrations haven't been applied
+        """
+        if not schema_migrator.table_exists('indexer_checkpoints'):
+            raise RuntimeError("The index tables don't exist, apply the migrations first (scripts/migrate.py up)")
+
+    def checkpoint(self):
+        """
+        Get the last indexed block.
+        Returns:
+            tuple: (block_number, block_hash), or None before the first batch
+        """
+        with db_pool.connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(
+                    "SELECT block_number, block_hash FROM indexer_checkpoints WHERE name = %s",
+                    (self.name,)
+                )
+                return cur.fetchone()
+
+    def run_once(self):
+        """
+        Index the next batch of confirmed blocks.
+        Returns:
+            int: Number of blocks indexed (0 when caught up)
+        """
+        checkpoint = self.checkpoint()
+        if checkpoint is not None and self._reorged(checkpoint):
+            return 0
+
+        from_block = checkpoint[0] + 1 if checkpoint else self.start_block
+        safe_head = block_tracker.block_number('indexer') - self.confirmations
+        if from_block > safe_head:
+            return 0
+        to_block = min(from_block + self.batch_size - 1, safe_head)
+
+        logs = w3.eth.get_logs({
+            'address': [credential_verification.address, issuer_registry.address],
+            'topics': [[CREDENTIAL_STORED_TOPIC, MERKLE_ROOT_UPDATED_TOPIC]],
+            'fromBlock': from_block,
+            'toBlock': to_block
+        })
+        to_hash = w3.eth.get_block(to_block)['hash']
+
+        credentials = []
+        roots = []
+        for log in logs:
+            topic = log['topics'][0]
+            if topic == CREDENTIAL_STORED_TOPIC:
+                args = credential_verification.events.CredentialStored().process_log(log)['args']
+                credentials.append((
+                    hex32(args['credentialHash']), args['issuer'], args['holder'], args['issuedAt'],
+                    args['data'], log['blockNumber'], hex32(log['transactionHash']), log['logIndex']
+                ))
+            elif topic == MERKLE_ROOT_UPDATED_TOPIC:
+                args = issuer_registry.events.MerkleRootUpdated().process_log(log)['args']
+                roots.append((
+                    log['blockNumber'], log['logIndex'], hex32(args['newRoot']), hex32(log['transactionHash'])
+                ))
+
+        with db_pool.connection() as conn:
+            with conn.cursor() as cur:
+                if credentials:
+                    execute_values(cur, """
+                        INSERT INTO indexed_credentials
+                            (credential_hash, issuer, holder, issued_at, data, block_number, transaction_hash, log_index)
+                        VALUES %s
+                        ON CONFLICT (credential_hash) DO NOTHING
+                        """, credentials)
+                if roots:
+                    execute_values(cur, """
+                        INSERT INTO indexed_merkle_roots (block_number, log_index, merkle_root, transaction_hash)
+                        VALUES %s
+                        ON CONFLICT DO NOTHING
+                        """, roots)
+                self._save_checkpoint(cur, to_block, hex32(to_hash))
+
+        print(f"Indexed blocks {from_block}-{to_block}: {len(credentials)} credentials, {len(roots)} root updates")
+        return to_block - from_block + 1
+
+    def run(self, poll_interval, sleep=time.sleep):
+        """Keep indexing, sleeping `poll_interval` seconds whenever caught up"""
+        self.ensure_schema()
+        while True:
+            try:
+                if self.run_once():
+                    continue
+            except Exception as e:
+                print(f"Error while indexing chain events: {e}")
+            sleep(poll_interval)
+
+    def _reorged(self, checkpoint):
+        """Rewind the index if the checkpointed block is no longer canonical"""
+        block_number, block_hash = checkpoint
+        current = w3.eth.get_block(block_number)
+        if hex32(current['hash']) == block_hash:
+            return False
+
+        # Step back at least one block, the next run checks the new checkpoint again
+        rewind_to = block_number - max(self.confirmations, 1)
+        print(f"Reorg detected at block {block_number}, rewinding index to {rewind_to}")
+        with db_pool.connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute("DELETE FROM indexed_credentials WHERE block_number > %s", (rewind_to,))
+                cur.execute("DELETE FROM indexed_merkle_roots WHERE block_number > %s", (rewind_to,))
+                if rewind_to < self.start_block:
+                    cur.execute("DELETE FROM indexer_checkpoints WHERE name = %s", (self.name,))
+                else:
+                    self._save_checkpoint(cur, rewind_to, hex32(w3.eth.get_block(rewind_to)['hash']))
+        return True
+
+    def _save_checkpoint(self, cur, block_number, block_hash):
+        cur.execute("""
+            INSERT INTO indexer_checkpoints (name, block_number, block_hash)
+            VALUES (%s, %s, %s)
+            ON CONFLICT (name)
+            DO UPDATE SET
+                block_number = EXCLUDED.block_number,
+                block_hash = EXCLUDED.block_hash
+            """,
+            (self.name, block_number, block_hash)
+        )
+
+    def find_credential(self, credential_hash):
+        """
+        Look a credential up in the index.
+
+        Args:
+            credential_hash (bytes): The bytes32 credential hash
+
+        Returns:
+            tuple: (issuer, holder, issued_at, data), or None if not indexed
+        """
+        with db_pool.connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(
+                    "SELECT issuer, holder, issued_at, data FROM indexed_credentials WHERE credential_hash = %s",
+                    (hex32(credential_hash),)
+                )
+                return cur.fetchone()
+
+    def find_credentials(self, credential_hashes):
+        """
+        Look many credentials up in the index with one query.
+
+        Args:
+            credential_hashes (list): bytes32 credential hashes
+
+        Returns:
+            set: The hashes (0x hex strings) that are indexed
+        """
+        with db_pool.connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(
+                    "SELECT credential_hash FROM indexed_credentials WHERE credential_hash = ANY(%s)",
+                    ([hex32(h) for h in credential_hashes],)
+                )
+                return {row[0] for row in cur.fetchall()}
+
+    def each_credential_hash(self, callback, itersize=10000):
+        """
+        Stream every indexed credential hash through `callback`.
+
+        Uses a server-side cursor inside one REPEATABLE READ transaction, so
+        memory stays flat and the checkpoint matches the rows that were read.
+
+        Returns:
+            int: The checkpoint block the hashes are complete up to, or None
+            if nothing has been indexed yet
+        """
+        with db_pool.connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ")
+                cur.execute(
+                    "SELECT block_number FROM indexer_checkpoints WHERE name = %s",
+                    (self.name,)
+                )
+                checkpoint = cur.fetchone()
+            if checkpoint is None:
+                return None
+            with conn.cursor(name='credential_hashes') as cur:
+                cur.itersize = itersize
+                cur.execute("SELECT credential_hash FROM indexed_credentials")
+                for row in cur:
+                    callback(bytes.fromhex(row[0][2:]))
+        return checkpoint[0]
+
+    def holder_credentials(self, holder_address):
+        """
+        Get a holder's indexed credentials and the block they're valid at.
+
+        Returns:
+            tuple: (list of (hash bytes, issuer, holder, issued_at, data) in
+            issuance order, checkpoint block), or (None, None) if nothing
+            has been indexed yet
+        """
+        with db_pool.connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(
+                    "SELECT block_number FROM indexer_checkpoints WHERE name = %s",
+                    (self.name,)
+                )
+                checkpoint = cur.fetchone()
+                if checkpoint is None:
+                    return None, None
+                cur.execute("""
+                    SELECT credential_hash, issuer, holder, issued_at, data
+                    FROM indexed_credentials
+                    WHERE holder = %s
+                    ORDER BY block_number, log_index
+                    """,
+                    (holder_address,)
+                )
+                rows = cur.fetchall()
+        credentials = [(bytes.fromhex(row[0][2:]),) + tuple(row[1:]) for row in rows]
+        return credentials, checkpoint[0]
+
+
+# Shared instance used by the routes and the run_indexer script
+chain_indexer = ChainIndexer()
@@ -0,0 +1,244 @@
+from contextlib import contextmanager
+import os
+import threading
+import time
+import psycopg2
+from psycopg2 import extensions
+
+
+class PoolTimeout(Exception):
+    """Raised when no connection frees up before the checkout timeout"""
+
+
+class ConnectionPool:
+    """
+    Bounded pool of Postgres connections shared by every route.
+
+    Connections are opened lazily up to `max_size` and handed out per
+    request through `connection()`. Idle connections are health checked
+    with `SELECT 1` before being reused and broken ones are replaced, and
+    the pool starts over after a fork so gunicorn workers never share a
+    socket with their parent.
+    """
+
+    def __init__(self):
+        """Set up an empty pool, call init_app (or configure) before use"""
+        self.dsn = None
+        self.max_size = 10
+        self.timeout = 30
+        self.health_check_after = 30
+        self.cond = threading.Condition()
+        self.idle = []
+        self.size = 0
+        self.pid = os.getpid()
+        self.metrics = {
+            'created': 0,
+            'closed': 0,
+            'checkouts': 0,
+            'waits': 0,
+            'timeouts': 0,
+            'failedHealthChecks': 0,
+            'waitTimeTotal': 0.0,
+            'waitTimeMax': 0.0
+        }
+
+    def init_app(self, app):
+        """
+        Configure the pool from the Flask app config.
+
+        Uses SQLALCHEMY_DATABASE_URI (the CONNECTION_STRING) as the DSN and
+        DB_POOL_MAX_SIZE, DB_POOL_TIMEOUT and DB_POOL_HEALTH_CHECK_AFTER for
+        sizing. When the socketio server runs on eventlet psycopg2 is made
+        cooperative so a slow query only blocks its own greenlet.
+        """
+        from backend.socketio_instance import socketio
+
+        self.configure(
+            app.config["SQLALCHEMY_DATABASE_URI"],
+            max_size=app.config.get("DB_POOL_MAX_SIZE", self.max_size),
+            timeout=app.config.get("DB_POOL_TIMEOUT", self.timeout),
+            health_check_after=app.config.get("DB_POOL_HEALTH_CHECK_AFTER", self.health_check_after)
+        )
+        if socketio.server_options.get('async_mode') == 'eventlet':
+            # Waiting for a free connection must park the greenlet, not the hub
+            from eventlet.green import threading as green_threading
+            self.cond = green_threading.Condition()
+            extensions.set_wait_callback(_eventlet_wait_callback)
+
+    def configure(self, dsn, max_size=10, timeout=30, health_check_after=30):
+        """Set the DSN and limits, closing any connections made with the old ones"""
+        with self.cond:
+            self.dsn = dsn
+            self.max_size = int(max_size)
+            self.timeout = float(timeout)
+            self.health_check_after = float(health_check_after)
+            for conn, _ in self.idle:
+                self._close(conn)
+            self.idle = []
+            self.cond.notify_all()
+
+    @contextmanager
+    def connection(self):
+        """
+        Check a connection out for the duration of a `with` block.
+
+        Works like `with psycopg2.connect(...) as conn`: the transaction is
+        committed when the block finishes and rolled back if it raises.
+        Either way the connection goes back to the pool afterwards.
+        """
+        conn = self.getconn()
+        try:
+            yield conn
+            if not conn.closed:
+                conn.commit()
+        except BaseException:
+            if not conn.closed:
+                try:
+                    conn.rollback()
+                except psycopg2.Error:
+                    pass
+            raise
+        finally:
+            self.putconn(conn)
+
+    def getconn(self):
+        """
+        Take a connection from the pool, opening one if there's room.
+
+        Raises:
+            PoolTimeout: If the pool stays exhausted for `timeout` seconds
+        """
+        if self.dsn is None:
+            raise RuntimeError("Connection pool is not configured")
+
+        started = time.monotonic()
+        waited = False
+        with self.cond:
+            self._check_fork()
+            self.metrics['checkouts'] += 1
+
+        while True:
+            conn = None
+            with self.cond:
+                while not self.idle and self.size >= self.max_size:
+                    remaining = self.timeout - (time.monotonic() - started)
+                    if remaining <= 0:
+                        self.metrics['timeouts'] += 1
+                        raise PoolTimeout(f"No database connection free after {self.timeout}s")
+                    waited = True
+                    self.cond.wait(remaining)
+
+                if self.idle:
+                    conn, returned_at = self.idle.pop()
+                else:
+                    # Reserve the slot now, connect outside the lock
+                    self.size += 1
+
+            if conn is None:
+                conn = self._connect()
+                break
+            if self._healthy(conn, returned_at):
+                break
+            with self.cond:
+                self.metrics['failedHealthChecks'] += 1
+                self._close(conn)
+                self.size -= 1
+
+        if waited:
+            wait_time = time.monotonic() - started
+            with self.cond:
+                self.metrics['waits'] += 1
+                self.metrics['waitTimeTotal'] += wait_time
+                self.metrics['waitTimeMax'] = max(self.metrics['waitTimeMax'], wait_time)
+        return conn
+
+    def _connect(self):
+        """Open a new connection for a slot that was already reserved"""
+        try:
+            conn = psycopg2.connect(self.dsn)
+        except Exception:
+            with self.cond:
+                self.size -= 1
+                self.cond.notify()
+            raise
+        with self.cond:
+            self.metrics['created'] += 1
+        return conn
+
+    def putconn(self, conn):
+        """Give a connection back, dropping it if it's closed or mid-transaction"""
+        with self.cond:
+            if os.getpid() != self.pid:
+                return
+            if conn.closed or conn.get_transaction_status() != extensions.TRANSACTION_STATUS_IDLE:
+                self._close(conn)
+                self.size -= 1
+            else:
+                self.idle.append((conn, time.monotonic()))
+            self.cond.notify()
+
+    def stats(self):
+        """
+        Pool metrics for the admin metrics route.
+        Returns:
+            dict: Sizes, lifetime counters and wait times (seconds)
+        """
+        with self.cond:
+            stats = dict(self.metrics)
+            stats['size'] = self.size
+            stats['maxSize'] = self.max_size
+            stats['idle'] = len(self.idle)
+            stats['inUse'] = self.size - len(self.idle)
+            if stats['waits']:
+                stats['waitTimeAvg'] = stats['waitTimeTotal'] / stats['waits']
+            else:
+                stats['waitTimeAvg'] = 0.0
+            return stats
+
+    def _healthy(self, conn, returned_at):
+        """Connections idle longer than health_check_after must answer SELECT 1"""
+        if conn.closed:
+            return False
+        if time.monotonic() - returned_at < self.health_check_after:
+            return True
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def _close(self, conn):
+        try:
+            conn.close()
+        except psycopg2.Error:
+            pass
+        self.metrics['closed'] += 1
+
+    def _check_fork(self):
+        """After a fork the inherited sockets belong to the parent, forget them"""
+        if os.getpid() != self.pid:
+            self.pid = os.getpid()
+            self.idle = []
+            self.size = 0
+
+
+def _eventlet_wait_callback(conn, timeout=-1):
+    """Let eventlet run other greenlets while psycopg2 waits on the socket"""
+    from eventlet.hubs import trampoline
+
+    while True:
+        state = conn.poll()
+        if state == extensions.POLL_OK:
+            break
+        elif state == extensions.POLL_READ:
+            trampoline(conn.fileno(), read=True)
+        elif state == extensions.POLL_WRITE:
+            trampoline(conn.fileno(), write=True)
+        else:
+            raise psycopg2.OperationalError(f"Bad result from poll: {state}")
+
+
+# Shared instance used by all the routes
+db_pool = ConnectionPool()
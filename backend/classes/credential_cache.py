@@ -0,0 +1,230 @@
+from collections import OrderedDict
+import threading
+import time
+from backend.config import w3, credential_verification, credential_calls, CREDENTIAL_CACHE_MAX_HOLDERS, CREDENTIAL_CACHE_TTL, INDEXER_ENABLED
+from backend.classes.chain_indexer import chain_indexer, CREDENTIAL_STORED_TOPIC
+from backend.classes.block_tracker import block_tracker
+
+
+def format_credential(credential_hash, issuer, holder, issued_at, data):
+    """Shape a credential the way /api/pull-credentials returns it"""
+    return {
+        'credentialHash': '0x' + bytes(credential_hash).hex(),
+        'issuer': issuer,
+        'holder': holder,
+        'issuedAt': issued_at,
+        'data': data
+    }
+
+
+class CredentialCache:
+    """
+    Read-through cache of each holder's credentials.
+
+    A miss calls pullCredential once and keeps the result. After that the
+    entry is kept current from CredentialStored events (from our own
+    issuance receipts and from the log watcher) instead of calling the RPC
+    again. While the watcher runs, misses are read at the block it has
+    synced to, so no event can fall between the call and the logs. Without
+    the watcher entries simply expire after CREDENTIAL_CACHE_TTL seconds.
+    """
+
+    def __init__(self, max_holders=CREDENTIAL_CACHE_MAX_HOLDERS, ttl=CREDENTIAL_CACHE_TTL):
+        self.max_holders = max_holders
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+        self.synced_block = None
+        self.listeners = []
+        self.metrics = {
+            'hits': 0,
+            'misses': 0,
+            'evictions': 0,
+            'eventsApplied': 0
+        }
+
+    def get(self, holder_address):
+        """
+        Get the formatted credentials of a holder.
+
+        Args:
+            holder_address (str): Checksum address of the holder
+
+        Returns:
+            list: Credentials as returned by /api/pull-credentials
+        """
+        with self.lock:
+            entry = self.entries.get(holder_address)
+            if entry is not None and (entry['expires'] is None or entry['expires'] > time.monotonic()):
+                self.entries.move_to_end(holder_address)
+                self.metrics['hits'] += 1
+                return list(entry['credentials'])
+            self.metrics['misses'] += 1
+            block = self.synced_block
+
+        if block is None:
+            raw = credential_calls.pullCredential(holder_address).call()
+            expires = time.monotonic() + self.ttl
+        else:
+            raw = self._read_holder(holder_address, block)
+            expires = None
+        credentials = [format_credential(*cred) for cred in raw]
+
+        with self.lock:
+            if block == self.synced_block:
+                self.entries[holder_address] = {
+                    'credentials': credentials,
+                    'hashes': {cred['credentialHash'] for cred in credentials},
+                    'expires': expires
+                }
+                self.entries.move_to_end(holder_address)
+                while len(self.entries) > self.max_holders:
+                    self.entries.popitem(last=False)
+                    self.metrics['evictions'] += 1
+        return list(credentials)
+
+    def _read_holder(self, holder_address, block):
+        """
+        Read a holder's credentials as of `block`.
+
+        With the chain indexer running, the confirmed credentials come from
+        Postgres and only the few blocks after its checkpoint are fetched,
+        as logs filtered on the holder topic. Otherwise pullCredential is
+        called at that block.
+        """
+        if INDEXER_ENABLED:
+            indexed, indexed_block = chain_indexer.holder_credentials(holder_address)
+            if indexed is not None and indexed_block <= block:
+                if indexed_block < block:
+                    logs = w3.eth.get_logs({
+                        'address': credential_verification.address,
+                        'topics': [CREDENTIAL_STORED_TOPIC, None, None, '0x' + '00' * 12 + holder_address[2:].lower()],
+                        'fromBlock': indexed_block + 1,
+                        'toBlock': block
+                    })
+                    for log in logs:
+                        args = credential_verification.events.CredentialStored().process_log(log)['args']
+                        indexed.append((args['credentialHash'], args['issuer'], args['holder'], args['issuedAt'], args['data']))
+                # Rows committed while we read can overlap the logs, keep the first copy
+                seen = set()
+                credentials = []
+                for cred in indexed:
+                    if cred[0] not in seen:
+                        seen.add(cred[0])
+                        credentials.append(cred)
+                return credentials
+
+        return credential_calls.pullCredential(holder_address).call(block_identifier=block)
+
+    def apply_event(self, args):
+        """
+        Append a CredentialStored event to the holder's entry, if cached.
+
+        Args:
+            args: Decoded event args (credentialHash, issuer, holder, issuedAt, data)
+        """
+        with self.lock:
+            self._apply_event(args)
+
+    def _apply_event(self, args):
+        """apply_event body, caller holds the lock"""
+        credential = format_credential(
+            args['credentialHash'], args['issuer'], args['holder'], args['issuedAt'], args['data']
+        )
+        entry = self.entries.get(credential['holder'])
+        if entry is None or credential['credentialHash'] in entry['hashes']:
+            return
+        entry['credentials'].append(credential)
+        entry['hashes'].add(credential['credentialHash'])
+        self.metrics['eventsApplied'] += 1
+
+    def add_listener(self, listener):
+        """
+        Register another consumer of the CredentialStored events seen here.
+
+        The listener gets `on_credential_events(events, synced_block)` for
+        every batch (synced_block is None for events from a receipt, which
+        say nothing about the blocks before them) and `on_sync_lost()` when
+        the watcher loses track of the chain and starts over.
+        """
+        self.listeners.append(listener)
+
+    def apply_receipt(self, receipt):
+        """Apply the CredentialStored events of one of our own transactions"""
+        events = []
+        for log in receipt['logs']:
+            if log['topics'] and log['topics'][0] == CREDENTIAL_STORED_TOPIC:
+                events.append(credential_verification.events.CredentialStored().process_log(log)['args'])
+        for args in events:
+            self.apply_event(args)
+        for listener in self.listeners:
+            listener.on_credential_events(events, None)
+
+    def poll_events(self):
+        """
+        Apply every CredentialStored log since the last synced block.
+        Returns:
+            int: The block the cache is now synced to
+        """
+        latest = block_tracker.block_number('credentialCache')
+        if self.synced_block is None:
+            # Nothing read before now can be cached at an older block, start here
+            with self.lock:
+                self.entries.clear()
+                self.synced_block = latest
+            for listener in self.listeners:
+                listener.on_credential_events([], latest)
+            return latest
+
+        if latest > self.synced_block:
+            logs = w3.eth.get_logs({
+                'address': credential_verification.address,
+                'topics': [CREDENTIAL_STORED_TOPIC],
+                'fromBlock': self.synced_block + 1,
+                'toBlock': latest
+            })
+            events = [credential_verification.events.CredentialStored().process_log(log)['args'] for log in logs]
+            # Apply and move the synced block together so a concurrent miss
+            # can't store a read that is missing these events
+            with self.lock:
+                for args in events:
+                    self._apply_event(args)
+                self.synced_block = latest
+            for listener in self.listeners:
+                listener.on_credential_events(events, latest)
+        return latest
+
+    def watch(self, poll_interval):
+        """Background task: keep polling CredentialStored logs into the cache"""
+        from backend.socketio_instance import socketio
+
+        while True:
+            try:
+                self.poll_events()
+            except Exception as e:
+                # Fall back to TTL entries until the RPC answers again
+                print(f"Error while polling credential events: {e}")
+                with self.lock:
+                    self.entries.clear()
+                    self.synced_block = None
+                for listener in self.listeners:
+                    listener.on_sync_lost()
+            socketio.sleep(poll_interval)
+
+    def stats(self):
+        """
+        Cache metrics for the admin metrics route.
+        Returns:
+            dict: Hit/miss counters, hit ratio and current size
+        """
+        with self.lock:
+            stats = dict(self.metrics)
+            lookups = stats['hits'] + stats['misses']
+            stats['hitRatio'] = stats['hits'] / lookups if lookups else 0.0
+            stats['holders'] = len(self.entries)
+            stats['syncedBlock'] = self.synced_block
+            return stats
+
+
+# Shared instance used by the routes
+credential_cache = CredentialCache()
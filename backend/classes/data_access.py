@@ -0,0 +1,79 @@
+from backend.classes.connection_pool import db_pool
+
+# One statement per operation, so there's no window between a check and the
+# write for a concurrent request to slip into
+LOAD_ACCOUNT = "SELECT passhash, role, address FROM accounts WHERE username = %s;"
+INSERT_ACCOUNT = """
+    INSERT INTO accounts (address, username, passhash, role) VALUES (%s, %s, %s, %s)
+    ON CONFLICT DO NOTHING
+    RETURNING username;
+"""
+# Only run when the insert hit a conflict, to say which field was taken
+ACCOUNT_CONFLICT = "SELECT username = %s FROM accounts WHERE username = %s OR lower(address) = lower(%s) LIMIT 1;"
+DELETE_ACCOUNT = "DELETE FROM accounts WHERE username = %s RETURNING address, role;"
+ISSUER_ENTROPY = "SELECT entropy FROM issuers WHERE lower(id) = %s;"
+
+
+class AccountExists(Exception):
+    """The username or the address already belongs to an account"""
+
+    def __init__(self, field):
+        super().__init__(f"This {field} already exists")
+        self.field = field
+
+
+def load_account(username):
+    """
+    Read an account for the login route.
+    Returns:
+        tuple: (passhash, role, address), or None if there is no such account
+    """
+    with db_pool.connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(LOAD_ACCOUNT, (username,))
+            return cur.fetchone()
+
+
+def create_account(address, username, passhash, role):
+    """
+    Insert an account unless the username or address is taken.
+
+    The unique indexes decide, so of any number of parallel registrations
+    of one username exactly one gets in.
+
+    Raises:
+        AccountExists: If the username or address already has an account
+    """
+    with db_pool.connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(INSERT_ACCOUNT, (address, username, passhash, role))
+            if cur.fetchone() is not None:
+                return
+            cur.execute(ACCOUNT_CONFLICT, (username, username, address))
+            conflict = cur.fetchone()
+    # The conflicting row may have been deleted since, it was the username then as often as not
+    raise AccountExists('username' if conflict is None or conflict[0] else 'address')
+
+
+def delete_account(username):
+    """
+    Delete an account.
+    Returns:
+        tuple: (address, role) of the deleted account, or None if there was none
+    """
+    with db_pool.connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(DELETE_ACCOUNT, (username,))
+            return cur.fetchone()
+
+
+def issuer_entropy(address):
+    """
+    Look up an issuer's entropy by address, whatever case its id was stored in.
+    Returns:
+        tuple: (entropy,) where entropy may be None, or None if there is no such issuer
+    """
+    with db_pool.connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(ISSUER_ENTROPY, (address.lower(),))
+            return cur.fetchone()
@@ -0,0 +1,153 @@
+import statistics
+import threading
+from backend.config import (
+    w3, FEE_HISTORY_BLOCKS, FEE_PRIORITY_PERCENTILE, FEE_MIN_PRIORITY_FEE,
+    GAS_ESTIMATE_MARGIN, GAS_ESTIMATE_CACHE_SIZE
+)
+from backend.classes.block_tracker import block_tracker
+
+
+class FeeOracle:
+    """
+    Fee, gas limit and chain ID parameters for the transactions we send.
+
+    Fees are EIP-1559: the base fee of the next block comes from one
+    eth_feeHistory call, cached until the block tracker sees a new block,
+    and the tip is the median of recent blocks' FEE_PRIORITY_PERCENTILE
+    tips. maxFeePerGas leaves room for the base fee to double, the unused
+    part is never charged. Chains without a base fee get a cached legacy
+    gasPrice instead.
+
+    Gas limits are estimated once per call shape (function, proof length,
+    data size...) and reused, and the chain ID is read once.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.chain_id = None
+        self.fees = None
+        self.fees_block = None
+        self.gas_estimates = {}
+        self.metrics = {
+            'feeLookups': 0,
+            'feeRefreshes': 0,
+            'gasEstimates': 0,
+            'gasEstimateHits': 0,
+            'gasEstimateFailures': 0
+        }
+
+    def get_chain_id(self):
+        """The chain ID, read from the node on first use"""
+        if self.chain_id is None:
+            self.chain_id = w3.eth.chain_id
+        return self.chain_id
+
+    def fee_params(self):
+        """
+        Current fee fields for a transaction.
+        Returns:
+            dict: maxFeePerGas and maxPriorityFeePerGas, or gasPrice on
+            chains without EIP-1559
+        """
+        block = block_tracker.block_number('fees')
+        with self.lock:
+            self.metrics['feeLookups'] += 1
+            if self.fees is not None and self.fees_block == block:
+                return dict(self.fees)
+
+        fees = self._fetch_fees()
+        with self.lock:
+            self.metrics['feeRefreshes'] += 1
+            self.fees = fees
+            self.fees_block = block
+        return dict(fees)
+
+    def _fetch_fees(self):
+        """One eth_feeHistory call, with gasPrice as the pre-London fallback"""
+        try:
+            history = w3.eth.fee_history(FEE_HISTORY_BLOCKS, 'latest', [FEE_PRIORITY_PERCENTILE])
+            # The last entry is the base fee of the next block
+            base_fee = history['baseFeePerGas'][-1]
+        except Exception:
+            base_fee = 0
+        if not base_fee:
+            return {'gasPrice': w3.eth.gas_price}
+
+        tips = [reward[0] for reward in history.get('reward', []) if reward]
+        priority_fee = max(int(statistics.median(tips)) if tips else 0, FEE_MIN_PRIORITY_FEE)
+        return {
+            'maxFeePerGas': 2 * base_fee + priority_fee,
+            'maxPriorityFeePerGas': priority_fee
+        }
+
+    def estimate_gas(self, call, shape, sender, fallback):
+        """
+        Gas limit for a contract call, estimated once per shape.
+
+        Args:
+            call: The bound contract function (e.g. functions.storeCredential(...))
+            shape (tuple): Everything that changes the gas used, the memo key
+            sender (str): The from address
+            fallback (int): Limit to use if the estimate fails (it isn't memoized)
+
+        Returns:
+            int: The estimate plus GAS_ESTIMATE_MARGIN
+        """
+        with self.lock:
+            gas = self.gas_estimates.get(shape)
+            if gas is not None:
+                self.metrics['gasEstimateHits'] += 1
+                return gas
+
+        try:
+            gas = int(call.estimate_gas({'from': sender}) * GAS_ESTIMATE_MARGIN)
+        except Exception as e:
+            # e.g. the call would revert; let the transaction itself report it
+            print(f"Gas estimate for {shape} failed ({e}), using {fallback}")
+            with self.lock:
+                self.metrics['gasEstimateFailures'] += 1
+            return fallback
+
+        with self.lock:
+            self.metrics['gasEstimates'] += 1
+            if len(self.gas_estimates) >= GAS_ESTIMATE_CACHE_SIZE:
+                self.gas_estimates.clear()
+            self.gas_estimates[shape] = gas
+        return gas
+
+    def transaction_params(self, call, shape, sender, fallback_gas):
+        """
+        Everything build_transaction needs except the nonce.
+        Returns:
+            dict: from, gas, chainId and the fee fields
+        """
+        params = {
+            'from': sender,
+            'gas': self.estimate_gas(call, shape, sender, fallback_gas),
+            'chainId': self.get_chain_id()
+        }
+        params.update(self.fee_params())
+        return params
+
+    def stats(self):
+        """
+        Fee metrics for the admin metrics route.
+        Returns:
+            dict: Lookup/refresh counters, cached estimates and current fees
+        """
+        with self.lock:
+            stats = dict(self.metrics)
+            stats['cachedGasEstimates'] = len(self.gas_estimates)
+            stats['chainId'] = self.chain_id
+            stats['fees'] = dict(self.fees) if self.fees is not None else None
+            stats['feesBlock'] = self.fees_block
+            return stats
+
+
+def data_words(data):
+    """Size of a string argument in 32-byte storage words, for call shapes"""
+    return (len(data.encode()) + 31) // 32
+
+
+# Shared instance used by every transaction-sending path
+fee_oracle = FeeOracle()
@@ -0,0 +1,501 @@
+from collections import Counter, OrderedDict
+from queue import Full
+import threading
+import time
+import uuid
+from psycopg2.extras import execute_values
+from web3.exceptions import TransactionNotFound
+from backend.config import (
+    w3, credential_calls,
+    ISSUANCE_MAX_JOBS, ISSUANCE_QUEUE_SIZE, ISSUANCE_BATCH_SIZE, ISSUANCE_BATCH_WINDOW, RECEIPT_POLL_INTERVAL,
+    ISSUANCE_RECEIPT_TIMEOUT, ISSUANCE_MAX_FEE_BUMPS, ISSUANCE_JOB_RETENTION
+)
+from backend.classes.connection_pool import db_pool
+from backend.classes.credential_cache import credential_cache
+from backend.classes.rpc_provider import batch_request, RPCError
+from backend.classes.nonce_manager import nonce_manager
+from backend.classes.fee_oracle import fee_oracle, data_words
+from backend.classes.block_tracker import block_tracker
+from backend.classes.chain_indexer import CREDENTIAL_STORED_TOPIC
+
+# Gas allowed per credential when the estimate fails, and the share of the
+# block gas limit no issuance transaction goes over
+FALLBACK_GAS_PER_CREDENTIAL = 300000
+MAX_BLOCK_GAS_SHARE = 0.9
+# Seconds between deletions of the jobs older than the retention period
+JOB_PRUNE_INTERVAL = 3600
+
+# issuance_jobs columns and the job dict keys they hold
+JOB_COLUMNS = [
+    ('id', 'id'),
+    ('status', 'status'),
+    ('credential_hash', 'credentialHash'),
+    ('issuer_address', 'issuerAddress'),
+    ('holder_address', 'holderAddress'),
+    ('transaction_hash', 'transactionHash'),
+    ('block_number', 'blockNumber'),
+    ('batch_size', 'batchSize'),
+    ('error', 'error'),
+    ('created_at', 'createdAt'),
+    ('updated_at', 'updatedAt')
+]
+
+# A job's rows can arrive out of order (enqueue races the submitter), only
+# a newer state replaces the stored one
+SAVE_JOBS = f"""
+    INSERT INTO issuance_jobs ({', '.join(column for column, _ in JOB_COLUMNS)}) VALUES %s
+    ON CONFLICT (id) DO UPDATE SET {', '.join(f'{column} = EXCLUDED.{column}' for column, _ in JOB_COLUMNS[1:])}
+    WHERE issuance_jobs.updated_at <= EXCLUDED.updated_at
+"""
+
+
+class QueueFull(Exception):
+    """Raised when too many issuances are already waiting to be sent"""
+
+
+class IssuanceQueue:
+    """
+    Background pipeline for storeCredential transactions.
+
+    `enqueue` only records a job and returns its ID. A submitter task
+    collects queued jobs for up to `batch_window` seconds (or `batch_size`
+    jobs) and sends one transaction per issuer, storeCredentials when there
+    are several, so a bulk issuance pays for the proof check and the
+    transaction overhead once per batch. With `batch_size` 1 (the default,
+    see ISSUANCE_BATCH_SIZE) every job is its own storeCredential. A receipt task polls the receipts
+    of every sent transaction with one batched RPC call per interval. A
+    transaction still without a receipt after `receipt_timeout` seconds is
+    checked against the account's mined nonce: if the nonce was used by
+    something else its jobs fail, otherwise it is rebroadcast with fees
+    bumped, up to `max_fee_bumps` times before its jobs fail. Every status
+    change is pushed to Socket.IO clients as a `credential_job` event.
+
+    Every job state is also written to the issuance_jobs table, so the
+    status route answers on any worker; jobs are deleted from it
+    `retention` seconds after their last change. The newest `max_jobs` stay
+    in memory too, that's what the sending process reads. Sending is still
+    per process: jobs queued in a process that stops are never sent, the
+    status route keeps showing them as queued.
+    """
+
+    def __init__(self, max_jobs=ISSUANCE_MAX_JOBS, max_queued=ISSUANCE_QUEUE_SIZE, poll_interval=RECEIPT_POLL_INTERVAL,
+                 batch_size=ISSUANCE_BATCH_SIZE, batch_window=ISSUANCE_BATCH_WINDOW,
+                 receipt_timeout=ISSUANCE_RECEIPT_TIMEOUT, max_fee_bumps=ISSUANCE_MAX_FEE_BUMPS,
+                 retention=ISSUANCE_JOB_RETENTION):
+        self.max_jobs = max_jobs
+        self.max_queued = max_queued
+        self.batch_size = batch_size
+        self.batch_window = batch_window
+        self.poll_interval = poll_interval
+        self.receipt_timeout = receipt_timeout
+        self.max_fee_bumps = max_fee_bumps
+        self.retention = retention
+        self.pruned_at = 0
+        self.lock = threading.Lock()
+        self.jobs = OrderedDict()
+        # Every hash of a sent transaction (replacements included) -> its entry
+        self.sent = {}
+        self.queue = None
+        self.socketio = None
+        self.metrics = {
+            'enqueued': 0,
+            'submitted': 0,
+            'confirmed': 0,
+            'failed': 0,
+            'rejected': 0,
+            'transactions': 0,
+            'feeBumps': 0,
+            'dropped': 0,
+            'saveErrors': 0
+        }
+
+    def start(self, socketio):
+        """Start the submitter and receipt tasks on the socketio async mode"""
+        if self.queue is not None:
+            return
+        self.socketio = socketio
+        # Bounded, so a full queue makes enqueue wait (or refuse) without polling
+        self.queue = socketio.server.eio.create_queue(self.max_queued)
+        socketio.start_background_task(self._submit_loop)
+        socketio.start_background_task(self._receipt_loop)
+
+    def enqueue(self, credential_bytes, issuer_address, holder_address, metadata, proof_data, wait=False):
+        """
+        Queue a credential for issuance.
+
+        Args:
+            credential_bytes (bytes): The bytes32 credential hash
+            issuer_address (str): Checksum address of the issuer
+            holder_address (str): Checksum address of the holder
+            metadata (str): The credential data stored on chain
+            proof_data (dict): The issuer's Merkle proof from IssuerVerification
+            wait (bool): Wait for room instead of raising QueueFull (bulk imports)
+
+        Returns:
+            dict: The new job
+
+        Raises:
+            QueueFull: If max_queued jobs are already waiting and wait is False
+            RuntimeError: If start() hasn't been called
+        """
+        if self.queue is None:
+            raise RuntimeError("Issuance queue is not running")
+
+        now = time.time()
+        job = {
+            'id': uuid.uuid4().hex,
+            'status': 'queued',
+            'credentialHash': '0x' + credential_bytes.hex(),
+            'issuerAddress': issuer_address,
+            'holderAddress': holder_address,
+            'transactionHash': None,
+            'blockNumber': None,
+            'batchSize': None,
+            'error': None,
+            'createdAt': now,
+            'updatedAt': now
+        }
+        # Recorded first, the submitter may pick the job up as soon as it's queued
+        with self.lock:
+            self.jobs[job['id']] = job
+            while len(self.jobs) > self.max_jobs:
+                self.jobs.popitem(last=False)
+            snapshot = dict(job)
+
+        try:
+            # With wait this blocks (on the hub under eventlet) until the submitter makes room
+            self.queue.put((job['id'], (credential_bytes, issuer_address, holder_address, metadata), proof_data),
+                           block=wait)
+        except Full:
+            with self.lock:
+                self.jobs.pop(job['id'], None)
+                self.metrics['rejected'] += 1
+            raise QueueFull(f"{self.max_queued} credentials are already waiting to be issued")
+
+        with self.lock:
+            self.metrics['enqueued'] += 1
+        self._save([snapshot])
+        return snapshot
+
+    def get(self, job_id):
+        """Get a copy of a job, from any worker, or None if it's unknown or too old"""
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if job is not None:
+                return dict(job)
+
+        with db_pool.connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(
+                    f"SELECT {', '.join(column for column, _ in JOB_COLUMNS)} FROM issuance_jobs WHERE id = %s",
+                    (job_id,)
+                )
+                row = cur.fetchone()
+        if row is None:
+            return None
+        return {key: value for (_, key), value in zip(JOB_COLUMNS, row)}
+
+    def _save(self, snapshots):
+        """Write job states to issuance_jobs; a failure only loses them for the other workers"""
+        try:
+            with db_pool.connection() as conn:
+                with conn.cursor() as cur:
+                    execute_values(cur, SAVE_JOBS, [
+                        tuple(snapshot[key] for _, key in JOB_COLUMNS) for snapshot in snapshots
+                    ])
+        except Exception as e:
+            print(f"Error saving {len(snapshots)} issuance job(s): {e}")
+            with self.lock:
+                self.metrics['saveErrors'] += 1
+
+    def _prune(self):
+        """Delete the stored jobs that haven't changed for `retention` seconds"""
+        with db_pool.connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute("DELETE FROM issuance_jobs WHERE updated_at < %s", (time.time() - self.retention,))
+
+    def _update(self, job_ids, **fields):
+        """Change some jobs, store them and push their new state to Socket.IO clients"""
+        now = time.time()
+        snapshots = []
+        with self.lock:
+            for job_id in job_ids:
+                job = self.jobs.get(job_id)
+                if job is not None:
+                    job.update(fields, updatedAt=now)
+                    snapshots.append(dict(job))
+        if not snapshots:
+            return
+        self._save(snapshots)
+        for snapshot in snapshots:
+            self.socketio.emit('credential_job', snapshot)
+
+    def _submit_loop(self):
+        """Background task: sign and send queued jobs in order, batched per issuer"""
+        empty = self.socketio.server.eio.get_queue_empty_exception()
+        while True:
+            batch = [self.queue.get()]
+            # Collect whatever else arrives in the window, up to the batch size
+            deadline = time.monotonic() + self.batch_window
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                try:
+                    if remaining > 0:
+                        batch.append(self.queue.get(timeout=remaining))
+                    else:
+                        batch.append(self.queue.get(block=False))
+                except empty:
+                    if remaining <= 0:
+                        break
+
+            # One transaction per issuer proof
+            groups = OrderedDict()
+            for job_id, credential, proof_data in batch:
+                key = (credential[1], bytes(proof_data['leafHash']))
+                groups.setdefault(key, (proof_data, []))[1].append((job_id, credential))
+            for proof_data, jobs in groups.values():
+                self._submit_group(jobs, proof_data)
+
+    def _submit_group(self, jobs, proof_data):
+        """Send one transaction for the jobs of one issuer and track it"""
+        try:
+            tx_hash, tx = self._send([credential for _, credential in jobs], proof_data)
+        except Exception as e:
+            print(f"Error sending {len(jobs)} credential job(s): {e}")
+            with self.lock:
+                self.metrics['failed'] += len(jobs)
+            self._update([job_id for job_id, _ in jobs], status='failed', error=str(e))
+            return
+        with self.lock:
+            self.sent[tx_hash] = {
+                'jobs': [(job_id, credential[0]) for job_id, credential in jobs],
+                'tx': tx,
+                'hashes': [tx_hash],
+                'deadline': time.monotonic() + self.receipt_timeout,
+                'bumps': 0
+            }
+            self.metrics['submitted'] += len(jobs)
+            self.metrics['transactions'] += 1
+        self._update([job_id for job_id, _ in jobs], status='submitted', transactionHash='0x' + tx_hash.hex(),
+                     batchSize=len(jobs))
+
+    def _send(self, credentials, proof_data):
+        """
+        Build, sign and send a storeCredential (or storeCredentials for several) transaction.
+        Returns:
+            tuple: (transaction hash, the transaction dict that was signed)
+        """
+        head = block_tracker.head('issuance')
+        issued_at = head['timestamp']
+        # A transaction over the block gas limit is never mined
+        max_gas = int(head['gasLimit'] * MAX_BLOCK_GAS_SHARE)
+
+        credentialInfos = [
+            (credential_bytes, issuer_address, holder_address, issued_at, metadata)
+            for credential_bytes, issuer_address, holder_address, metadata in credentials
+        ]
+        words = sum(data_words(metadata) for _, _, _, metadata in credentials)
+        if len(credentialInfos) == 1:
+            call = credential_calls.storeCredential(
+                credentialInfos[0],
+                proof_data['proof'],
+                proof_data['isLeft'],
+                proof_data['leafHash']
+            )
+            shape = ('storeCredential', len(proof_data['proof']), words)
+        else:
+            call = credential_calls.storeCredentials(
+                credentialInfos,
+                proof_data['proof'],
+                proof_data['isLeft'],
+                proof_data['leafHash']
+            )
+            shape = ('storeCredentials', len(proof_data['proof']), len(credentialInfos), words)
+
+        # Gas, fees and chain ID come cached from the fee oracle
+        fallback_gas = min(FALLBACK_GAS_PER_CREDENTIAL * len(credentialInfos), max_gas)
+        params = fee_oracle.transaction_params(call, shape, nonce_manager.address, fallback_gas)
+        params['gas'] = min(params['gas'], max_gas)
+        built = {}
+
+        def build_tx(nonce):
+            # Kept to rebroadcast it with higher fees if it gets stuck
+            built['tx'] = call.build_transaction(dict(params, nonce=nonce))
+            return built['tx']
+
+        tx_hash = bytes(nonce_manager.send_transaction(build_tx))
+        return tx_hash, built['tx']
+
+    def _receipt_loop(self):
+        """Background task: finish jobs whose transactions have been mined"""
+        while True:
+            self.socketio.sleep(self.poll_interval)
+            try:
+                self._poll_receipts()
+            except Exception as e:
+                print(f"Error while polling issuance receipts: {e}")
+            if time.monotonic() - self.pruned_at >= JOB_PRUNE_INTERVAL:
+                self.pruned_at = time.monotonic()
+                try:
+                    self._prune()
+                except Exception as e:
+                    print(f"Error while deleting old issuance jobs: {e}")
+
+    def _poll_receipts(self):
+        """Check every sent transaction with one batched eth_getTransactionReceipt"""
+        with self.lock:
+            pending = list(self.sent)
+        if not pending:
+            return
+
+        calls = [('eth_getTransactionReceipt', ['0x' + tx_hash.hex()]) for tx_hash in pending]
+        done = 0
+        for results in batch_request(calls):
+            for result in results:
+                tx_hash = pending[done]
+                done += 1
+                # null until mined; errors are retried next interval
+                if result is None or isinstance(result, RPCError):
+                    continue
+                # Mined: fetch it through web3 so the logs are decoded properly
+                receipt = w3.eth.get_transaction_receipt(tx_hash)
+                self._finish(tx_hash, receipt)
+
+        self._check_overdue()
+
+    def _check_overdue(self):
+        """Deal with sent transactions that went past their receipt deadline"""
+        now = time.monotonic()
+        with self.lock:
+            overdue = list({id(entry): entry for entry in self.sent.values() if entry['deadline'] <= now}.values())
+        if not overdue:
+            return
+
+        mined_nonce = w3.eth.get_transaction_count(nonce_manager.address, 'latest')
+        for entry in overdue:
+            if entry['tx']['nonce'] < mined_nonce:
+                # The nonce is used: one of our hashes was mined just now, or something replaced it
+                receipt = self._find_receipt(entry['hashes'])
+                if receipt is not None:
+                    self._finish(bytes(receipt['transactionHash']), receipt)
+                else:
+                    self._drop(entry, 'Transaction was dropped or replaced')
+            elif entry['bumps'] < self.max_fee_bumps:
+                self._bump_fees(entry)
+            else:
+                self._drop(entry, f'Transaction was not mined after {entry["bumps"]} fee bumps')
+                # Its nonce may never be mined, count from the node's pending view again
+                nonce_manager.resync()
+
+    def _find_receipt(self, hashes):
+        """The receipt of whichever of `hashes` was mined, or None"""
+        for tx_hash in hashes:
+            try:
+                return w3.eth.get_transaction_receipt(tx_hash)
+            except TransactionNotFound:
+                continue
+        return None
+
+    def _bump_fees(self, entry):
+        """Rebroadcast a stuck transaction with the same nonce and fees raised by 12.5%"""
+        tx = dict(entry['tx'])
+        # Nodes only accept a replacement paying at least 10% more
+        for field in ('maxFeePerGas', 'maxPriorityFeePerGas', 'gasPrice'):
+            if field in tx:
+                tx[field] = tx[field] + tx[field] // 8 + 1
+        try:
+            tx_hash = bytes(nonce_manager.resend(tx))
+        except Exception as e:
+            # 'nonce too low' means it was mined after all, the next check sees it
+            print(f"Error rebroadcasting issuance transaction with nonce {tx['nonce']}: {e}")
+            tx_hash = None
+
+        with self.lock:
+            entry['bumps'] += 1
+            entry['deadline'] = time.monotonic() + self.receipt_timeout
+            if tx_hash is None or entry['hashes'][0] not in self.sent:
+                # Failed, or finished while we were sending
+                return
+            entry['tx'] = tx
+            entry['hashes'].append(tx_hash)
+            self.sent[tx_hash] = entry
+            self.metrics['feeBumps'] += 1
+        self._update([job_id for job_id, _ in entry['jobs']], transactionHash='0x' + tx_hash.hex())
+
+    def _drop(self, entry, error):
+        """Stop tracking a transaction that will never be mined and fail its jobs"""
+        with self.lock:
+            if entry['hashes'][0] not in self.sent:
+                return
+            for tx_hash in entry['hashes']:
+                self.sent.pop(tx_hash, None)
+            self.metrics['dropped'] += 1
+            self.metrics['failed'] += len(entry['jobs'])
+        self._update([job_id for job_id, _ in entry['jobs']], status='failed', error=error)
+
+    def _finish(self, tx_hash, receipt):
+        """Record a mined transaction's outcome for each of its jobs"""
+        with self.lock:
+            entry = self.sent.get(tx_hash)
+            if entry is None:
+                return
+            # Drop the replaced hashes too
+            for sent_hash in entry['hashes']:
+                self.sent.pop(sent_hash, None)
+        jobs = entry['jobs']
+        tx_fields = {'blockNumber': receipt.blockNumber, 'transactionHash': '0x' + tx_hash.hex()}
+
+        if receipt.status != 1:  # 1 means success
+            with self.lock:
+                self.metrics['failed'] += len(jobs)
+            self._update([job_id for job_id, _ in jobs], status='failed',
+                         error='Transaction failed on the blockchain', **tx_fields)
+            return
+
+        # storeCredentials skips hashes that already exist, those have no event.
+        # A hash queued twice in one batch is stored (and logged) once, so each
+        # event confirms one job, the first in batch order
+        stored = Counter(
+            bytes(log['topics'][1]) for log in receipt['logs']
+            if log['topics'] and log['topics'][0] == CREDENTIAL_STORED_TOPIC
+        )
+        confirmed, duplicates = [], []
+        for job_id, credential_bytes in jobs:
+            if stored[credential_bytes]:
+                stored[credential_bytes] -= 1
+                confirmed.append(job_id)
+            else:
+                duplicates.append(job_id)
+        with self.lock:
+            self.metrics['confirmed'] += len(confirmed)
+            self.metrics['failed'] += len(duplicates)
+        self._update(confirmed, status='confirmed', **tx_fields)
+        self._update(duplicates, status='failed', error='Credential already exists', **tx_fields)
+        # Add the new credentials to the holders' cached lists
+        credential_cache.apply_receipt(receipt)
+
+    def stats(self):
+        """
+        Queue metrics for the admin metrics route.
+        Returns:
+            dict: Job counters plus how many are queued and awaiting receipts
+        """
+        with self.lock:
+            stats = dict(self.metrics)
+            stats['queued'] = self.queue.qsize() if self.queue is not None else 0
+            entries = {id(entry): entry for entry in self.sent.values()}.values()
+            stats['awaitingReceipt'] = sum(len(entry['jobs']) for entry in entries)
+            stats['pendingTransactions'] = len(entries)
+            stats['credentialsPerTransaction'] = (
+                stats['submitted'] / stats['transactions'] if stats['transactions'] else 0.0
+            )
+            stats['running'] = self.queue is not None
+        # Each issuance used to fetch the latest block for issuedAt
+        reads = block_tracker.stats()['consumers'].get('issuance', {'reads': 0, 'cached': 0})
+        fetched = reads['reads'] - reads['cached']
+        stats['blockFetchesSavedPerIssuance'] = 1 - fetched / stats['submitted'] if stats['submitted'] else 0.0
+        return stats
+
+
+# Shared instance used by the issuer routes, started from app.py
+issuance_queue = IssuanceQueue()
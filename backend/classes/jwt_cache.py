@@ -0,0 +1,106 @@
+from collections import OrderedDict
+import hashlib
+import threading
+import time
+from flask_jwt_extended import JWTManager
+from flask_jwt_extended.config import config
+from backend.config import JWT_CACHE_MAX_SIZE
+
+
+class JWTDecodeCache:
+    """
+    LRU of verified JWT claims keyed by a digest of the token.
+
+    A token's claims can't change, so once its signature and claims check
+    out the result is reused until the token expires, skipping the
+    signature check and claim validation on every protected request. Keys
+    also cover the CSRF value and allow_expired flag the decode was done
+    with. A hit on an expired token drops it, so the full decode runs and
+    raises the usual expired-token error. When the LRU is full, expired
+    entries go first.
+    """
+
+    def __init__(self, max_size=JWT_CACHE_MAX_SIZE):
+        self.max_size = max_size
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+        self.metrics = {
+            'hits': 0,
+            'misses': 0,
+            'expired': 0,
+            'evictions': 0
+        }
+
+    @staticmethod
+    def key(encoded_token, csrf_value, allow_expired):
+        material = f'{encoded_token}|{csrf_value or ""}|{int(allow_expired)}'
+        return hashlib.blake2b(material.encode(), digest_size=16).digest()
+
+    def get(self, key):
+        """Cached claims for `key`, or None on a miss or an expired token"""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.metrics['misses'] += 1
+                return None
+            claims, expires = entry
+            if expires is not None and time.time() >= expires:
+                del self.entries[key]
+                self.metrics['expired'] += 1
+                self.metrics['misses'] += 1
+                return None
+            self.entries.move_to_end(key)
+            self.metrics['hits'] += 1
+            # verify_jwt_in_request keeps it on g, don't let a view change the cached copy
+            return dict(claims)
+
+    def put(self, key, claims, allow_expired=False):
+        if self.max_size <= 0:
+            return
+        expires = None
+        if 'exp' in claims and not allow_expired:
+            expires = claims['exp'] + config.leeway
+        with self.lock:
+            self.entries[key] = (dict(claims), expires)
+            self.entries.move_to_end(key)
+            if len(self.entries) > self.max_size:
+                now = time.time()
+                for stale in [k for k, (_, exp) in self.entries.items() if exp is not None and exp <= now]:
+                    del self.entries[stale]
+                    self.metrics['expired'] += 1
+                while len(self.entries) > self.max_size:
+                    self.entries.popitem(last=False)
+                    self.metrics['evictions'] += 1
+
+    def stats(self):
+        """
+        Cache metrics for the admin metrics route.
+        Returns:
+            dict: Hit/miss/expiry/eviction counters, size and hit rate
+        """
+        with self.lock:
+            stats = dict(self.metrics)
+            lookups = stats['hits'] + stats['misses']
+            stats['size'] = len(self.entries)
+            stats['hitRate'] = stats['hits'] / lookups if lookups else 0.0
+            return stats
+
+
+class CachingJWTManager(JWTManager):
+    """JWTManager whose token decoding goes through the shared JWTDecodeCache"""
+
+    def _decode_jwt_from_config(self, encoded_token, csrf_value=None, allow_expired=False):
+        if jwt_cache.max_size <= 0:
+            return super()._decode_jwt_from_config(encoded_token, csrf_value, allow_expired)
+
+        key = jwt_cache.key(encoded_token, csrf_value, allow_expired)
+        claims = jwt_cache.get(key)
+        if claims is None:
+            # Raises for a bad signature, expired token, CSRF mismatch... nothing is cached then
+            claims = super()._decode_jwt_from_config(encoded_token, csrf_value, allow_expired)
+            jwt_cache.put(key, claims, allow_expired)
+        return claims
+
+
+# Shared instance, the app's JWTManager reads through it
+jwt_cache = JWTDecodeCache()
@@ -0,0 +1,50 @@
+import os
+import threading
+
+
+class LazyHandle:
+    """
+    Stand-in for an object that is built on first use, once per process.
+
+    Attribute access is forwarded to the object, so a handle can be imported
+    and used like the object itself (`w3.eth...`, `contract.functions...`)
+    but nothing is built at import time and a broken setting only fails the
+    code that uses it. A forked child (e.g. a gunicorn worker) drops the
+    parent's object and builds its own, so workers never share sockets.
+    """
+
+    def __init__(self, factory, name):
+        self._factory = factory
+        self._name = name
+        self._reset()
+        os.register_at_fork(after_in_child=self._reset)
+
+    def _reset(self):
+        # The parent's lock could have been held while it forked
+        self._lock = threading.Lock()
+        self._object = None
+
+    def get(self):
+        """The object of this process, built by the factory on the first call"""
+        obj = self._object
+        if obj is None:
+            with self._lock:
+                if self._object is None:
+                    self._object = self._factory()
+                obj = self._object
+        return obj
+
+    @property
+    def created(self):
+        """Whether this process has built the object yet"""
+        return self._object is not None
+
+    def __getattr__(self, name):
+        if name in ('_factory', '_name', '_lock', '_object'):
+            # Not set up yet (e.g. while copying), don't recurse into get()
+            raise AttributeError(name)
+        return getattr(self.get(), name)
+
+    def __repr__(self):
+        state = repr(self._object) if self._object is not None else 'not created'
+        return f"<LazyHandle {self._name}: {state}>"
@@ -0,0 +1,99 @@
+import itertools
+import json
+import uuid
+from backend.config import LIST_PAGE_SIZE, LIST_PAGE_SIZE_MAX, EXPORT_ITERSIZE
+from backend.classes.connection_pool import db_pool
+
+
+def page_size(value):
+    """
+    Parse the `limit` query parameter.
+
+    Raises:
+        ValueError: If it isn't a positive integer
+    """
+    if value in (None, ''):
+        return LIST_PAGE_SIZE
+    try:
+        size = int(value)
+    except ValueError:
+        size = 0
+    if size < 1:
+        raise ValueError('limit must be a positive integer')
+    return min(size, LIST_PAGE_SIZE_MAX)
+
+
+def like_prefix(prefix):
+    """LIKE pattern matching values that start with `prefix` literally"""
+    escaped = prefix.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return escaped + '%'
+
+
+def where(filters):
+    """
+    Build a WHERE clause from (condition, params) pairs, skipping None.
+    Returns:
+        tuple: (' WHERE a AND b' or '', params list)
+    """
+    conditions = []
+    params = []
+    for condition, values in filters:
+        if condition is not None:
+            conditions.append(condition)
+            params.extend(values)
+    return (' WHERE ' + ' AND '.join(conditions) if conditions else ''), params
+
+
+def fetch_page(query, params, key, limit):
+    """
+    Run a keyset page query (ordered by `key`, LIMIT left off).
+
+    One extra row is fetched to know whether there is a next page.
+
+    Returns:
+        tuple: (rows, whether more rows follow)
+    """
+    with db_pool.connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(f"{query} ORDER BY {key} LIMIT %s", params + [limit + 1])
+            rows = cur.fetchall()
+    return rows[:limit], len(rows) > limit
+
+
+def stream_rows(query, params, itersize=EXPORT_ITERSIZE):
+    """
+    Iterate over every row of `query` through a server-side cursor,
+    `itersize` rows per round trip, so an export never holds the whole table
+    in memory. The connection stays checked out until iteration finishes.
+
+    The query runs before this returns, so a database error still becomes
+    an error response instead of a cut-off stream.
+    """
+    rows = _server_side_rows(query, params, itersize)
+    first = next(rows, None)
+    return rows if first is None else itertools.chain([first], rows)
+
+
+def _server_side_rows(query, params, itersize):
+    with db_pool.connection() as conn:
+        with conn.cursor(name=f'export_{uuid.uuid4().hex}') as cur:
+            cur.itersize = itersize
+            cur.execute(query, params)
+            for row in cur:
+                yield row
+
+
+def ndjson(rows, to_item):
+    """One JSON line per row"""
+    for row in rows:
+        yield json.dumps(to_item(row)) + '\n'
+
+
+def json_array(rows, to_item, prefix='[', suffix=']'):
+    """A JSON array written out row by row, wrapped in `prefix` and `suffix`"""
+    yield prefix
+    first = True
+    for row in rows:
+        yield ('' if first else ',') + json.dumps(to_item(row))
+        first = False
+    yield suffix
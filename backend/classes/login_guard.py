@@ -0,0 +1,287 @@
+from collections import OrderedDict
+import hashlib
+import hmac
+import math
+import os
+import threading
+import time
+from backend.config import (
+    LOGIN_LIMIT_WINDOW, LOGIN_LIMIT_PER_IP, LOGIN_LIMIT_PER_USERNAME, LOGIN_LIMIT_MAX_KEYS, LOGIN_LIMIT_SHARED,
+    TRUSTED_PROXY_COUNT, ACCOUNT_CACHE_TTL, ACCOUNT_CACHE_MAX_SIZE
+)
+from backend.classes.connection_pool import db_pool
+from backend.classes.migrations import schema_migrator
+
+# Counts this window's hit and reads the previous window in one round trip
+SHARED_HIT = """
+    WITH current AS (
+        INSERT INTO login_rate_limits (key, window_index, hits) VALUES (%(key)s, %(window)s, 1)
+        ON CONFLICT (key, window_index) DO UPDATE SET hits = login_rate_limits.hits + 1
+        RETURNING hits
+    )
+    SELECT (SELECT hits FROM current),
+           COALESCE((SELECT hits FROM login_rate_limits WHERE key = %(key)s AND window_index = %(window)s - 1), 0);
+"""
+
+
+# Whether the X-Forwarded-For warning was printed yet
+_forwarded_warned = False
+
+
+def client_ip(request):
+    """The client's IP, taken from X-Forwarded-For when behind TRUSTED_PROXY_COUNT proxies"""
+    global _forwarded_warned
+    if TRUSTED_PROXY_COUNT:
+        # Each trusted proxy appends the address it saw, anything before that is client supplied
+        forwarded = [ip.strip() for ip in request.headers.get('X-Forwarded-For', '').split(',') if ip.strip()]
+        if len(forwarded) >= TRUSTED_PROXY_COUNT:
+            return forwarded[-TRUSTED_PROXY_COUNT]
+    elif not _forwarded_warned and 'X-Forwarded-For' in request.headers:
+        # Likely behind a proxy, then every client shares the proxy's login limit
+        _forwarded_warned = True
+        print("Requests come with X-Forwarded-For but TRUSTED_PROXY_COUNT is 0, the login limits "
+              f"count them all under {request.remote_addr}; set TRUSTED_PROXY_COUNT to the number of proxies")
+    return request.remote_addr
+
+
+class SlidingWindowLimiter:
+    """
+    Sliding window rate limiter: at most `limit` hits per key in any
+    `window` seconds.
+
+    Uses the sliding window counter approximation: hits are counted in fixed
+    windows and the previous window's count is weighted by how much of it
+    still overlaps the sliding window, so each key costs two integers. Keys
+    are kept in an LRU of `max_keys` so a spray of usernames can't grow it
+    without bound. With `shared` the counters live in Postgres instead and
+    every worker sees the same counts, at one query per hit. If the
+    login_rate_limits table hasn't been migrated in, the limiter says so
+    once and counts in this process instead.
+    """
+
+    def __init__(self, name, limit, window, max_keys=100000, shared=False):
+        self.name = name
+        self.limit = limit
+        self.window = window
+        self.max_keys = max_keys
+        self.shared = shared
+        self.schema_checked = False
+        self.lock = threading.Lock()
+        self.counters = OrderedDict()
+        self.metrics = {
+            'served': 0,
+            'rejected': 0,
+            'evictions': 0
+        }
+
+    def _counts(self, key, window_index):
+        """Hit `key` in this process, caller holds the lock"""
+        counter = self.counters.get(key)
+        if counter is None or counter[0] < window_index - 1:
+            counter = [window_index, 0, 0]
+        elif counter[0] == window_index - 1:
+            counter = [window_index, 0, counter[1]]
+        counter[1] += 1
+        self.counters[key] = counter
+        self.counters.move_to_end(key)
+        while len(self.counters) > self.max_keys:
+            self.counters.popitem(last=False)
+            self.metrics['evictions'] += 1
+        return counter[1], counter[2]
+
+    def _check_schema(self):
+        """Fall back to per-process counters when login_rate_limits is missing"""
+        if not schema_migrator.table_exists('login_rate_limits'):
+            print(f"login_rate_limits doesn't exist (run scripts/migrate.py up), "
+                  f"the {self.name} login limit is counted per process")
+            self.shared = False
+        self.schema_checked = True
+
+    def _shared_counts(self, key, window_index):
+        with db_pool.connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(SHARED_HIT, {'key': f'{self.name}:{key}', 'window': window_index})
+                current, previous = cur.fetchone()
+                # Let the first hit of each window clear out windows nobody reads anymore
+                if current == 1:
+                    cur.execute("DELETE FROM login_rate_limits WHERE key = %s AND window_index < %s;",
+                                (f'{self.name}:{key}', window_index - 1))
+        return current, previous
+
+    def hit(self, key):
+        """
+        Count one hit for `key`.
+        Returns:
+            float: 0 when the hit is allowed, otherwise the seconds until it would be
+        """
+        now = time.time()
+        window_index = int(now // self.window)
+        if self.shared and not self.schema_checked:
+            self._check_schema()
+        if self.shared:
+            current, previous = self._shared_counts(key, window_index)
+        else:
+            with self.lock:
+                current, previous = self._counts(key, window_index)
+
+        overlap = 1 - (now % self.window) / self.window
+        if current + previous * overlap <= self.limit:
+            with self.lock:
+                self.metrics['served'] += 1
+            return 0
+
+        with self.lock:
+            self.metrics['rejected'] += 1
+        if current > self.limit or not previous:
+            # Over the limit on this window alone, wait for the next one
+            return math.ceil(self.window - now % self.window)
+        # Wait until enough of the previous window has slid out
+        needed = (current + previous * overlap - self.limit) / previous
+        return max(1, math.ceil(needed * self.window))
+
+    def stats(self):
+        with self.lock:
+            stats = dict(self.metrics)
+            stats['limit'] = self.limit
+            stats['window'] = self.window
+            stats['shared'] = self.shared
+            stats['keys'] = len(self.counters)
+            return stats
+
+
+class AccountCache:
+    """
+    Short-lived cache of the accounts row (passhash, role, address) per
+    username for the login route.
+
+    Unknown usernames are cached too, so repeated attempts on them skip the
+    query as well. Entries live for `ttl` seconds; the account routes
+    invalidate a username when they change it, other workers catch up when
+    the entry expires.
+
+    A successful login also remembers an HMAC of the password (keyed with a
+    random per-process secret and bound to the passhash), so the same user
+    logging in again within the TTL is checked with one HMAC instead of a
+    full bcrypt verify. Failed attempts always go through bcrypt.
+    """
+
+    def __init__(self, ttl=ACCOUNT_CACHE_TTL, max_size=ACCOUNT_CACHE_MAX_SIZE):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.secret = os.urandom(32)
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+        self.metrics = {
+            'hits': 0,
+            'misses': 0,
+            'invalidations': 0,
+            'verifiedHits': 0
+        }
+
+    def get(self, username, load):
+        """
+        Get the account of `username`.
+
+        Args:
+            username (str): The login name
+            load (callable): Reads the account from the database, returns
+                (passhash, role, address) or None
+
+        Returns:
+            tuple: (passhash, role, address), or None if there is no such account
+        """
+        with self.lock:
+            entry = self.entries.get(username)
+            if entry is not None and entry['expires'] > time.monotonic():
+                self.entries.move_to_end(username)
+                self.metrics['hits'] += 1
+                return entry['account']
+            self.metrics['misses'] += 1
+
+        account = load(username)
+        with self.lock:
+            self.entries[username] = {
+                'account': tuple(account) if account else None,
+                'verified': None,
+                'expires': time.monotonic() + self.ttl
+            }
+            self.entries.move_to_end(username)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+        return tuple(account) if account else None
+
+    def _digest(self, password, passhash):
+        return hmac.new(self.secret, passhash.encode() + b':' + password.encode('utf-8'), hashlib.sha256).digest()
+
+    def verified(self, username, password):
+        """Whether `password` already passed bcrypt for this cached account"""
+        with self.lock:
+            entry = self.entries.get(username)
+            if entry is None or entry['verified'] is None or entry['expires'] <= time.monotonic():
+                return False
+            digest = self._digest(password, entry['account'][0])
+            if hmac.compare_digest(digest, entry['verified']):
+                self.metrics['verifiedHits'] += 1
+                return True
+            return False
+
+    def remember_verified(self, username, password):
+        """Record a password that just passed bcrypt for the cached account"""
+        with self.lock:
+            entry = self.entries.get(username)
+            if entry is not None and entry['account'] is not None:
+                entry['verified'] = self._digest(password, entry['account'][0])
+
+    def invalidate(self, username):
+        """Forget a username after its account was created, changed or deleted"""
+        with self.lock:
+            if self.entries.pop(username, None) is not None:
+                self.metrics['invalidations'] += 1
+
+    def stats(self):
+        with self.lock:
+            stats = dict(self.metrics)
+            lookups = stats['hits'] + stats['misses']
+            stats['size'] = len(self.entries)
+            stats['hitRate'] = stats['hits'] / lookups if lookups else 0.0
+            return stats
+
+
+class LoginGuard:
+    """Per IP and per username rate limits in front of the login route"""
+
+    def __init__(self):
+        self.per_ip = SlidingWindowLimiter('ip', LOGIN_LIMIT_PER_IP, LOGIN_LIMIT_WINDOW,
+                                           max_keys=LOGIN_LIMIT_MAX_KEYS, shared=LOGIN_LIMIT_SHARED)
+        self.per_username = SlidingWindowLimiter('username', LOGIN_LIMIT_PER_USERNAME, LOGIN_LIMIT_WINDOW,
+                                                 max_keys=LOGIN_LIMIT_MAX_KEYS, shared=LOGIN_LIMIT_SHARED)
+
+    def check(self, ip, username):
+        """
+        Count a login attempt.
+        Returns:
+            float: 0 if the attempt may go ahead, otherwise seconds to wait
+            (the Retry-After). A username isn't charged for attempts the IP
+            limit already turned away.
+        """
+        retry_after = self.per_ip.hit(ip)
+        if retry_after:
+            return retry_after
+        return self.per_username.hit(username.lower())
+
+    def stats(self):
+        """
+        Login metrics for the admin metrics route.
+        Returns:
+            dict: served/rejected counters of both limiters and the account cache
+        """
+        return {
+            'perIp': self.per_ip.stats(),
+            'perUsername': self.per_username.stats(),
+            'accounts': account_cache.stats()
+        }
+
+
+# Shared instances used by the login and account routes
+account_cache = AccountCache()
+login_guard = LoginGuard()
@@ -0,0 +1,158 @@
+try:
+    # safe-pysha3 is a lot faster per call than pycryptodome
+    from sha3 import keccak_256 as _keccak_256
+except ImportError:
+    from Crypto.Hash import keccak as _cryptodome_keccak
+
+    def _keccak_256(data):
+        return _cryptodome_keccak.new(digest_bits=256, data=data)
+
+NODE_SIZE = 32
+
+
+def keccak(data):
+    """keccak256 of a bytes-like object"""
+    return _keccak_256(data).digest()
+
+
+class MerkleEngine:
+    """
+    Keccak Merkle tree kept as one contiguous buffer per level.
+
+    Every level is a bytearray of 32-byte nodes, leaves first and the root
+    last, so a tree of a million issuers is a few flat buffers instead of
+    millions of Python objects. Hashing matches IssuerRegistry.verifyIssuer:
+    a leaf is keccak256(leaf data), a parent is
+    keccak256(abi.encodePacked(left, right)) and an odd last node is carried
+    up to the next level unchanged (the same layout merkly produced).
+    """
+
+    def __init__(self, leaf_hashes):
+        """
+        Build the tree from already hashed leaves.
+
+        Args:
+            leaf_hashes (bytes): Concatenated 32-byte leaf hashes
+        """
+        if not leaf_hashes or len(leaf_hashes) % NODE_SIZE:
+            raise ValueError("Leaf hashes must be a non-empty multiple of 32 bytes")
+
+        self.levels = [bytearray(leaf_hashes)]
+        while len(self.levels[-1]) > NODE_SIZE:
+            self.levels.append(_hash_level(self.levels[-1]))
+
+    @classmethod
+    def from_leaves(cls, leaves):
+        """
+        Hash raw leaves in one batch and build the tree.
+
+        Args:
+            leaves (list): Leaf values as str (utf-8 encoded) or bytes
+        """
+        return cls(b''.join(map(keccak, map(_to_bytes, leaves))))
+
+    def __len__(self):
+        return len(self.levels[0]) // NODE_SIZE
+
+    @property
+    def root(self):
+        """bytes: The 32-byte Merkle root"""
+        return bytes(self.levels[-1])
+
+    def leaf(self, index):
+        """bytes: The hash stored for leaf `index`"""
+        start = index * NODE_SIZE
+        return bytes(self.levels[0][start:start + NODE_SIZE])
+
+    def node(self, depth, index):
+        """bytes: Node `index` of level `depth` (0 is the leaves)"""
+        start = index * NODE_SIZE
+        return bytes(self.levels[depth][start:start + NODE_SIZE])
+
+    def level_sizes(self):
+        """list: Number of nodes on each level, leaves first"""
+        return [len(level) // NODE_SIZE for level in self.levels]
+
+    def proof(self, index):
+        """
+        Build the proof for leaf `index`.
+
+        Returns:
+            tuple: (list of bytes32 siblings bottom-up, isLeft bitmap where
+            bit i is set when sibling i sits on the left, number of siblings)
+        """
+        if not 0 <= index < len(self):
+            raise IndexError(f"Leaf index {index} out of range")
+
+        nodes = []
+        bitmap = 0
+        for level in self.levels[:-1]:
+            if index % 2 == 1:
+                start = (index - 1) * NODE_SIZE
+                bitmap |= 1 << len(nodes)
+            elif (index + 1) * NODE_SIZE < len(level):
+                start = (index + 1) * NODE_SIZE
+            else:
+                # A last node without a sibling is promoted unchanged
+                index //= 2
+                continue
+            nodes.append(bytes(level[start:start + NODE_SIZE]))
+            index //= 2
+
+        return nodes, bitmap, len(nodes)
+
+    def set_leaf(self, index, leaf):
+        """Replace leaf `index` with the hash of `leaf` and rehash its path"""
+        start = index * NODE_SIZE
+        self.levels[0][start:start + NODE_SIZE] = keccak(_to_bytes(leaf))
+        self._rehash_path(index)
+
+    def append_leaf(self, leaf):
+        """
+        Add a new leaf at the end and rehash its path.
+
+        Returns:
+            int: Index of the new leaf
+        """
+        index = len(self)
+        self.levels[0] += keccak(_to_bytes(leaf))
+        self._rehash_path(index)
+        return index
+
+    def _rehash_path(self, index):
+        """Recompute the parents of leaf `index` up to the root"""
+        depth = 0
+        while len(self.levels[depth]) > NODE_SIZE:
+            below = self.levels[depth]
+            parent = index // 2
+            start = parent * 2 * NODE_SIZE
+            if start + 2 * NODE_SIZE <= len(below):
+                node = keccak(memoryview(below)[start:start + 2 * NODE_SIZE])
+            else:
+                node = bytes(below[start:start + NODE_SIZE])
+
+            if depth + 1 == len(self.levels):
+                self.levels.append(bytearray())
+            above = self.levels[depth + 1]
+            offset = parent * NODE_SIZE
+            # Appending can grow the parent level by exactly one node
+            above[offset:offset + NODE_SIZE] = node
+
+            index = parent
+            depth += 1
+
+
+def _to_bytes(leaf):
+    return leaf.encode() if isinstance(leaf, str) else leaf
+
+
+def _hash_level(level):
+    """Hash every pair of a level buffer into the next level buffer"""
+    view = memoryview(level)
+    pairs_end = (len(level) // (2 * NODE_SIZE)) * 2 * NODE_SIZE
+    parents = bytearray(b''.join([
+        keccak(view[i:i + 2 * NODE_SIZE]) for i in range(0, pairs_end, 2 * NODE_SIZE)
+    ]))
+    if pairs_end < len(level):
+        parents += level[pairs_end:]
+    return parents
@@ -0,0 +1,178 @@
+from collections import namedtuple
+import hashlib
+import os
+import re
+from backend.classes.connection_pool import db_pool
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'migrations')
+
+# Held for the length of each migration's transaction so two workers starting
+# at once don't both apply it
+LOCK_ID = 0x67726164747275
+
+SCHEMA = """
+    CREATE TABLE IF NOT EXISTS schema_migrations (
+        version INTEGER PRIMARY KEY,
+        name VARCHAR(255) NOT NULL,
+        checksum VARCHAR(64) NOT NULL,
+        applied_at TIMESTAMPTZ NOT NULL DEFAULT now()
+    );
+"""
+
+# Data a migration can't be applied over, checked in its transaction first:
+# version -> (query returning the offending rows, what they are). Kept out of
+# the .sql files so the checksums of applied migrations don't change
+PRECHECKS = {
+    # The unique lower(id)/lower(address) indexes; /admin/create-issuer used
+    # to store checksummed ids next to lower-case ones from /register
+    2: [
+        ("SELECT string_agg(id, ', ' ORDER BY id) FROM issuers GROUP BY lower(id) HAVING count(*) > 1",
+         "issuers ids that differ only in case"),
+        ("SELECT string_agg(address, ', ' ORDER BY address) FROM accounts GROUP BY lower(address) HAVING count(*) > 1",
+         "accounts addresses that differ only in case")
+    ]
+}
+
+Migration = namedtuple('Migration', ['version', 'name', 'sql', 'checksum'])
+
+
+class MigrationError(Exception):
+    pass
+
+
+class SchemaMigrator:
+    """
+    Versioned schema migrations.
+
+    Migrations are the NNNN_name.sql files in backend/migrations, applied in
+    version order, each in its own transaction and recorded in
+    schema_migrations with a checksum of the file. An applied migration is
+    never run again, so fix mistakes with a new file instead of editing an
+    old one; migrate() refuses to run while an applied file has changed.
+    """
+
+    def __init__(self, directory=MIGRATIONS_DIR):
+        self.directory = directory
+
+    def available(self):
+        """
+        Read the migration files.
+        Returns:
+            list: Migration tuples in version order
+        """
+        migrations = []
+        for filename in sorted(os.listdir(self.directory)):
+            match = re.fullmatch(r'(\d+)_(\w+)\.sql', filename)
+            if not match:
+                continue
+            with open(os.path.join(self.directory, filename), encoding='utf-8') as f:
+                sql = f.read()
+            migrations.append(Migration(int(match.group(1)), match.group(2), sql,
+                                        hashlib.sha256(sql.encode()).hexdigest()))
+
+        versions = [migration.version for migration in migrations]
+        if len(set(versions)) != len(versions):
+            raise MigrationError(f"Two migrations share a version number in {self.directory}")
+        return migrations
+
+    def _applied(self, cur):
+        cur.execute(SCHEMA)
+        cur.execute("SELECT version, name, checksum, applied_at FROM schema_migrations ORDER BY version")
+        return {row[0]: row for row in cur.fetchall()}
+
+    def status(self):
+        """
+        Compare the migration files with the database.
+        Returns:
+            list: One dict per migration with its version, name and state
+            ('applied', 'pending', 'changed' when the file no longer matches
+            what was applied, or 'missing' when the file is gone)
+        """
+        with db_pool.connection() as conn:
+            with conn.cursor() as cur:
+                applied = self._applied(cur)
+
+        rows = []
+        for migration in self.available():
+            row = applied.pop(migration.version, None)
+            if row is None:
+                state = 'pending'
+            else:
+                state = 'applied' if row[2] == migration.checksum else 'changed'
+            rows.append({
+                'version': migration.version,
+                'name': migration.name,
+                'state': state,
+                'appliedAt': row[3] if row else None
+            })
+        for version, name, _, applied_at in applied.values():
+            rows.append({'version': version, 'name': name, 'state': 'missing', 'appliedAt': applied_at})
+        return sorted(rows, key=lambda row: row['version'])
+
+    def require_current(self):
+        """
+        Check every migration file has been applied, for code that must not
+        run against an older schema.
+        Raises:
+            MigrationError: If a migration is pending or was changed after it was applied
+        """
+        behind = [row for row in self.status() if row['state'] in ('pending', 'changed')]
+        if behind:
+            raise MigrationError("Schema is not up to date (" + ', '.join(
+                f"{row['version']}_{row['name']} {row['state']}" for row in behind
+            ) + "), run scripts/migrate.py up")
+
+    def _precheck(self, cur, migration):
+        """Refuse to apply `migration` over rows it would fail on, see PRECHECKS"""
+        for query, what in PRECHECKS.get(migration.version, []):
+            cur.execute(query)
+            groups = [row[0] for row in cur.fetchall()]
+            if groups:
+                raise MigrationError(
+                    f"Migration {migration.version}_{migration.name} can't be applied, {len(groups)} group(s) of "
+                    f"{what}: {'; '.join(groups[:10])}{'; ...' if len(groups) > 10 else ''}. "
+                    f"Keep one row of each and run it again"
+                )
+
+    def table_exists(self, table):
+        """Whether `table` exists, for code that needs a table added by a migration"""
+        with db_pool.connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute("SELECT to_regclass(%s)", (table,))
+                return cur.fetchone()[0] is not None
+
+    def migrate(self, target=None):
+        """
+        Apply the pending migrations, up to and including `target` if given.
+        Returns:
+            list: The Migration tuples that were applied (empty when up to date)
+        Raises:
+            MigrationError: If an applied migration's file was changed, or the
+                data fails a migration's PRECHECKS
+        """
+        done = []
+        for migration in self.available():
+            if target is not None and migration.version > target:
+                break
+            with db_pool.connection() as conn:
+                with conn.cursor() as cur:
+                    cur.execute("SELECT pg_advisory_xact_lock(%s)", (LOCK_ID,))
+                    applied = self._applied(cur)
+                    row = applied.get(migration.version)
+                    if row is not None:
+                        if row[2] != migration.checksum:
+                            raise MigrationError(f"Migration {migration.version}_{migration.name} was changed after it was applied")
+                        continue
+                    self._precheck(cur, migration)
+                    cur.execute(migration.sql)
+                    cur.execute(
+                        "INSERT INTO schema_migrations (version, name, checksum) VALUES (%s, %s, %s)",
+                        (migration.version, migration.name, migration.checksum)
+                    )
+            print(f"Applied migration {migration.version}_{migration.name}")
+            done.append(migration)
+        return done
+
+
+# Shared instance used by the app and scripts/migrate.py
+schema_migrator = SchemaMigrator()
@@ -0,0 +1,140 @@
+import heapq
+import threading
+from eth_account import Account
+from backend.config import w3, PRIVATE_KEY
+
+# Node errors meaning our nonce view is wrong, not the transaction
+NONCE_ERRORS = ('nonce too low', 'nonce too high', 'already known', 'replacement transaction underpriced')
+
+
+class NonceManager:
+    """
+    Hands out nonces for the backend's PRIVATE_KEY signer.
+
+    The first reservation reads the `pending` transaction count, after that
+    nonces are counted locally so any number of transactions can be signed
+    and in flight at once without an RPC call each. A nonce whose send fails
+    is released and handed out again before any new one, so a failed send
+    doesn't leave a gap that stalls every later transaction. When the node
+    rejects a nonce the manager resyncs with the pending count.
+
+    The lock is a native one and the RPC goes through the hub under
+    eventlet, so the pending count is read outside it and only installed
+    if no other caller (or resync) got there first.
+    """
+
+    def __init__(self, private_key=PRIVATE_KEY):
+        self.private_key = private_key
+        self.address = Account.from_key(private_key).address if private_key else None
+        self.lock = threading.Lock()
+        self.next_nonce = None
+        # Bumped by resync, so a count read before it isn't installed after it
+        self.generation = 0
+        self.released = []
+        self.metrics = {
+            'reserved': 0,
+            'released': 0,
+            'reused': 0,
+            'resyncs': 0,
+            'retries': 0
+        }
+
+    def reserve(self):
+        """
+        Reserve the next nonce.
+        Returns:
+            int: A nonce no other caller will get until it's released
+        """
+        while True:
+            with self.lock:
+                if self.released:
+                    self.metrics['reserved'] += 1
+                    self.metrics['reused'] += 1
+                    return heapq.heappop(self.released)
+                if self.next_nonce is not None:
+                    self.metrics['reserved'] += 1
+                    nonce = self.next_nonce
+                    self.next_nonce += 1
+                    return nonce
+                generation = self.generation
+
+            pending = w3.eth.get_transaction_count(self.address, 'pending')
+            with self.lock:
+                if self.next_nonce is None and self.generation == generation:
+                    self.next_nonce = pending
+
+    def release(self, nonce):
+        """Give back a nonce whose transaction never reached the node"""
+        with self.lock:
+            self.metrics['released'] += 1
+            if self.next_nonce is None or nonce >= self.next_nonce:
+                # Reserved before a resync, the pending count covers it
+                return
+            if nonce == self.next_nonce - 1:
+                self.next_nonce = nonce
+            else:
+                heapq.heappush(self.released, nonce)
+
+    def resync(self):
+        """Forget the local count, the next reservation reads the pending count again"""
+        with self.lock:
+            self.metrics['resyncs'] += 1
+            self.generation += 1
+            self.next_nonce = None
+            self.released = []
+
+    def send_transaction(self, build_tx):
+        """
+        Sign and send a transaction with a reserved nonce.
+
+        Args:
+            build_tx (callable): Takes the nonce and returns the transaction dict
+
+        Returns:
+            HexBytes: The transaction hash
+
+        If the node rejects the nonce, the manager resyncs and tries once
+        more with a fresh one.
+        """
+        for attempt in range(2):
+            nonce = self.reserve()
+            try:
+                tx = build_tx(nonce)
+                signed_tx = w3.eth.account.sign_transaction(tx, self.private_key)
+                return w3.eth.send_raw_transaction(signed_tx.rawTransaction)
+            except Exception as e:
+                if attempt == 0 and any(error in str(e).lower() for error in NONCE_ERRORS):
+                    print(f"Nonce {nonce} rejected ({e}), resyncing with the node")
+                    self.resync()
+                    with self.lock:
+                        self.metrics['retries'] += 1
+                    continue
+                self.release(nonce)
+                raise
+
+    def resend(self, tx):
+        """
+        Sign and send a transaction that already has its nonce, to rebroadcast
+        it or replace it with higher fees. No nonce is reserved.
+
+        Returns:
+            HexBytes: The transaction hash
+        """
+        signed_tx = w3.eth.account.sign_transaction(tx, self.private_key)
+        return w3.eth.send_raw_transaction(signed_tx.rawTransaction)
+
+    def stats(self):
+        """
+        Nonce metrics for the admin metrics route.
+        Returns:
+            dict: Counters, the next fresh nonce and how many released nonces wait for reuse
+        """
+        with self.lock:
+            stats = dict(self.metrics)
+            stats['nextNonce'] = self.next_nonce
+            stats['releasedWaiting'] = len(self.released)
+            return stats
+
+
+# Shared instance, every transaction the backend signs takes its nonce from here
+nonce_manager = NonceManager()
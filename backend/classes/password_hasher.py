@@ -0,0 +1,129 @@
+import os
+import threading
+import time
+import bcrypt
+from backend.config import BCRYPT_ROUNDS, PASSWORD_HASH_WORKERS
+
+
+class PasswordHasher:
+    """
+    bcrypt hashing and checking off the request greenlet.
+
+    bcrypt is a long CPU-bound C call; run on the eventlet hub it stalls
+    every request and Socket.IO client of the worker until it returns.
+    Under eventlet the calls go to eventlet's native thread pool (tpool)
+    instead, with at most `max_workers` running at once and the rest
+    waiting their turn as parked greenlets. Without eventlet they simply run
+    in the calling thread (bcrypt releases the GIL), bounded the same way.
+    `rounds` is the bcrypt cost factor of new hashes; existing hashes keep
+    theirs, it's part of the stored hash.
+    """
+
+    def __init__(self, rounds=BCRYPT_ROUNDS, max_workers=PASSWORD_HASH_WORKERS):
+        self.rounds = rounds
+        self.max_workers = max_workers
+        self.slots = threading.BoundedSemaphore(max_workers)
+        self.lock = threading.Lock()
+        self.execute = lambda function, *args: function(*args)
+        self.waiting = 0
+        self.running = 0
+        self.metrics = {
+            'hashes': 0,
+            'checks': 0,
+            'failedChecks': 0,
+            'maxWaiting': 0,
+            'waitTimeTotal': 0.0,
+            'waitTimeMax': 0.0,
+            'hashTimeTotal': 0.0
+        }
+
+    def init_app(self, app):
+        """
+        Use eventlet's thread pool when the socketio server runs on eventlet.
+
+        tpool is sized to `max_workers`, and waiting for a free slot parks the
+        greenlet instead of blocking the hub.
+        """
+        from backend.socketio_instance import socketio
+
+        if socketio.server_options.get('async_mode') == 'eventlet':
+            from eventlet import tpool
+            from eventlet.semaphore import BoundedSemaphore
+
+            tpool.set_num_threads(self.max_workers)
+            self.slots = BoundedSemaphore(self.max_workers)
+            self.execute = tpool.execute
+
+    def _run(self, function, *args):
+        """Run one bcrypt call in a free slot, counting queue depth and timings"""
+        queued = time.monotonic()
+        with self.lock:
+            self.waiting += 1
+            self.metrics['maxWaiting'] = max(self.metrics['maxWaiting'], self.waiting)
+
+        with self.slots:
+            started = time.monotonic()
+            with self.lock:
+                self.waiting -= 1
+                self.running += 1
+                self.metrics['waitTimeTotal'] += started - queued
+                self.metrics['waitTimeMax'] = max(self.metrics['waitTimeMax'], started - queued)
+            try:
+                return self.execute(function, *args)
+            finally:
+                with self.lock:
+                    self.running -= 1
+                    self.metrics['hashTimeTotal'] += time.monotonic() - started
+
+    def hash(self, password):
+        """
+        Hash a new password.
+        Returns:
+            str: The bcrypt hash as hex, the way the accounts table stores it
+        """
+        # Same salt + pepper input as the original account routes
+        salt = bcrypt.gensalt(rounds=self.rounds) + os.getenv('PEPPER').encode('utf-8')
+        passhash = self._run(bcrypt.hashpw, password.encode('utf-8'), salt)
+        with self.lock:
+            self.metrics['hashes'] += 1
+        return passhash.hex()
+
+    def check(self, password, passhash):
+        """
+        Check a password against a stored hash.
+
+        Args:
+            password (str): What the user typed
+            passhash (str): The hex bcrypt hash from the accounts table
+
+        Returns:
+            bool: Whether the password matches
+        """
+        matches = self._run(bcrypt.checkpw, password.encode('utf-8'), bytes.fromhex(passhash))
+        with self.lock:
+            self.metrics['checks'] += 1
+            if not matches:
+                self.metrics['failedChecks'] += 1
+        return matches
+
+    def stats(self):
+        """
+        Hasher metrics for the admin metrics route.
+        Returns:
+            dict: Counters, the current queue depth (waiting) and running
+            calls, and average wait/hash times in ms
+        """
+        with self.lock:
+            stats = dict(self.metrics)
+            calls = stats['hashes'] + stats['checks']
+            stats['waiting'] = self.waiting
+            stats['running'] = self.running
+            stats['workers'] = self.max_workers
+            stats['rounds'] = self.rounds
+            stats['avgWaitMs'] = stats['waitTimeTotal'] / calls * 1000 if calls else 0.0
+            stats['avgHashMs'] = stats['hashTimeTotal'] / calls * 1000 if calls else 0.0
+            return stats
+
+
+# Shared instance used by the login and account creation routes
+password_hasher = PasswordHasher()
@@ -0,0 +1,120 @@
+import select
+import psycopg2
+from psycopg2 import sql
+from socketio import PubSubManager
+from backend.classes.connection_pool import db_pool
+
+# NOTIFY payloads must stay under 8000 bytes, bigger messages go through a table
+NOTIFY_MAX_BYTES = 7900
+# How long oversized messages are kept for slow listeners to read
+MESSAGE_RETENTION = '5 minutes'
+
+
+def wait_readable(conn, async_mode):
+    """Block until a listening connection has something to read"""
+    if async_mode == 'eventlet':
+        from eventlet.hubs import trampoline
+        trampoline(conn.fileno(), read=True)
+    else:
+        select.select([conn], [], [])
+
+
+def listen(dsn, channel, async_mode, sleep, log, on_connect=None):
+    """
+    Yield the payloads NOTIFYed on `channel`, forever.
+
+    Listens on one dedicated autocommit connection, waiting on its socket
+    through the hub under eventlet, and reconnects with backoff when it
+    fails. Notifications sent while it was disconnected are lost, so
+    `on_connect` is called after every (re)connection to let the caller
+    catch up.
+
+    Args:
+        dsn (str): Postgres connection string
+        channel (str): The channel to LISTEN on
+        async_mode (str): The socketio async mode
+        sleep (callable): The async mode's sleep, between reconnections
+        log (callable): Takes the error message when the connection fails
+        on_connect (callable): Called once listening starts, and again after each reconnection
+    """
+    retry_sleep = 1
+    while True:
+        conn = None
+        try:
+            # Keepalives so a dead connection errors out instead of waiting forever
+            conn = psycopg2.connect(dsn, keepalives=1, keepalives_idle=30, keepalives_interval=10,
+                                    keepalives_count=3)
+            conn.autocommit = True
+            with conn.cursor() as cur:
+                cur.execute(sql.SQL("LISTEN {}").format(sql.Identifier(channel)))
+            retry_sleep = 1
+            if on_connect is not None:
+                on_connect()
+            while True:
+                wait_readable(conn, async_mode)
+                conn.poll()
+                while conn.notifies:
+                    yield conn.notifies.pop(0).payload
+        except Exception as e:
+            log(f'Listening on {channel} failed, retrying in {retry_sleep}s: {e}')
+            if conn is not None and not conn.closed:
+                conn.close()
+            sleep(retry_sleep)
+            retry_sleep = min(retry_sleep * 2, 60)
+
+
+class PostgresManager(PubSubManager):
+    """
+    Socket.IO message queue over Postgres LISTEN/NOTIFY.
+
+    Lets every worker's emits reach the clients connected to the other
+    workers without another service. The Redis and Kombu queues of
+    python-socketio need a monkey patched socket module under eventlet,
+    which this app doesn't do; here publishing goes through the (already
+    cooperative) connection pool and each worker listens on one dedicated
+    connection, waiting on its socket through the hub.
+
+    Messages are JSON; one too big for a NOTIFY payload is stored in
+    socketio_messages and only its id is sent.
+    """
+
+    name = 'postgres'
+
+    def __init__(self, dsn, channel='flask-socketio', write_only=False, logger=None, json=None):
+        super().__init__(channel=channel, write_only=write_only, logger=logger, json=json)
+        self.dsn = dsn
+
+    def _publish(self, data):
+        payload = self.json.dumps(data)
+        try:
+            with db_pool.connection() as conn:
+                with conn.cursor() as cur:
+                    if len(payload.encode('utf-8')) > NOTIFY_MAX_BYTES:
+                        cur.execute("INSERT INTO socketio_messages (payload) VALUES (%s) RETURNING id", (payload,))
+                        payload = f'#{cur.fetchone()[0]}'
+                        cur.execute("DELETE FROM socketio_messages WHERE created_at < now() - %s::interval",
+                                    (MESSAGE_RETENTION,))
+                    # Delivered when the pool commits
+                    cur.execute("SELECT pg_notify(%s, %s)", (self.channel, payload))
+        except Exception as e:
+            # Clients on this worker already got it, the others miss this one
+            self._get_logger().error(f'Cannot publish to Postgres: {e}')
+
+    def _read_stored(self, message_id):
+        with db_pool.connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute("SELECT payload FROM socketio_messages WHERE id = %s", (message_id,))
+                row = cur.fetchone()
+        return row[0] if row else None
+
+    def _listen(self):
+        for payload in listen(self.dsn, self.channel, self.server.async_mode, self.server.sleep,
+                              self._get_logger().error):
+            if payload.startswith('#'):
+                try:
+                    payload = self._read_stored(int(payload[1:]))
+                except Exception as e:
+                    self._get_logger().error(f'Cannot read stored Socket.IO message {payload}: {e}')
+                    continue
+            if payload is not None:
+                yield payload
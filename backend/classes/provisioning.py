@@ -0,0 +1,180 @@
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+import os
+import time
+import bcrypt
+from psycopg2.extras import execute_values
+from backend.config import BCRYPT_ROUNDS, PROVISION_WORKERS
+from backend.classes.connection_pool import db_pool
+from backend.classes.password_hasher import password_hasher
+from backend.classes.bulk_import import RowError
+
+ROLES = ('H', 'V', 'I', 'A')
+
+# Every account of the file in one statement, the unique indexes settle any
+# race with the account routes
+INSERT_ACCOUNTS = """
+    INSERT INTO accounts (address, username, passhash, role) VALUES %s
+    ON CONFLICT DO NOTHING
+    RETURNING username
+"""
+EXISTING_ACCOUNTS = """
+    SELECT username, lower(address) FROM accounts
+    WHERE username = ANY(%s) OR lower(address) = ANY(%s)
+"""
+
+
+def account_from_row(row):
+    """
+    Validate a provisioning row: username, password, address and an
+    optional role (holder by default).
+
+    Returns:
+        tuple: (username, password, address, role)
+
+    Raises:
+        RowError: If a field is missing or the role doesn't exist
+    """
+    username = str(row.get('username') or '').strip()
+    password = str(row.get('password') or '')
+    address = str(row.get('address') or '').strip()
+    role = str(row.get('role') or 'H').strip().upper()
+    if not username or not password or not address:
+        raise RowError('Missing required fields')
+    if role not in ROLES:
+        raise RowError('This role is not allowed')
+    return username, password, address, role
+
+
+def _hash_chunk(passwords, rounds, pepper):
+    """Runs in a pool process: hex bcrypt hashes, salted and peppered like PasswordHasher.hash"""
+    return [bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds=rounds) + pepper).hex()
+            for password in passwords]
+
+
+def hash_passwords(passwords, workers=PROVISION_WORKERS, rounds=BCRYPT_ROUNDS):
+    """
+    Hash many passwords across a pool of `workers` processes.
+
+    bcrypt is pure CPU, so a cohort hashes about `workers` times faster
+    than one at a time. Passwords go out in a few chunks per process to keep
+    the pickling overhead down.
+
+    Returns:
+        list: The hex hashes, in the order of `passwords`
+    """
+    pepper = os.getenv('PEPPER').encode('utf-8')
+    if workers <= 1 or len(passwords) <= 1:
+        return _hash_chunk(passwords, rounds, pepper)
+
+    workers = min(workers, len(passwords))
+    size = -(-len(passwords) // (workers * 4))
+    chunks = [passwords[i:i + size] for i in range(0, len(passwords), size)]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        hashed = pool.map(_hash_chunk, chunks, repeat(rounds), repeat(pepper))
+        return [passhash for chunk in hashed for passhash in chunk]
+
+
+def provision(rows, workers=PROVISION_WORKERS, rounds=BCRYPT_ROUNDS, max_rows=None, dry_run=False):
+    """
+    Create every account of a parsed upload in one transaction.
+
+    Rows that are invalid, repeat a username or address of an earlier row,
+    or clash with an existing account are reported and skipped before any
+    hashing, so they cost no bcrypt time. The rest are hashed in parallel
+    and inserted with a single multi-row INSERT; accounts created by
+    someone else in the meantime come back as conflicts too.
+
+    Args:
+        rows: (row number, dict or RowError) pairs, as iter_rows yields them
+        workers (int): Hashing processes
+        rounds (int): bcrypt cost factor
+        max_rows (int): Refuse files with more rows than this
+        dry_run (bool): Only validate and look for conflicts
+
+    Returns:
+        dict: Row counts, the created accounts, per-row errors and
+        conflicts, and timings with the accounts per second
+
+    Raises:
+        ValueError: If the file has more than `max_rows` rows
+    """
+    started = time.perf_counter()
+    report = {'rows': 0, 'created': 0, 'accounts': [], 'errors': [], 'conflicts': []}
+
+    accounts = []
+    usernames = {}
+    addresses = {}
+    for number, row in rows:
+        report['rows'] += 1
+        if max_rows is not None and report['rows'] > max_rows:
+            raise ValueError(f'At most {max_rows} accounts per upload')
+        try:
+            if isinstance(row, RowError):
+                raise row
+            username, password, address, role = account_from_row(row)
+        except RowError as e:
+            report['errors'].append({'row': number, 'error': str(e)})
+            continue
+        if username in usernames:
+            report['conflicts'].append({'row': number, 'username': username,
+                                        'error': f'Same username as row {usernames[username]}'})
+        elif address.lower() in addresses:
+            report['conflicts'].append({'row': number, 'username': username,
+                                        'error': f'Same address as row {addresses[address.lower()]}'})
+        else:
+            usernames[username] = number
+            addresses[address.lower()] = number
+            accounts.append((number, username, password, address, role))
+
+    # Don't spend bcrypt time on accounts that are already there
+    if accounts:
+        with db_pool.connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(EXISTING_ACCOUNTS, ([a[1] for a in accounts], [a[3].lower() for a in accounts]))
+                existing = cur.fetchall()
+        taken_usernames = {username for username, _ in existing}
+        taken_addresses = {address for _, address in existing}
+        fresh = []
+        for account in accounts:
+            number, username, _, address, _ = account
+            if username in taken_usernames:
+                report['conflicts'].append({'row': number, 'username': username, 'error': 'This username already exists'})
+            elif address.lower() in taken_addresses:
+                report['conflicts'].append({'row': number, 'username': username, 'error': 'This address already exists'})
+            else:
+                fresh.append(account)
+        accounts = fresh
+
+    report['hashSeconds'] = 0.0
+    report['insertSeconds'] = 0.0
+    if accounts and not dry_run:
+        hash_started = time.perf_counter()
+        # Under eventlet the pool is driven from a native thread, the hub keeps serving
+        passhashes = password_hasher.execute(hash_passwords, [a[2] for a in accounts], workers, rounds)
+        report['hashSeconds'] = time.perf_counter() - hash_started
+
+        insert_started = time.perf_counter()
+        with db_pool.connection() as conn:
+            with conn.cursor() as cur:
+                inserted = execute_values(
+                    cur, INSERT_ACCOUNTS,
+                    [(address, username, passhash, role)
+                     for (_, username, _, address, role), passhash in zip(accounts, passhashes)],
+                    page_size=len(accounts), fetch=True
+                )
+        report['insertSeconds'] = time.perf_counter() - insert_started
+
+        inserted = {username for (username,) in inserted}
+        for number, username, _, _, _ in accounts:
+            if username in inserted:
+                report['accounts'].append({'row': number, 'username': username})
+            else:
+                report['conflicts'].append({'row': number, 'username': username,
+                                            'error': 'This username or address was taken while provisioning'})
+
+    report['created'] = len(report['accounts'])
+    report['conflicts'].sort(key=lambda conflict: conflict['row'])
+    report['seconds'] = time.perf_counter() - started
+    report['accountsPerSecond'] = report['created'] / report['seconds'] if report['created'] else 0.0
+    return report
@@ -0,0 +1,299 @@
+import bisect
+import json
+import random
+import threading
+import time
+import requests
+from eth_utils import keccak, to_bytes
+from web3.providers.base import JSONBaseProvider
+
+# Upper bounds (ms) of the latency histogram buckets, the last one is +Inf
+LATENCY_BUCKETS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+# JSON-RPC error codes providers use for rate limiting (Infura/Alchemy -32005)
+RATE_LIMIT_CODES = (-32005, 429)
+
+
+class RPCError(Exception):
+    """Error object returned for one request of a JSON-RPC batch"""
+
+
+class RPCUnavailable(OSError):
+    """Every attempt on every RPC URL failed (web3 treats OSError as not connected)"""
+
+
+class Retryable(Exception):
+    """A response worth retrying: rate limit, 5xx or an overloaded node"""
+
+    def __init__(self, message, retry_after=None, rate_limited=False):
+        super().__init__(message)
+        self.retry_after = retry_after
+        self.rate_limited = rate_limited
+
+
+def _rate_limited(response):
+    """Whether a decoded JSON-RPC response (or batch) is a rate limit error"""
+    responses = response if isinstance(response, list) else [response]
+    for item in responses:
+        error = item.get('error') if isinstance(item, dict) else None
+        if isinstance(error, dict):
+            message = str(error.get('message', '')).lower()
+            if error.get('code') in RATE_LIMIT_CODES or 'rate limit' in message or 'too many requests' in message:
+                return True
+    return False
+
+
+class PooledHTTPProvider(JSONBaseProvider):
+    """
+    HTTP JSON-RPC provider for the shared Web3 instance.
+
+    Requests go through one keep-alive session whose connection pool is
+    sized for the number of greenlets calling the node at once. Rate
+    limits (HTTP 429, JSON-RPC -32005), 5xx responses and connection
+    errors are retried with exponential backoff and full jitter, honouring
+    Retry-After. With several URLs, one that fails is skipped for
+    `cooldown` seconds and the next one takes over. Latency is recorded
+    per method in a histogram, and `make_batch_request` sends many calls
+    as one JSON-RPC batch.
+    """
+
+    # Retries are done here, not by web3's retry middleware
+    _middlewares = ()
+    # Green requests sessions, see init_app
+    green = False
+
+    def __init__(self, urls, pool_size=50, timeout=30, max_retries=5, backoff_base=0.25, backoff_max=8,
+                 cooldown=30):
+        super().__init__()
+        self.urls = [url for url in urls if url]
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.cooldown = cooldown
+        self.lock = threading.Lock()
+        self.down_until = {url: 0 for url in self.urls}
+        self.session = self._make_session()
+        self.headers = {'Content-Type': 'application/json'}
+        self.latency = {}
+        self.metrics = {
+            'requests': 0,
+            'batches': 0,
+            'retries': 0,
+            'rateLimited': 0,
+            'failovers': 0,
+            'failures': 0
+        }
+
+    def _make_session(self):
+        requests_module = requests
+        if self.green:
+            import eventlet
+            requests_module = eventlet.import_patched('requests')
+        session = requests_module.Session()
+        adapter = requests_module.adapters.HTTPAdapter(
+            pool_connections=max(len(self.urls), 1), pool_maxsize=self.pool_size
+        )
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        return session
+
+    @classmethod
+    def init_app(cls, app):
+        """
+        Make RPC calls cooperative when the socketio server runs on eventlet.
+
+        The app doesn't monkey patch, so plain requests would block the
+        whole hub for every call; with a green requests session greenlets
+        wait on the node concurrently. This is set for the class because
+        providers are built lazily (and again in every forked worker).
+        """
+        from backend.socketio_instance import socketio
+
+        if socketio.server_options.get('async_mode') == 'eventlet':
+            cls.green = True
+
+    def sleep(self, seconds):
+        if self.green:
+            import eventlet
+            eventlet.sleep(seconds)
+        else:
+            time.sleep(seconds)
+
+    @property
+    def endpoint_uri(self):
+        """The URL requests currently go to"""
+        return self._pick_url()
+
+    def __str__(self):
+        return f"RPC connection {self.endpoint_uri}"
+
+    def _pick_url(self):
+        """First URL that isn't cooling down, else the one that recovers soonest"""
+        now = time.monotonic()
+        with self.lock:
+            for url in self.urls:
+                if self.down_until[url] <= now:
+                    return url
+            return min(self.urls, key=lambda url: self.down_until[url])
+
+    def _mark_down(self, url):
+        if len(self.urls) < 2:
+            return
+        with self.lock:
+            self.down_until[url] = time.monotonic() + self.cooldown
+            self.metrics['failovers'] += 1
+
+    def _record(self, label, started, failed=False):
+        """Add one call to the method's latency histogram"""
+        elapsed = (time.monotonic() - started) * 1000
+        with self.lock:
+            histogram = self.latency.get(label)
+            if histogram is None:
+                histogram = self.latency[label] = {
+                    'count': 0, 'errors': 0, 'totalMs': 0.0, 'maxMs': 0.0,
+                    'buckets': [0] * (len(LATENCY_BUCKETS) + 1)
+                }
+            histogram['count'] += 1
+            histogram['totalMs'] += elapsed
+            histogram['maxMs'] = max(histogram['maxMs'], elapsed)
+            histogram['buckets'][bisect.bisect_left(LATENCY_BUCKETS, elapsed)] += 1
+            if failed:
+                histogram['errors'] += 1
+
+    def _post(self, payload, label):
+        """
+        POST a JSON-RPC payload with retries and failover.
+        Returns:
+            tuple: (decoded response, number of retries it took)
+        """
+        attempt = 0
+        while True:
+            url = self._pick_url()
+            started = time.monotonic()
+            try:
+                response = self.session.post(url, data=payload, headers=self.headers, timeout=self.timeout)
+                if response.status_code == 429 or response.status_code >= 500:
+                    raise Retryable(f"HTTP {response.status_code} from the RPC node",
+                                    retry_after=response.headers.get('Retry-After'),
+                                    rate_limited=response.status_code == 429)
+                response.raise_for_status()
+                decoded = self.decode_rpc_response(response.content)
+                if _rate_limited(decoded):
+                    raise Retryable("Rate limited by the RPC node", rate_limited=True)
+            except (Retryable, requests.ConnectionError, requests.Timeout) as e:
+                self._record(label, started, failed=True)
+                self._mark_down(url)
+                with self.lock:
+                    if getattr(e, 'rate_limited', False):
+                        self.metrics['rateLimited'] += 1
+                    if attempt >= self.max_retries:
+                        self.metrics['failures'] += 1
+                        raise RPCUnavailable(f"{label} failed after {attempt + 1} attempts: {e}")
+                    self.metrics['retries'] += 1
+                delay = min(self.backoff_max, self.backoff_base * 2 ** attempt) * random.random()
+                retry_after = getattr(e, 'retry_after', None)
+                if retry_after and str(retry_after).isdigit():
+                    delay = max(delay, min(float(retry_after), self.backoff_max))
+                attempt += 1
+                self.sleep(delay)
+                continue
+            self._record(label, started)
+            return decoded, attempt
+
+    def make_request(self, method, params):
+        with self.lock:
+            self.metrics['requests'] += 1
+        response, retries = self._post(self.encode_rpc_request(method, params), method)
+
+        # A send retried after a lost response may already be in the pool
+        if method == 'eth_sendRawTransaction' and retries and 'error' in response:
+            message = str(response['error'].get('message', '')).lower()
+            if 'already known' in message or 'known transaction' in message:
+                return {'jsonrpc': '2.0', 'id': response.get('id'), 'result': '0x' + keccak(to_bytes(hexstr=params[0])).hex()}
+        return response
+
+    def make_batch_request(self, calls):
+        """
+        Send (method, params) tuples as one JSON-RPC batch.
+        Returns:
+            list: Results in request order, an RPCError in the slot of a
+            request that failed
+        """
+        payload = json.dumps([
+            {'jsonrpc': '2.0', 'id': i, 'method': method, 'params': params}
+            for i, (method, params) in enumerate(calls)
+        ])
+        with self.lock:
+            self.metrics['batches'] += 1
+        responses, _ = self._post(payload, 'batch:' + calls[0][0] if calls else 'batch')
+        if isinstance(responses, dict):
+            # Whole batch rejected (e.g. batching not supported)
+            raise RPCError(responses.get('error', responses))
+
+        results = [None] * len(calls)
+        answered = [False] * len(calls)
+        # Some nodes answer a request they couldn't parse with an error object without (or with a null) id
+        unmatched_error = None
+        for response in responses:
+            request_id = response.get('id') if isinstance(response, dict) else None
+            if not isinstance(request_id, int) or not 0 <= request_id < len(calls) or answered[request_id]:
+                if isinstance(response, dict) and 'error' in response:
+                    unmatched_error = response['error']
+                continue
+            answered[request_id] = True
+            if 'error' in response:
+                results[request_id] = RPCError(response['error'])
+            elif 'result' in response:
+                results[request_id] = response['result']
+            else:
+                results[request_id] = RPCError(f'Malformed response: {response}')
+
+        for i in range(len(calls)):
+            if not answered[i]:
+                results[i] = RPCError(unmatched_error if unmatched_error is not None else 'No response')
+        return results
+
+    def stats(self):
+        """
+        Provider metrics for the admin metrics route.
+        Returns:
+            dict: Request/retry/failover counters, URL health and per-method
+            latency histograms (bucket upper bounds in ms)
+        """
+        now = time.monotonic()
+        with self.lock:
+            stats = dict(self.metrics)
+            stats['urls'] = [
+                {'index': i, 'healthy': self.down_until[url] <= now} for i, url in enumerate(self.urls)
+            ]
+            stats['latencyBucketsMs'] = list(LATENCY_BUCKETS) + ['+Inf']
+            stats['latency'] = {}
+            for label, histogram in self.latency.items():
+                stats['latency'][label] = dict(
+                    histogram,
+                    buckets=list(histogram['buckets']),
+                    avgMs=histogram['totalMs'] / histogram['count']
+                )
+            return stats
+
+
+def batch_request(calls, chunk_size=None):
+    """
+    Send many JSON-RPC requests as batches (one HTTP POST per chunk).
+
+    Args:
+        calls (list): (method, params) tuples
+        chunk_size (int): Requests per HTTP POST (providers cap batch size),
+            RPC_BATCH_SIZE by default
+
+    Yields:
+        list: Results of each chunk in request order. A failed request gives
+        an RPCError in its slot instead of raising.
+    """
+    from backend.config import w3, RPC_BATCH_SIZE
+
+    chunk_size = chunk_size or RPC_BATCH_SIZE
+    for start in range(0, len(calls), chunk_size):
+        yield w3.provider.make_batch_request(calls[start:start + chunk_size])
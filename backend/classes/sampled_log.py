@@ -0,0 +1,43 @@
+import json
+import logging
+import random
+import threading
+from backend.config import AUTH_LOG_SAMPLE_RATE
+
+
+class SampledLogger:
+    """
+    Structured logging for hot paths: one JSON line for a sample of the
+    events instead of prints on every request.
+
+    `rate` is the share of events written (0 disables, 1 logs all of them).
+    Every event is still counted, so the totals are right even when only a
+    few lines are written.
+    """
+
+    def __init__(self, name, rate):
+        self.logger = logging.getLogger(name)
+        if not self.logger.handlers:
+            handler = logging.StreamHandler()
+            handler.setFormatter(logging.Formatter('%(message)s'))
+            self.logger.addHandler(handler)
+            self.logger.setLevel(logging.INFO)
+            self.logger.propagate = False
+        self.rate = rate
+        self.lock = threading.Lock()
+        self.counts = {}
+
+    def log(self, event, **fields):
+        with self.lock:
+            self.counts[event] = self.counts.get(event, 0) + 1
+            seen = self.counts[event]
+        if self.rate > 0 and (self.rate >= 1 or random.random() < self.rate):
+            self.logger.info(json.dumps(dict(fields, event=event, seen=seen, sampleRate=self.rate), default=str))
+
+    def stats(self):
+        with self.lock:
+            return {'sampleRate': self.rate, 'events': dict(self.counts)}
+
+
+# Shared instance for the auth routes
+auth_log = SampledLogger('gradtrust.auth', AUTH_LOG_SAMPLE_RATE)
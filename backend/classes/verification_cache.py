@@ -0,0 +1,217 @@
+from collections import OrderedDict
+import hashlib
+import math
+import threading
+import time
+from backend.config import (
+    w3, credential_verification, INDEXER_ENABLED,
+    VERIFY_CACHE_MAX_POSITIVE, VERIFY_CACHE_MAX_NEGATIVE, VERIFY_NEGATIVE_TTL,
+    BLOOM_CAPACITY, BLOOM_ERROR_RATE
+)
+from backend.classes.chain_indexer import chain_indexer, CREDENTIAL_STORED_TOPIC
+from backend.classes.credential_cache import credential_cache
+
+
+class BloomFilter:
+    """
+    Fixed-size bloom filter of bytes items.
+
+    Sized for `capacity` items at `error_rate` false positives; it keeps
+    working past capacity, just with more false positives.
+    """
+
+    def __init__(self, capacity, error_rate):
+        self.num_bits = max(8, int(math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)))
+        self.num_hashes = max(1, round(self.num_bits / capacity * math.log(2)))
+        self.bits = bytearray((self.num_bits + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item):
+        # Double hashing: k positions from two 64-bit halves of one digest
+        digest = hashlib.blake2b(item, digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.num_bits for i in range(self.num_hashes)]
+
+    def add(self, item):
+        for position in self._positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, item):
+        bits = self.bits
+        return all(bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+
+class VerificationCache:
+    """
+    Cache of verifyCredential results.
+
+    storeCredential rejects duplicates and nothing deletes a credential, so
+    a valid result never changes and is kept (LRU bounded). An invalid
+    result can turn valid at any block, so it's only kept for
+    VERIFY_NEGATIVE_TTL seconds.
+
+    With the chain indexer enabled, a bloom filter of every issued hash is
+    loaded from Postgres and kept current from the credential cache's log
+    watcher. A hash the filter doesn't contain is rejected without an RPC
+    call. The filter is only trusted while the watcher is synced, so a
+    rejection is as fresh as the watcher (one poll interval), the same
+    staleness the negative cache already accepts.
+    """
+
+    def __init__(self, max_positive=VERIFY_CACHE_MAX_POSITIVE, max_negative=VERIFY_CACHE_MAX_NEGATIVE,
+                 negative_ttl=VERIFY_NEGATIVE_TTL, bloom_capacity=BLOOM_CAPACITY, bloom_error_rate=BLOOM_ERROR_RATE):
+        self.max_positive = max_positive
+        self.max_negative = max_negative
+        self.negative_ttl = negative_ttl
+        self.bloom_capacity = bloom_capacity
+        self.bloom_error_rate = bloom_error_rate
+        self.lock = threading.Lock()
+        self.positive = OrderedDict()
+        self.negative = OrderedDict()
+        self.bloom = None
+        self.bloom_block = None
+        self.rebuilding = False
+        self.pending = []
+        self.metrics = {
+            'hits': 0,
+            'negativeHits': 0,
+            'bloomRejects': 0,
+            'misses': 0,
+            'positiveEvictions': 0,
+            'negativeEvictions': 0,
+            'bloomRebuilds': 0
+        }
+
+    def lookup(self, credential_hash):
+        """
+        Answer a verification from the cache.
+
+        Args:
+            credential_hash (bytes): The bytes32 credential hash
+
+        Returns:
+            bool: The cached result, or None if the chain has to be asked
+        """
+        with self.lock:
+            if credential_hash in self.positive:
+                self.positive.move_to_end(credential_hash)
+                self.metrics['hits'] += 1
+                return True
+            expires = self.negative.get(credential_hash)
+            if expires is not None:
+                if expires > time.monotonic():
+                    self.metrics['negativeHits'] += 1
+                    return False
+                del self.negative[credential_hash]
+            if self.bloom_block is not None and credential_hash not in self.bloom:
+                self.metrics['bloomRejects'] += 1
+                return False
+            self.metrics['misses'] += 1
+            return None
+
+    def store(self, credential_hash, is_valid):
+        """Keep the result of a verification that went to the index or chain"""
+        with self.lock:
+            if is_valid:
+                self._store_positive(credential_hash)
+            elif credential_hash not in self.positive:
+                # An event may have marked it valid while we were asking
+                self.negative[credential_hash] = time.monotonic() + self.negative_ttl
+                self.negative.move_to_end(credential_hash)
+                while len(self.negative) > self.max_negative:
+                    self.negative.popitem(last=False)
+                    self.metrics['negativeEvictions'] += 1
+
+    def _store_positive(self, credential_hash):
+        """store body for valid hashes, caller holds the lock"""
+        self.negative.pop(credential_hash, None)
+        self.positive[credential_hash] = True
+        self.positive.move_to_end(credential_hash)
+        while len(self.positive) > self.max_positive:
+            self.positive.popitem(last=False)
+            self.metrics['positiveEvictions'] += 1
+
+    def on_credential_events(self, events, synced_block):
+        """Credential cache listener: new CredentialStored events up to synced_block"""
+        with self.lock:
+            for args in events:
+                credential_hash = bytes(args['credentialHash'])
+                self._store_positive(credential_hash)
+                if self.bloom is not None:
+                    self.bloom.add(credential_hash)
+                if self.rebuilding:
+                    self.pending.append(credential_hash)
+            if synced_block is None:
+                return
+            if self.bloom_block is not None:
+                self.bloom_block = synced_block
+                return
+            if not INDEXER_ENABLED or self.rebuilding:
+                return
+            self.rebuilding = True
+            self.pending = []
+
+        try:
+            self._rebuild_bloom(synced_block)
+        except Exception as e:
+            print(f"Error while loading the credential bloom filter: {e}")
+        finally:
+            with self.lock:
+                self.rebuilding = False
+                self.pending = []
+
+    def on_sync_lost(self):
+        """Credential cache listener: stop trusting the bloom filter"""
+        with self.lock:
+            self.bloom = None
+            self.bloom_block = None
+
+    def _rebuild_bloom(self, synced_block):
+        """Load every indexed hash, then the logs after the indexer checkpoint"""
+        bloom = BloomFilter(self.bloom_capacity, self.bloom_error_rate)
+        checkpoint = chain_indexer.each_credential_hash(bloom.add)
+        if checkpoint is None:
+            return
+        if checkpoint < synced_block:
+            logs = w3.eth.get_logs({
+                'address': credential_verification.address,
+                'topics': [CREDENTIAL_STORED_TOPIC],
+                'fromBlock': checkpoint + 1,
+                'toBlock': synced_block
+            })
+            for log in logs:
+                bloom.add(bytes(credential_verification.events.CredentialStored().process_log(log)['args']['credentialHash']))
+
+        with self.lock:
+            # Our own issuances that landed while the filter was loading
+            for credential_hash in self.pending:
+                bloom.add(credential_hash)
+            self.bloom = bloom
+            self.bloom_block = synced_block
+            self.metrics['bloomRebuilds'] += 1
+        print(f"Loaded {bloom.count} credential hashes into the bloom filter (block {synced_block})")
+
+    def stats(self):
+        """
+        Cache metrics for the admin metrics route.
+        Returns:
+            dict: Hit/miss counters, hit rate, sizes and bloom filter state
+        """
+        with self.lock:
+            stats = dict(self.metrics)
+            answered = stats['hits'] + stats['negativeHits'] + stats['bloomRejects']
+            lookups = answered + stats['misses']
+            stats['hitRate'] = answered / lookups if lookups else 0.0
+            stats['positiveSize'] = len(self.positive)
+            stats['negativeSize'] = len(self.negative)
+            stats['bloomReady'] = self.bloom_block is not None
+            stats['bloomItems'] = self.bloom.count if self.bloom is not None else 0
+            stats['bloomBlock'] = self.bloom_block
+            return stats
+
+
+# Shared instance used by the routes, kept current by the credential log watcher
+verification_cache = VerificationCache()
+credential_cache.add_listener(verification_cache)
@@ -4,6 +4,9 @@ import json
 import dotenv
 from backend.abis.issuer_registry import ABI as ISSUER_REGISTRY_ABI
 from backend.abis.credential_verification import ABI as CREDENTIAL_VERIFICATION_ABI
+from backend.classes.rpc_provider import PooledHTTPProvider
+from backend.classes.lazy_handle import LazyHandle
+from backend.classes.abi_codec import ContractCodec
 
 dotenv.load_dotenv()
 
@@ -15,12 +18,14 @@ NETWORKS = {
     'local': {
         'url': 'http://127.0.0.1:8545',
         'issuer_registry': '0x5fbdb2315678afecb367f032d93f642f64180aa3',
-        'credential_verification': '0xe7f1725E7734CE288F8367e1Bb143E90bb3F0512'
+        'credential_verification': '0xe7f1725E7734CE288F8367e1Bb143E90bb3F0512',
+        'confirmations': 0  # Hardhat automines, no reorgs
     },
     'sepolia': {
         'url': os.getenv('API_URL'),  # Get Alchemy URL from .env
         'issuer_registry': os.getenv('ISSUER_REGISTRY_ADDRESS'),  # Get deployed address from .env
-        'credential_verification': os.getenv('CREDENTIAL_VERIFICATION_ADDRESS')  # Get deployed address from .env
+        'credential_verification': os.getenv('CREDENTIAL_VERIFICATION_ADDRESS'),  # Get deployed address from .env
+        'confirmations': 12
     }
 }
 
@@ -31,15 +36,142 @@ CONNECTION_STRING = os.getenv('CONNECTION_STRING')
 SECRET_KEY = os.getenv('SECRET_KEY')
 JWT_SECRET_KEY = os.getenv('JWT_SECRET_KEY')
 
+# Postgres connection pool shared by all the routes
+DB_POOL_MAX_SIZE = int(os.getenv('DB_POOL_MAX_SIZE', '10'))
+DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', '30'))
+DB_POOL_HEALTH_CHECK_AFTER = float(os.getenv('DB_POOL_HEALTH_CHECK_AFTER', '30'))
+# Apply pending schema migrations (backend/migrations) when the app starts,
+# turn off to run scripts/migrate.py as a separate deploy step instead
+DB_AUTO_MIGRATE = os.getenv('DB_AUTO_MIGRATE', 'true').lower() == 'true'
+
+# Holder credential cache for /api/pull-credentials
+CREDENTIAL_CACHE_MAX_HOLDERS = int(os.getenv('CREDENTIAL_CACHE_MAX_HOLDERS', '10000'))
+CREDENTIAL_CACHE_TTL = float(os.getenv('CREDENTIAL_CACHE_TTL', '60'))
+# How often (seconds) background tasks poll the chain for new logs
+CHAIN_POLL_INTERVAL = float(os.getenv('CHAIN_POLL_INTERVAL', '5'))
+# Requests per JSON-RPC batch POST
+RPC_BATCH_SIZE = int(os.getenv('RPC_BATCH_SIZE', '100'))
+# Most hashes accepted by one /api/verifier/verify-credentials call
+VERIFY_BATCH_MAX_HASHES = int(os.getenv('VERIFY_BATCH_MAX_HASHES', '10000'))
+# Verification result cache: valid results are kept (credentials can't be
+# removed), invalid ones only for VERIFY_NEGATIVE_TTL seconds
+VERIFY_CACHE_MAX_POSITIVE = int(os.getenv('VERIFY_CACHE_MAX_POSITIVE', '1000000'))
+VERIFY_CACHE_MAX_NEGATIVE = int(os.getenv('VERIFY_CACHE_MAX_NEGATIVE', '100000'))
+VERIFY_NEGATIVE_TTL = float(os.getenv('VERIFY_NEGATIVE_TTL', '30'))
+# Bloom filter of issued credential hashes (needs the chain indexer)
+BLOOM_CAPACITY = int(os.getenv('BLOOM_CAPACITY', '1000000'))
+BLOOM_ERROR_RATE = float(os.getenv('BLOOM_ERROR_RATE', '0.01'))
+# Background credential issuance: jobs kept in the sending process's memory, jobs
+# allowed to wait for the submitter, seconds between receipt polls
+ISSUANCE_MAX_JOBS = int(os.getenv('ISSUANCE_MAX_JOBS', '10000'))
+ISSUANCE_QUEUE_SIZE = int(os.getenv('ISSUANCE_QUEUE_SIZE', '1000'))
+RECEIPT_POLL_INTERVAL = float(os.getenv('RECEIPT_POLL_INTERVAL', '2'))
+# Seconds a job stays in the issuance_jobs table after its last change
+ISSUANCE_JOB_RETENTION = float(os.getenv('ISSUANCE_JOB_RETENTION', str(7 * 24 * 3600)))
+# Seconds a sent issuance transaction may go without a receipt before it is
+# rebroadcast with bumped fees, and how many bumps before its jobs fail
+ISSUANCE_RECEIPT_TIMEOUT = float(os.getenv('ISSUANCE_RECEIPT_TIMEOUT', '180'))
+ISSUANCE_MAX_FEE_BUMPS = int(os.getenv('ISSUANCE_MAX_FEE_BUMPS', '3'))
+# Queued credentials of one issuer are sent together with storeCredentials,
+# waiting up to ISSUANCE_BATCH_WINDOW seconds for at most ISSUANCE_BATCH_SIZE.
+# Off (1, one storeCredential per credential) by default: the deployed
+# CredentialVerification predates storeCredentials, so batches revert until
+# it is redeployed (scripts/deploy.js). A redeploy is a new contract with
+# empty storage: the credentials issued so far stay on the old address, so
+# CREDENTIAL_VERIFICATION_ADDRESS, the indexer tables and INDEXER_START_BLOCK
+# and the issuer Merkle root have to be set up again for it (see README)
+ISSUANCE_BATCH_SIZE = int(os.getenv('ISSUANCE_BATCH_SIZE', '1'))
+ISSUANCE_BATCH_WINDOW = float(os.getenv('ISSUANCE_BATCH_WINDOW', '1'))
+# Longest CSV field accepted by the bulk import (base64 documents)
+BULK_IMPORT_MAX_FIELD_SIZE = int(os.getenv('BULK_IMPORT_MAX_FIELD_SIZE', str(16 * 1024 * 1024)))
+# EIP-1559 fees: blocks and tip percentile eth_feeHistory looks at, and the
+# smallest tip we offer (wei)
+FEE_HISTORY_BLOCKS = int(os.getenv('FEE_HISTORY_BLOCKS', '10'))
+FEE_PRIORITY_PERCENTILE = float(os.getenv('FEE_PRIORITY_PERCENTILE', '50'))
+FEE_MIN_PRIORITY_FEE = int(os.getenv('FEE_MIN_PRIORITY_FEE', '100000000'))
+# Gas estimates are memoized per call shape and padded by this factor
+GAS_ESTIMATE_MARGIN = float(os.getenv('GAS_ESTIMATE_MARGIN', '1.2'))
+GAS_ESTIMATE_CACHE_SIZE = int(os.getenv('GAS_ESTIMATE_CACHE_SIZE', '1024'))
+# Chain head tracker: seconds between eth_blockNumber polls, and how old the
+# cached head may get before readers go to the RPC themselves
+BLOCK_POLL_INTERVAL = float(os.getenv('BLOCK_POLL_INTERVAL', '2'))
+BLOCK_HEAD_MAX_AGE = float(os.getenv('BLOCK_HEAD_MAX_AGE', '15'))
+# bcrypt cost factor of new password hashes, and how many hash/check calls
+# run at once in the native thread pool
+BCRYPT_ROUNDS = int(os.getenv('BCRYPT_ROUNDS', '12'))
+PASSWORD_HASH_WORKERS = int(os.getenv('PASSWORD_HASH_WORKERS', '4'))
+# Bulk account provisioning: hashing processes (defaults to one per CPU)
+# and the most accounts one upload to /api/admin/accounts/bulk may hold
+PROVISION_WORKERS = int(os.getenv('PROVISION_WORKERS', str(os.cpu_count() or 1)))
+PROVISION_MAX_ROWS = int(os.getenv('PROVISION_MAX_ROWS', '5000'))
+# Login rate limits: attempts allowed per client IP and per username in any
+# LOGIN_LIMIT_WINDOW seconds. LOGIN_LIMIT_SHARED keeps the counters in
+# Postgres so every worker enforces the same limit. TRUSTED_PROXY_COUNT is
+# how many proxies in front of the app append to X-Forwarded-For, the client
+# IP is read from there; it defaults to 1 on Heroku (DYNO is set) for its
+# router, 0 elsewhere
+LOGIN_LIMIT_WINDOW = float(os.getenv('LOGIN_LIMIT_WINDOW', '60'))
+LOGIN_LIMIT_PER_IP = int(os.getenv('LOGIN_LIMIT_PER_IP', '30'))
+LOGIN_LIMIT_PER_USERNAME = int(os.getenv('LOGIN_LIMIT_PER_USERNAME', '5'))
+LOGIN_LIMIT_MAX_KEYS = int(os.getenv('LOGIN_LIMIT_MAX_KEYS', '100000'))
+LOGIN_LIMIT_SHARED = os.getenv('LOGIN_LIMIT_SHARED', 'false').lower() == 'true'
+TRUSTED_PROXY_COUNT = int(os.getenv('TRUSTED_PROXY_COUNT', '1' if os.getenv('DYNO') else '0'))
+# Accounts rows cached per username for the login route (seconds, entries)
+ACCOUNT_CACHE_TTL = float(os.getenv('ACCOUNT_CACHE_TTL', '30'))
+ACCOUNT_CACHE_MAX_SIZE = int(os.getenv('ACCOUNT_CACHE_MAX_SIZE', '10000'))
+# Verified JWT claims kept per token (0 turns the cache off), and the share
+# of /api/me requests written to the structured auth log
+JWT_CACHE_MAX_SIZE = int(os.getenv('JWT_CACHE_MAX_SIZE', '10000'))
+AUTH_LOG_SAMPLE_RATE = float(os.getenv('AUTH_LOG_SAMPLE_RATE', '0.01'))
+# Account/issuer listings: default and largest keyset page, and rows per
+# round trip of the server-side cursor behind full exports
+LIST_PAGE_SIZE = int(os.getenv('LIST_PAGE_SIZE', '100'))
+LIST_PAGE_SIZE_MAX = int(os.getenv('LIST_PAGE_SIZE_MAX', '1000'))
+EXPORT_ITERSIZE = int(os.getenv('EXPORT_ITERSIZE', '2000'))
+# Multi-sig approvals: seconds the polling routes may serve a worker's cached
+# copy, and how long a worker sending an approved root keeps its claim
+MULTISIG_CACHE_TTL = float(os.getenv('MULTISIG_CACHE_TTL', '2'))
+MULTISIG_CLAIM_TIMEOUT = float(os.getenv('MULTISIG_CLAIM_TIMEOUT', '600'))
+# Socket.IO message queue so every worker's emits reach all the clients:
+# 'postgres' (LISTEN/NOTIFY on CONNECTION_STRING, or give a postgres:// URL),
+# any other URL goes to Flask-SocketIO as is, empty for a single process
+SOCKETIO_MESSAGE_QUEUE = os.getenv('SOCKETIO_MESSAGE_QUEUE', '')
+
 # assert JWT_SECRET_KEY, "JWT_SECRET_KEY is not set!"
 
 # Web3 setup
 network_config = NETWORKS[NETWORK]
-w3 = Web3(Web3.HTTPProvider(network_config['url']))
 
-# Contract addresses
-ISSUER_REGISTRY_ADDRESS = Web3.to_checksum_address(network_config['issuer_registry'])
-CREDENTIAL_VERIFICATION_ADDRESS = Web3.to_checksum_address(network_config['credential_verification'])
+# Chain event indexer (scripts/run_indexer.py); the read routes only use
+# the index when INDEXER_ENABLED is set, i.e. when the indexer is running
+INDEXER_ENABLED = os.getenv('INDEXER_ENABLED', 'false').lower() == 'true'
+INDEXER_CONFIRMATIONS = int(os.getenv('INDEXER_CONFIRMATIONS', network_config['confirmations']))
+INDEXER_BATCH_SIZE = int(os.getenv('INDEXER_BATCH_SIZE', '2000'))
+INDEXER_START_BLOCK = int(os.getenv('INDEXER_START_BLOCK', '0'))
+
+# RPC provider: extra URLs (comma separated) to fail over to, keep-alive
+# connections (one per greenlet calling the node at once), per-request
+# timeout and the retry policy for rate limits and node errors
+RPC_FALLBACK_URLS = [url.strip() for url in os.getenv('RPC_FALLBACK_URLS', '').split(',') if url.strip()]
+RPC_POOL_SIZE = int(os.getenv('RPC_POOL_SIZE', '50'))
+RPC_TIMEOUT = float(os.getenv('RPC_TIMEOUT', '30'))
+RPC_MAX_RETRIES = int(os.getenv('RPC_MAX_RETRIES', '5'))
+RPC_BACKOFF_BASE = float(os.getenv('RPC_BACKOFF_BASE', '0.25'))
+RPC_BACKOFF_MAX = float(os.getenv('RPC_BACKOFF_MAX', '8'))
+RPC_FAILOVER_COOLDOWN = float(os.getenv('RPC_FAILOVER_COOLDOWN', '30'))
+
+
+def connect():
+    """The Web3 instance of this process (nothing is sent to the node yet)"""
+    return Web3(PooledHTTPProvider(
+        [network_config['url']] + RPC_FALLBACK_URLS,
+        pool_size=RPC_POOL_SIZE,
+        timeout=RPC_TIMEOUT,
+        max_retries=RPC_MAX_RETRIES,
+        backoff_base=RPC_BACKOFF_BASE,
+        backoff_max=RPC_BACKOFF_MAX,
+        cooldown=RPC_FAILOVER_COOLDOWN
+    ))
 
 
 # Load contract ABI
@@ -54,13 +186,26 @@ def load_contract_abi(contract_name):
     with open(artifact_path) as f:
         return json.load(f)['abi']
 
-# Initialize contracts
-issuer_registry = w3.eth.contract(
-    address=ISSUER_REGISTRY_ADDRESS,
-    abi=ISSUER_REGISTRY_ABI
+
+def contract(address_key, abi):
+    """Factory for a contract handle, the address is checksummed on first use"""
+    return lambda: w3.get().eth.contract(
+        address=Web3.to_checksum_address(network_config[address_key]),
+        abi=abi
+    )
+
+
+# Web3 and the contracts are built on first use in each process, so importing
+# the app stays cheap, a bad RPC URL or address only fails the calls that
+# need it, and forked workers don't share the parent's connections
+w3 = LazyHandle(connect, 'w3')
+issuer_registry = LazyHandle(contract('issuer_registry', ISSUER_REGISTRY_ABI), 'issuer_registry')
+credential_verification = LazyHandle(
+    contract('credential_verification', CREDENTIAL_VERIFICATION_ABI), 'credential_verification'
 )
 
-credential_verification = w3.eth.contract(
-    address=CREDENTIAL_VERIFICATION_ADDRESS,
-    abi=CREDENTIAL_VERIFICATION_ABI
-) 
\ No newline at end of file
+# Precompiled codecs for the hot calls, they skip web3's per-call ABI lookup
+# and argument normalisation
+credential_calls = ContractCodec(credential_verification, CREDENTIAL_VERIFICATION_ABI, [
+    'verifyCredential', 'pullCredential', 'storeCredential', 'storeCredentials'
+])
@@ -0,0 +1,39 @@
+-- The accounts and issuers tables the routes have always used. Databases
+-- created before migrations existed already have them, so this only fills in
+-- what's missing and fixes the columns the old models.py got wrong.
+
+CREATE TABLE IF NOT EXISTS accounts (
+    address VARCHAR(255) PRIMARY KEY,
+    username VARCHAR(255) NOT NULL,
+    passhash VARCHAR(255),
+    role VARCHAR(1)
+);
+
+CREATE TABLE IF NOT EXISTS issuers (
+    id VARCHAR(255) PRIMARY KEY,
+    name VARCHAR(255),
+    signature VARCHAR(300),
+    entropy TEXT
+);
+
+-- models.py had an integer (serial) address, the routes store hex addresses
+DO $$
+BEGIN
+    IF (SELECT data_type FROM information_schema.columns
+        WHERE table_schema = current_schema() AND table_name = 'accounts' AND column_name = 'address') <> 'character varying' THEN
+        ALTER TABLE accounts ALTER COLUMN address DROP DEFAULT;
+        ALTER TABLE accounts ALTER COLUMN address TYPE VARCHAR(255) USING address::text;
+    END IF;
+
+    -- update_account finds accounts by address
+    IF NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conrelid = 'accounts'::regclass AND contype = 'p') THEN
+        ALTER TABLE accounts ADD PRIMARY KEY (address);
+    END IF;
+END $$;
+
+-- Login, account creation and deletion all look accounts up by username.
+-- Same name as the constraint models.py created, so it's skipped there
+CREATE UNIQUE INDEX IF NOT EXISTS accounts_username_key ON accounts (username);
+
+-- /register stores each issuer's entropy, models.py never had the column
+ALTER TABLE issuers ADD COLUMN IF NOT EXISTS entropy TEXT;
@@ -0,0 +1,17 @@
+-- Indexes for the lookups the routes run on every request. Plain CREATE
+-- INDEX (not CONCURRENTLY) so it runs in the migration's transaction; it
+-- blocks writes to these small tables for the moment it takes.
+
+-- Issuer ids are stored as sent (checksummed by /admin/create-issuer,
+-- whatever the wallet gave /register) but get-entropy and the bulk issuance
+-- route look them up lower-cased. One row per address whatever the case;
+-- text_pattern_ops also serves the `q` prefix search of /get-issuers
+CREATE UNIQUE INDEX IF NOT EXISTS issuers_lower_id_key ON issuers (lower(id) text_pattern_ops);
+CREATE INDEX IF NOT EXISTS issuers_name_prefix_idx ON issuers (name text_pattern_ops);
+
+-- Same for account addresses, the admin search matches them case-insensitively
+CREATE UNIQUE INDEX IF NOT EXISTS accounts_lower_address_key ON accounts (lower(address) text_pattern_ops);
+-- LIKE 'prefix%' can't use accounts_username_key unless the database collation is C
+CREATE INDEX IF NOT EXISTS accounts_username_prefix_idx ON accounts (username text_pattern_ops);
+-- /admin/get-accounts?role=...: keyset pages in username order within a role
+CREATE INDEX IF NOT EXISTS accounts_role_username_idx ON accounts (role, username);
@@ -0,0 +1,38 @@
+-- Tables the chain indexer and the shared login limiter used to create
+-- themselves, now versioned with the rest of the schema
+
+CREATE TABLE IF NOT EXISTS indexed_credentials (
+    credential_hash VARCHAR(66) PRIMARY KEY,
+    issuer VARCHAR(42) NOT NULL,
+    holder VARCHAR(42) NOT NULL,
+    issued_at BIGINT NOT NULL,
+    data TEXT NOT NULL,
+    block_number BIGINT NOT NULL,
+    transaction_hash VARCHAR(66) NOT NULL,
+    log_index INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS indexed_credentials_holder_idx
+    ON indexed_credentials (holder, block_number, log_index);
+CREATE INDEX IF NOT EXISTS indexed_credentials_block_idx
+    ON indexed_credentials (block_number);
+
+CREATE TABLE IF NOT EXISTS indexed_merkle_roots (
+    block_number BIGINT NOT NULL,
+    log_index INTEGER NOT NULL,
+    merkle_root VARCHAR(66) NOT NULL,
+    transaction_hash VARCHAR(66) NOT NULL,
+    PRIMARY KEY (block_number, log_index)
+);
+
+CREATE TABLE IF NOT EXISTS indexer_checkpoints (
+    name VARCHAR(64) PRIMARY KEY,
+    block_number BIGINT NOT NULL,
+    block_hash VARCHAR(66) NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS login_rate_limits (
+    key VARCHAR(320) NOT NULL,
+    window_index BIGINT NOT NULL,
+    hits INTEGER NOT NULL,
+    PRIMARY KEY (key, window_index)
+);
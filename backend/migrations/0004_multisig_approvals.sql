@@ -0,0 +1,27 @@
+-- Multi-sig Merkle root approvals, shared by every worker instead of kept
+-- in each process's memory
+
+-- One row per root waiting for its second signature. claimed_at is set
+-- while the worker that got the second signature sends the transaction
+CREATE TABLE IF NOT EXISTS multisig_pending (
+    merkle_root VARCHAR(66) PRIMARY KEY,
+    first_admin VARCHAR(42) NOT NULL,
+    first_signature TEXT NOT NULL,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    claimed_at TIMESTAMPTZ
+);
+
+-- The last_successful_update and last_update results of the multi-sig routes
+CREATE TABLE IF NOT EXISTS multisig_results (
+    name VARCHAR(32) PRIMARY KEY,
+    merkle_root VARCHAR(66) NOT NULL,
+    transaction_hash VARCHAR(66) NOT NULL,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+-- Socket.IO messages too big for a NOTIFY payload, see pg_pubsub
+CREATE TABLE IF NOT EXISTS socketio_messages (
+    id BIGSERIAL PRIMARY KEY,
+    payload TEXT NOT NULL,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
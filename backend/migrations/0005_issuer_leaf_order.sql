@@ -0,0 +1,27 @@
+-- Issuer Merkle leaves in a stored order. The tree used to be built from the
+-- issuers rows in heap order, which an UPDATE changes, so a restarted or
+-- another worker could build a root different from the one on chain.
+-- Adding the BIGSERIAL numbers the existing rows in the order a plain scan
+-- returns them, i.e. the order the current root was built in; new issuers
+-- get the next position and an ON CONFLICT update keeps the old one
+ALTER TABLE issuers ADD COLUMN IF NOT EXISTS leaf_position BIGSERIAL;
+CREATE UNIQUE INDEX IF NOT EXISTS issuers_leaf_position_key ON issuers (leaf_position);
+
+-- Every write to issuers, whoever makes it, is announced on issuers_changed
+-- so each worker's cached tree can catch up (IssuerVerification.watch)
+CREATE OR REPLACE FUNCTION notify_issuers_changed() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        PERFORM pg_notify('issuers_changed', json_build_object('id', lower(OLD.id))::text);
+        RETURN OLD;
+    END IF;
+    PERFORM pg_notify('issuers_changed', json_build_object(
+        'id', lower(NEW.id), 'name', NEW.name, 'signature', NEW.signature
+    )::text);
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS issuers_changed ON issuers;
+CREATE TRIGGER issuers_changed AFTER INSERT OR UPDATE OR DELETE ON issuers
+    FOR EACH ROW EXECUTE FUNCTION notify_issuers_changed();
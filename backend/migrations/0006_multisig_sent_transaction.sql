@@ -0,0 +1,4 @@
+-- The updateMerkleRoot transaction sent for an approved root. Once it is set
+-- the claim never expires: the transaction may still be mined, so the root
+-- is only sent again if the node no longer knows the transaction
+ALTER TABLE multisig_pending ADD COLUMN IF NOT EXISTS transaction_hash VARCHAR(66);
@@ -0,0 +1,18 @@
+-- Credential issuance jobs, so GET /api/issuer/jobs/<id> answers on every
+-- worker and not only the one that queued the job. Times are Unix seconds,
+-- as the job dicts and the status route have them
+CREATE TABLE IF NOT EXISTS issuance_jobs (
+    id VARCHAR(32) PRIMARY KEY,
+    status VARCHAR(16) NOT NULL,
+    credential_hash VARCHAR(66) NOT NULL,
+    issuer_address VARCHAR(42) NOT NULL,
+    holder_address VARCHAR(42) NOT NULL,
+    transaction_hash VARCHAR(66),
+    block_number BIGINT,
+    batch_size INTEGER,
+    error TEXT,
+    created_at DOUBLE PRECISION NOT NULL,
+    updated_at DOUBLE PRECISION NOT NULL
+);
+-- Old jobs are deleted by age
+CREATE INDEX IF NOT EXISTS issuance_jobs_updated_at_idx ON issuance_jobs (updated_at);
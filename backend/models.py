@@ -2,19 +2,25 @@ from flask_sqlalchemy import SQLAlchemy
  
 db = SQLAlchemy()
 
+# The tables themselves are created and changed by the migrations in
+# backend/migrations (scripts/migrate.py), keep these in step with them
+
 class Issuers(db.Model):
     id = db.Column(db.String(255), primary_key=True)
     name = db.Column(db.String(255))
     signature = db.Column(db.String(300))
+    entropy = db.Column(db.Text)
+    # Order of the issuer's leaf in the Merkle tree
+    leaf_position = db.Column(db.BigInteger, unique=True, autoincrement=True)
 
     def __repr__(self):
         return f"Issuer with ID {self.id} and Name {self.name}"
 
 class Accounts(db.Model):
-    address = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    address = db.Column(db.String(255), primary_key=True)
     username = db.Column(db.String(255), nullable=False, unique=True)
     passhash = db.Column(db.String(255))
     role = db.Column(db.String(1))
 
     def __repr__(self):
-        return f"Account with ID {self.id} and Email {self.email}"
\ No newline at end of file
+        return f"Account with Address {self.address} and Username {self.username}"
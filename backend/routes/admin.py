@@ -1,67 +1,62 @@
 from backend.routes import admin_bp
-from flask import jsonify, request
+from flask import jsonify, request, Response, stream_with_context
 from web3 import Web3
-from backend.classes.issue_verification import IssuerVerification
-from backend.config import w3, issuer_registry, PRIVATE_KEY, CONNECTION_STRING
-import os
+from backend.classes.issue_verification import issuer_verification
+from backend.config import w3, issuer_registry, PROVISION_MAX_ROWS
+from backend.classes.nonce_manager import nonce_manager
+from backend.classes.fee_oracle import fee_oracle
+from backend.classes.block_tracker import block_tracker
+from backend.classes.connection_pool import db_pool
+from backend.classes.credential_cache import credential_cache
+from backend.classes.verification_cache import verification_cache
+from backend.classes.issuance_queue import issuance_queue
+from backend.classes.password_hasher import password_hasher
+from backend.classes.login_guard import login_guard, account_cache
+from backend.classes.jwt_cache import jwt_cache
+from backend.classes.sampled_log import auth_log
+from backend.classes.approval_store import approval_store
+from backend.classes import data_access
+from backend.classes.provisioning import provision
+from backend.classes.bulk_import import upload_from_request, iter_rows
+from backend.classes.listing import page_size, like_prefix, where, fetch_page, stream_rows, ndjson, json_array
 import psycopg2
-import bcrypt
 import json
 
 @admin_bp.route('/update-merkle-root', methods=['POST'])
 def update_merkle_root():
     """Update the Merkle root in the smart contract (Admin only)"""
     try:
-        verifier = IssuerVerification()
-        try:
-            #causing the error
-            new_root = verifier.get_merkle_root()
-            # Convert hex string to bytes32
-            root_bytes = Web3.to_bytes(hexstr=new_root)
-            #print root_bytes
-            print(f'root_bytes: {root_bytes}')
-            print(f'type of root_bytes: {type(root_bytes)}')
-            if len(root_bytes) != 32:
-                print(len(root_bytes))
-                raise ValueError("Merkle root must be exactly 32 bytes")
-            print(f'root_bytes: {root_bytes}')
-            print(f'type of root_bytes: {type(root_bytes)}')
-
-            
-           # Get account from private key
-            account = w3.eth.account.from_key(PRIVATE_KEY)
-
-            # Get the nonce and gas price
-            nonce = w3.eth.get_transaction_count(account.address)
-            gas_price = w3.eth.gas_price
-
-            # Build transaction using legacy format
-            tx = issuer_registry.functions.updateMerkleRoot(
-                root_bytes
-            ).build_transaction({
-                'from': account.address,
-                'nonce': nonce,
-                'gas': 200000,
-                'gasPrice': gas_price,  
-                'chainId': 11155111
-            })
-
-            # Sign and send transaction
-            signed_tx = w3.eth.account.sign_transaction(tx, PRIVATE_KEY)
-
-            tx_hash = w3.eth.send_raw_transaction(signed_tx.rawTransaction)
-            
-            # Wait for transaction receipt
-            receipt = w3.eth.wait_for_transaction_receipt(tx_hash)
-            
-            return jsonify({
-                'success': True,
-                'merkleRoot': new_root,
-                'transactionHash': receipt.transactionHash.hex()
-            })
-        finally:
-            verifier.close()
-            
+        #causing the error
+        new_root = issuer_verification.get_merkle_root()
+        # Convert hex string to bytes32
+        root_bytes = Web3.to_bytes(hexstr=new_root)
+        #print root_bytes
+        print(f'root_bytes: {root_bytes}')
+        print(f'type of root_bytes: {type(root_bytes)}')
+        if len(root_bytes) != 32:
+            print(len(root_bytes))
+            raise ValueError("Merkle root must be exactly 32 bytes")
+        print(f'root_bytes: {root_bytes}')
+        print(f'type of root_bytes: {type(root_bytes)}')
+
+        
+        call = issuer_registry.functions.updateMerkleRoot(root_bytes)
+
+        # Gas, fees and chain ID come cached from the fee oracle, the nonce from the nonce manager
+        params = fee_oracle.transaction_params(call, ('updateMerkleRoot',), nonce_manager.address, 200000)
+
+        # Sign and send transaction
+        tx_hash = nonce_manager.send_transaction(lambda nonce: call.build_transaction(dict(params, nonce=nonce)))
+        
+        # Wait for transaction receipt
+        receipt = w3.eth.wait_for_transaction_receipt(tx_hash)
+        
+        return jsonify({
+            'success': True,
+            'merkleRoot': new_root,
+            'transactionHash': receipt.transactionHash.hex()
+        })
+
     except Exception as e:
         print(f"Error in update_merkle_root: {str(e)}")  # Add logging
         return jsonify({'error': str(e)}), 500
@@ -74,80 +69,109 @@ def create_account():
         passwd = request.form.get('password')
         address = request.form.get('address')
         role = request.form.get('role')
-        with psycopg2.connect(CONNECTION_STRING) as conn:
-            # If the username does not already exist, create the new account
-            cursor = conn.cursor()
-            isNewUserUniqueQuery = "SELECT NOT EXISTS(SELECT 1 FROM accounts WHERE username=%s)"
-            cursor.execute(isNewUserUniqueQuery, (username,))
-            newUserIsUnique = cursor.fetchone()[0]
-            if (newUserIsUnique):
-                salt = bcrypt.gensalt()
-                pepper = os.getenv('PEPPER')
-                passhash = bcrypt.hashpw(passwd.encode('utf-8'), salt+pepper.encode('utf-8'))
-                insertAccount = "INSERT INTO accounts VALUES (%s, %s, %s, %s);"
-                cursor.execute(insertAccount, (address, username, passhash.hex(), role))
-                cursor.close()
-                conn.commit()
-                return jsonify({"message": f"Successfully added account for {username} with address {address}"}), 200
-            else:
-                return jsonify({"message": "This username already exists"}), 409
+        # bcrypt runs in the hasher's thread pool, not on the hub
+        passhash = password_hasher.hash(passwd)
+        try:
+            # Inserted only if the username and address are free, in one statement
+            data_access.create_account(address, username, passhash, role)
+        except data_access.AccountExists as e:
+            return jsonify({"message": str(e)}), 409
+        account_cache.invalidate(username)
+        return jsonify({"message": f"Successfully added account for {username} with address {address}"}), 200
 
     except (Exception, psycopg2.DatabaseError) as e:
         print(f"There was an error during creating an account: {e}")
-        conn.rollback()
         return jsonify({'error': str(e)}), 500
     
+@admin_bp.route('/accounts/bulk', methods=['POST'])
+def provision_accounts():
+    """
+    Create every account of an uploaded CSV or NDJSON file.
+
+    Rows have username, password, address and optionally role (H by
+    default). Send the file as the `file` field of a multipart form, or as
+    the raw body. Passwords are hashed in parallel and the accounts written
+    in one transaction; the response counts them and lists each row that
+    was invalid or clashed with an existing account. scripts/provision_accounts.py
+    does the same from the command line.
+    """
+    try:
+        stream, fmt = upload_from_request(request)
+        report = provision(iter_rows(stream, fmt), max_rows=PROVISION_MAX_ROWS)
+        # Unknown usernames are cached too, forget them now that they exist
+        for account in report['accounts']:
+            account_cache.invalidate(account['username'])
+        return jsonify(dict(report, success=True)), 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except (Exception, psycopg2.DatabaseError) as e:
+        print(f"There was an error while provisioning accounts: {e}")
+        return jsonify({'error': str(e)}), 500
+
 @admin_bp.route('/delete-account', methods=['DELETE'])
 def delete_account():
     """Remove user account from the database"""
     try: 
-        with psycopg2.connect(CONNECTION_STRING) as conn:   
-            cursor = conn.cursor()
-            data = request.json
-            username = data.get('username')
-
-            if not username:
-                return jsonify({'error': 'Username is required'}), 400
-            
-            getUserInfo = "SELECT * FROM accounts where username=%s"
-            cursor.execute(getUserInfo, (username,))
-            userInfo = cursor.fetchone()
-
-            if not userInfo:
-                return jsonify({"message": "This username does not exist"}), 404
-            
-            address = userInfo[0]
-            role = userInfo[2]
-
-            if role in ["H", "V", "I"]:
-                removeUser = "DELETE FROM accounts WHERE username=%s"
-                cursor.execute(removeUser, (username,))
-                conn.commit()
-            else:
-                # Do logic to ask for multi-admin signature
-                removeUser = "DELETE FROM accounts WHERE username=%s"
-                cursor.execute(removeUser, (username,))
-                conn.commit()
-
-            cursor.close()
-            return jsonify({"message":f"Account {username} with address {address} successfully removed."}), 200
+        data = request.json
+        username = data.get('username')
+
+        if not username:
+            return jsonify({'error': 'Username is required'}), 400
+
+        deleted = data_access.delete_account(username)
+        if not deleted:
+            return jsonify({"message": "This username does not exist"}), 404
+
+        address = deleted[0]
+        account_cache.invalidate(username)
+        return jsonify({"message":f"Account {username} with address {address} successfully removed."}), 200
     
     except (Exception, psycopg2.DatabaseError) as e:
         print(f"There was an error while deleting an account: {e}")
-        conn.rollback()
         return jsonify({"error": str(e)}), 500
     
 @admin_bp.route('/get-accounts', methods=['GET'])
 def get_accounts():
-     """Get all user accounts from the database"""
+     """
+     Get user accounts from the database
+
+     Without parameters every account is streamed as the original JSON array
+     of [address, username, role]. `limit` and `after` (the nextCursor of
+     the previous page) return one keyset page ordered by username, and
+     `format=ndjson` streams a full export one account per line. `role` and
+     `q` (username or address prefix) filter all three.
+     """
      try:
-         with psycopg2.connect(CONNECTION_STRING) as conn:
-             cursor = conn.cursor()
-             getAllAccounts = "SELECT address, username, role FROM accounts"
-             cursor.execute(getAllAccounts)
-             accounts = cursor.fetchall()
-             cursor.close()
-             return jsonify(accounts), 200
+         role = request.args.get('role')
+         prefix = request.args.get('q')
+         after = request.args.get('after')
+         export_format = request.args.get('format')
+         paged = 'limit' in request.args or after is not None
+         limit = page_size(request.args.get('limit'))
+
+         clause, params = where([
+             ("role = %s", [role.upper()]) if role else (None, None),
+             # lower(address) so the prefix search can use accounts_lower_address_key
+             ("(username LIKE %s OR lower(address) LIKE %s)", [like_prefix(prefix), like_prefix(prefix.lower())]) if prefix else (None, None),
+             ("username > %s", [after]) if after is not None else (None, None)
+         ])
+         getAccounts = "SELECT address, username, role FROM accounts" + clause
+
+         if paged:
+             accounts, has_more = fetch_page(getAccounts, params, "username", limit)
+             return jsonify({
+                 'success': True,
+                 'accounts': [{'address': a, 'username': u, 'role': r} for a, u, r in accounts],
+                 'nextCursor': accounts[-1][1] if has_more else None
+             }), 200
+
+         rows = stream_rows(getAccounts + " ORDER BY username", params)
+         if export_format == 'ndjson':
+             body = ndjson(rows, lambda row: {'address': row[0], 'username': row[1], 'role': row[2]})
+             return Response(stream_with_context(body), mimetype='application/x-ndjson')
+         return Response(stream_with_context(json_array(rows, list)), mimetype='application/json')
+     except ValueError as e:
+         return jsonify({"error": str(e)}), 400
      except (Exception, psycopg2.DatabaseError) as e:
          print(f"There was an error while getting all accounts: {e}")
          return jsonify({"error": str(e)}), 500
@@ -158,7 +182,7 @@ def update_account():
      #only want to update the user's role
      #find the user by their address (guaranteed to be unique)
      try:
-         with psycopg2.connect(CONNECTION_STRING) as conn:
+         with db_pool.connection() as conn:
              cursor = conn.cursor()
 
              data = request.json
@@ -170,16 +194,18 @@ def update_account():
 
              role = role.upper()
              if role in ["H", "V", "A", "I"]:
-                 updateAccount = "UPDATE accounts SET role=%s WHERE address=%s"
+                 updateAccount = "UPDATE accounts SET role=%s WHERE address=%s RETURNING username"
                  cursor.execute(updateAccount, (role, address))
+                 updated = cursor.fetchall()
                  conn.commit()
                  cursor.close()
+                 for (username,) in updated:
+                     account_cache.invalidate(username)
                  return jsonify({"message":f"Account {address} successfully updated."}), 200
              else:
                  return jsonify({"message": "This role is not allowed"}), 400
      except (Exception, psycopg2.DatabaseError) as e:
          print(f"There was an error while updating an account: {e}")
-         conn.rollback()
          return jsonify({"error": str(e)}), 500
     
 @admin_bp.route('/create-issuer', methods=['POST'])
@@ -193,14 +219,16 @@ def create_issuer():
 
         if not all([issuer_address, issuer_name, signature]):
             return jsonify({'error': 'Missing required fields'}), 400
+        # One row and one leaf per address whatever its case, like ON CONFLICT ((lower(id)))
+        issuer_address = issuer_address.lower()
 
         # Store in database
-        with psycopg2.connect(CONNECTION_STRING) as conn:
+        with db_pool.connection() as conn:
             with conn.cursor() as cur:
                 cur.execute("""
                     INSERT INTO issuers (id, name, signature) 
                     VALUES (%s, %s, %s)
-                    ON CONFLICT (id) 
+                    ON CONFLICT ((lower(id))) 
                     DO UPDATE SET 
                         name = EXCLUDED.name,
                         signature = EXCLUDED.signature
@@ -209,6 +237,9 @@ def create_issuer():
                 )
             conn.commit()
 
+        # Patch the cached issuer tree instead of rebuilding it
+        issuer_verification.upsert_issuer(issuer_address, issuer_name, signature)
+
         return jsonify({
             'success': True,
             'address': issuer_address,
@@ -216,4 +247,27 @@ def create_issuer():
             'signature': signature
         })
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
\ No newline at end of file
+        return jsonify({'error': str(e)}), 500
+
+@admin_bp.route('/metrics', methods=['GET'])
+def get_metrics():
+    """Get runtime metrics of the backend's shared resources"""
+    try:
+        return jsonify({
+            'success': True,
+            'dbPool': db_pool.stats(),
+            'credentialCache': credential_cache.stats(),
+            'verificationCache': verification_cache.stats(),
+            'issuanceQueue': issuance_queue.stats(),
+            'nonceManager': nonce_manager.stats(),
+            'fees': fee_oracle.stats(),
+            'blockTracker': block_tracker.stats(),
+            'rpc': w3.provider.stats(),
+            'passwordHasher': password_hasher.stats(),
+            'login': login_guard.stats(),
+            'jwtCache': jwt_cache.stats(),
+            'authLog': auth_log.stats(),
+            'multisig': approval_store.stats()
+        }), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
@@ -2,21 +2,18 @@ from backend.routes import admin_bp
 from flask import jsonify, request
 from flask_socketio import emit
 from web3 import Web3
+from web3.exceptions import TimeExhausted, TransactionNotFound
 from eth_account.messages import encode_defunct
 from eth_account import Account
-from backend.classes.issue_verification import IssuerVerification
-from backend.config import w3, issuer_registry, PRIVATE_KEY
+from backend.classes.issue_verification import issuer_verification
+from backend.config import w3, issuer_registry
 from backend.socketio_instance import socketio
+from backend.classes.nonce_manager import nonce_manager
+from backend.classes.fee_oracle import fee_oracle
+from backend.classes.approval_store import approval_store, FIRST, SAME_ADMIN, IN_PROGRESS, SUBMITTED
 
-last_update = None
-
-
-
-# Store temporary signatures in memory
-pending_root_updates = {}
-# Store the final result of the last successful update
-last_successful_update = None
-
+# Pending signatures and the last update results live in Postgres (approval_store)
+# so every worker sees the same ones and they survive restarts
 
 # List of admin addresses (lowercase for consistency)
 ADMIN_ADDRESSES = [
@@ -32,15 +29,11 @@ ADMIN_ADDRESSES = [
 def get_new_root():
     """Get the new Merkle root that needs to be signed"""
     try:
-        verifier = IssuerVerification()
-        try:
-            new_root = verifier.get_merkle_root()
-            return jsonify({
-                'success': True,
-                'merkleRoot': new_root
-            })
-        finally:
-            verifier.close()
+        new_root = issuer_verification.get_merkle_root()
+        return jsonify({
+            'success': True,
+            'merkleRoot': new_root
+        })
     except Exception as e:
         print(f"Error in get_new_root: {str(e)}")
         return jsonify({'error': str(e)}), 500
@@ -69,114 +62,118 @@ def update_merkle_root_multi():
         if recovered_address.lower() != admin_address.lower():
             return jsonify({'error': 'Invalid signature'}), 400
 
-        verifier = IssuerVerification()
-        try:
-            new_root = verifier.get_merkle_root()
-            root_bytes = Web3.to_bytes(hexstr=new_root)
-
-            if len(root_bytes) != 32:
-                raise ValueError("Merkle root must be exactly 32 bytes")
-
-            # Check if this is the first or second signature
-            if new_root not in pending_root_updates:
-                # First signature - reset last_successful_update
-                global last_successful_update
-                last_successful_update = None
-                
-                # Store first signature
-                pending_root_updates[new_root] = {
-                    'first_admin': admin_address.lower(),
-                    'first_signature': signature,
-                    'root_bytes': root_bytes
-                }
-
-                # Emit pending updates to all clients
-                socketio.emit('pending_updates', {
-                    'pending': [
-                        {
-                            'merkleRoot': root,
-                            'firstAdmin': data['first_admin']
-                        }
-                        for root, data in pending_root_updates.items()
-                    ]
-                })
-
-                return jsonify({
-                    'success': True,
-                    'message': 'First signature recorded. Waiting for second admin signature.',
-                    'needsSecondSignature': True,
-                    'merkleRoot': new_root
-                })
-            else:
-                # Verify it's a different admin
-                first_admin = pending_root_updates[new_root]['first_admin']
-                if admin_address.lower() == first_admin:
-                    return jsonify({'error': 'Same admin cannot sign twice'}), 400
+        # The root the admins signed, checked against the issuers table itself
+        # rather than this worker's cached tree
+        new_root = merkle_root.lower()[2:] if merkle_root.lower().startswith('0x') else merkle_root.lower()
+        root_bytes = Web3.to_bytes(hexstr=new_root)
 
-                # We have both signatures, proceed with the update
-                root_bytes = pending_root_updates[new_root]['root_bytes']
+        if len(root_bytes) != 32:
+            raise ValueError("Merkle root must be exactly 32 bytes")
 
-                # Get account from private key
-                account = w3.eth.account.from_key(PRIVATE_KEY)
+        database_root = issuer_verification.get_database_root()
+        if new_root != database_root:
+            return jsonify({
+                'error': 'The signed Merkle root does not match the issuers in the database, sign the current root',
+                'merkleRoot': database_root
+            }), 409
+
+        # Check if this is the first or second signature (this also resets last_successful_update on the first)
+        status, transaction_hash = approval_store.record_signature(new_root, admin_address.lower(), signature)
+        if status == FIRST:
+            # Emit pending updates to all clients (of every worker, through the message queue)
+            socketio.emit('pending_updates', {
+                'pending': approval_store.pending()
+            })
 
-                # Get the nonce and gas price
-                nonce = w3.eth.get_transaction_count(account.address)
-                gas_price = w3.eth.gas_price
+            return jsonify({
+                'success': True,
+                'message': 'First signature recorded. Waiting for second admin signature.',
+                'needsSecondSignature': True,
+                'merkleRoot': new_root
+            })
+        elif status == SAME_ADMIN:
+            return jsonify({'error': 'Same admin cannot sign twice'}), 400
+        elif status == IN_PROGRESS:
+            return jsonify({'error': 'This update is already being submitted'}), 409
+        elif status == SUBMITTED:
+            # Sent earlier, but its receipt never came back to that request
+            return check_sent_update(new_root, transaction_hash)
+        else:
+            # We have both signatures and this worker holds the claim, proceed with the update
+            try:
+                call = issuer_registry.functions.updateMerkleRoot(root_bytes)
 
-                # Build transaction using legacy format
-                tx = issuer_registry.functions.updateMerkleRoot(
-                    root_bytes
-                ).build_transaction({
-                    'from': account.address,
-                    'nonce': nonce,
-                    'gas': 200000,
-                    'gasPrice': gas_price,
-                    'chainId': 11155111
-                })
+                # Gas, fees and chain ID come cached from the fee oracle, the nonce from the nonce manager
+                params = fee_oracle.transaction_params(call, ('updateMerkleRoot',), nonce_manager.address, 200000)
 
                 # Sign and send transaction
-                signed_tx = w3.eth.account.sign_transaction(tx, PRIVATE_KEY)
-                tx_hash = w3.eth.send_raw_transaction(signed_tx.rawTransaction)
-                
-                # Wait for transaction receipt
+                tx_hash = nonce_manager.send_transaction(lambda nonce: call.build_transaction(dict(params, nonce=nonce)))
+            except Exception:
+                # Nothing was sent, keep the first signature so another admin signature can retry it
+                approval_store.release(new_root)
+                raise
+
+            # The transaction may be mined from here on, so the claim stays with its hash
+            transaction_hash = Web3.to_hex(tx_hash)
+            approval_store.mark_sent(new_root, transaction_hash)
+            try:
                 receipt = w3.eth.wait_for_transaction_receipt(tx_hash)
-
-                # Store the final result first
-                last_successful_update = {
-                    'merkleRoot': new_root,
-                    'transactionHash': receipt.transactionHash.hex()
-                }
-
-                # Then clear the pending update
-                del pending_root_updates[new_root]
-
-                global last_update
-                last_update = {
-                    'merkleRoot': new_root,
-                    'transactionHash': receipt.transactionHash.hex()
-                }
-
-                # Notify clients about the update
-                socketio.emit('merkle_root_updated', last_update)
-
-                return jsonify({
-                    'success': True,
-                    'message': 'Merkle root updated successfully',
-                    'merkleRoot': new_root,
-                    'transactionHash': receipt.transactionHash.hex()
-                })
-
-        finally:
-            verifier.close()
+            except TimeExhausted:
+                return sent_update_waiting(new_root, transaction_hash)
+            return finish_update(new_root, receipt)
 
     except Exception as e:
         print(f"Error in update_merkle_root_multi: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
+def sent_update_waiting(merkle_root, transaction_hash):
+    """Response for an update that was sent but isn't mined yet"""
+    return jsonify({
+        'success': True,
+        'message': 'The Merkle root update was sent and is waiting to be mined, sign again to check on it',
+        'merkleRoot': merkle_root,
+        'transactionHash': transaction_hash
+    }), 202
+
+def check_sent_update(merkle_root, transaction_hash):
+    """Finish, keep waiting on, or give up an update whose transaction was already sent"""
+    try:
+        receipt = w3.eth.get_transaction_receipt(transaction_hash)
+    except TransactionNotFound:
+        try:
+            w3.eth.get_transaction(transaction_hash)
+        except TransactionNotFound:
+            # Dropped without being mined, the next signature sends it again
+            approval_store.release(merkle_root)
+            return jsonify({'error': 'The Merkle root update transaction was dropped, sign again to resend it'}), 409
+        return sent_update_waiting(merkle_root, transaction_hash)
+    return finish_update(merkle_root, receipt)
+
+def finish_update(merkle_root, receipt):
+    """Record a mined update transaction and tell the clients"""
+    if receipt.status != 1:  # 1 means success
+        # Mined but reverted, nothing changed on chain so the root can be sent again
+        approval_store.release(merkle_root)
+        return jsonify({'error': 'Merkle root update failed on the blockchain'}), 500
+
+    # Store the results and clear the pending update together
+    last_update = approval_store.complete(merkle_root, receipt.transactionHash.hex())
+
+    # Notify clients about the update
+    socketio.emit('merkle_root_updated', last_update)
+
+    return jsonify({
+        'success': True,
+        'message': 'Merkle root updated successfully',
+        'merkleRoot': merkle_root,
+        'transactionHash': receipt.transactionHash.hex()
+    })
+
 @admin_bp.route('/multi-sig/last_update', methods=['GET'])
-def get_last_update():
+def get_last_successful_update():
     """Get the result of the last successful update"""
     try:
+        last_successful_update = approval_store.last_successful_update()
         if last_successful_update:
             return jsonify({
                 'success': True,
@@ -189,21 +186,16 @@ def get_last_update():
                 'message': 'No successful updates found'
             })
     except Exception as e:
-        print(f"Error in get_last_update: {str(e)}")
+        print(f"Error in get_last_successful_update: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
 @admin_bp.route('/multi-sig/pending-updates', methods=['GET'])
 def get_pending_updates():
     """Get list of pending Merkle root updates"""
     try:
-        pending = [
-            {
-                'merkleRoot': root,
-                'firstAdmin': data['first_admin']
-            }
-            for root, data in pending_root_updates.items()
-        ]
-        
+        pending = approval_store.pending()
+        last_successful_update = approval_store.last_successful_update()
+
         # If there are no pending updates, include the last successful update
         if not pending and last_successful_update:
             return jsonify({
@@ -227,6 +219,7 @@ def get_pending_updates():
 def get_last_update():
     """Get the last updated Merkle root"""
     try:
+        last_update = approval_store.last_update()
         if last_update:
             return jsonify({
                 'success': True,
@@ -244,11 +237,9 @@ def get_last_update():
 @admin_bp.route('/multi-sig/clear-last-update', methods=['POST'])
 def clear_last_update():
     """Clear the stored last successful update"""
-    global last_update
-    if last_update == None:
-        return jsonify({'success': True, 'message': 'Last update already cleared'})
     try:
-        last_update = None
+        if not approval_store.clear_last_update():
+            return jsonify({'success': True, 'message': 'Last update already cleared'})
         print("Last successful update cleared by request.")
         return jsonify({'success': True, 'message': 'Last update cleared successfully.'})
     except Exception as e:
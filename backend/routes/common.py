@@ -1,10 +1,13 @@
 from backend.routes import common_bp
-from flask import request, jsonify
+from flask import request, jsonify, Response, stream_with_context
 from web3 import Web3
 from flask_jwt_extended import create_access_token, jwt_required, get_jwt
-from backend.config import credential_verification, CONNECTION_STRING
-import os
-import bcrypt
+from backend.classes.credential_cache import credential_cache
+from backend.classes.password_hasher import password_hasher
+from backend.classes.login_guard import login_guard, account_cache, client_ip
+from backend.classes.sampled_log import auth_log
+from backend.classes import data_access
+from backend.classes.listing import page_size, like_prefix, where, fetch_page, stream_rows, ndjson, json_array
 import psycopg2  
 
 @common_bp.route('/pull-credentials', methods=['GET'])
@@ -17,19 +20,8 @@ def pull_credentials():
 
         holder_address = Web3.to_checksum_address(holder_address)
         
-        credentials = credential_verification.functions.pullCredential(
-            holder_address
-        ).call()
-        
-        formatted_credentials = []
-        for cred in credentials:
-            formatted_credentials.append({
-                'credentialHash': '0x' + cred[0].hex(),
-                'issuer': cred[1],
-                'holder': cred[2],
-                'issuedAt': cred[3],
-                'data': cred[4]
-            })
+        # Served from the credential cache, only a miss calls pullCredential
+        formatted_credentials = credential_cache.get(holder_address)
         
         return jsonify({
             'success': True,
@@ -46,30 +38,35 @@ def login():
         reqData = request.get_json()
         username = reqData.get('username')
         password = reqData.get('password')
-        with psycopg2.connect(CONNECTION_STRING) as conn:
-            # Pull the user's passhash and role to verify password input
-            cursor = conn.cursor()
-            getPassandRole = "SELECT passhash, role, address FROM accounts WHERE username = %s;"
-            cursor.execute(getPassandRole, (username,))
-            userInfo = cursor.fetchone()
-            cursor.close()
-            if not userInfo:
-                return jsonify({"error": "Either password or username is incorrect"}), 403
-            
-            passhash = userInfo[0] # Get the passhash
-            userRole = userInfo[1] # Get the role
-            userAddress = userInfo[2] # Get the address
-            
-            if (bcrypt.checkpw(password=password.encode('utf-8'), hashed_password=bytes.fromhex(passhash))):
-                # Create JWT token for access control
-                token = create_access_token(identity=username, additional_claims={"role": userRole})
-                response = jsonify({"message":f"you're logged in", "role": userRole, "address": userAddress})
-                response.set_cookie('access_token', token, httponly=True, secure=True, samesite="None")
-                return response, 200
-            else:
-                return jsonify({"error":"Failed login either password or username is incorrect"}), 401
-            
-        
+        if not username or not password:
+            return jsonify({"error": "Missing username or password"}), 400
+
+        # Throttle per IP and per username before any database or bcrypt work
+        retry_after = login_guard.check(client_ip(request), username)
+        if retry_after:
+            response = jsonify({"error": "Too many login attempts, try again later"})
+            response.headers['Retry-After'] = str(retry_after)
+            return response, 429
+
+        # Pull the user's passhash and role to verify password input (cached for repeated attempts)
+        userInfo = account_cache.get(username, data_access.load_account)
+        if not userInfo:
+            return jsonify({"error": "Either password or username is incorrect"}), 403
+
+        passhash = userInfo[0] # Get the passhash
+        userRole = userInfo[1] # Get the role
+        userAddress = userInfo[2] # Get the address
+
+        if account_cache.verified(username, password) or password_hasher.check(password, passhash):
+            account_cache.remember_verified(username, password)
+            # Create JWT token for access control
+            token = create_access_token(identity=username, additional_claims={"role": userRole})
+            response = jsonify({"message":f"you're logged in", "role": userRole, "address": userAddress})
+            response.set_cookie('access_token', token, httponly=True, secure=True, samesite="None")
+            return response, 200
+        else:
+            return jsonify({"error":"Failed login either password or username is incorrect"}), 401
+
     except (Exception, psycopg2.DatabaseError) as e:
         print(f"There was an error during login: {e}")
         return jsonify({'error': str(e)}), 500
@@ -79,12 +76,10 @@ def login():
 @jwt_required()
 def me():
     """Return details of logged in user"""
-    print("getting the user via the jwt")
     user = get_jwt()
-    print("returned from getting the user, hopefully printing the user now:")
-    print(user)
     if not user:
         return jsonify({"error": "Unauthorized"}), 401
+    auth_log.log('me', identity=user.get('sub'), role=user.get('role'))
     return jsonify(user), 200
 
 @common_bp.route('/create-account', methods=['POST'])
@@ -95,82 +90,90 @@ def create():
         password = request.form.get('password')
         address = request.form.get('address')
         role = 'H' #new accounts will default to holder
-        with psycopg2.connect(CONNECTION_STRING) as conn:
-                # If the username does not already exist, create the new account
-                cursor = conn.cursor()
-                isNewUserUniqueQuery = "SELECT NOT EXISTS(SELECT 1 FROM accounts WHERE username=%s)"
-                cursor.execute(isNewUserUniqueQuery, (username,))
-                newUserIsUnique = cursor.fetchone()[0]
-                if (newUserIsUnique):
-                    salt = bcrypt.gensalt()
-                    pepper = os.getenv('PEPPER')
-                    passhash = bcrypt.hashpw(password.encode('utf-8'), salt+pepper.encode('utf-8'))
-                    insertAccount = "INSERT INTO accounts VALUES (%s, %s, %s, %s);"
-                    cursor.execute(insertAccount, (address, username, passhash.hex(), role))
-                    cursor.close()
-                    conn.commit()
-                    return jsonify({"success": True, "message": f"Successfully added account for {username} with address {address}"}), 200
-                else:
-                    return jsonify({"sucess": True, "message": "This username already exists"}), 409
+        # bcrypt runs in the hasher's thread pool, not on the hub
+        passhash = password_hasher.hash(password)
+        try:
+            # Inserted only if the username and address are free, in one statement
+            data_access.create_account(address, username, passhash, role)
+        except data_access.AccountExists as e:
+            return jsonify({"sucess": True, "message": str(e)}), 409
+        account_cache.invalidate(username)
+        return jsonify({"success": True, "message": f"Successfully added account for {username} with address {address}"}), 200
 
     except (Exception, psycopg2.DatabaseError) as e:
         print(f"There was an error during creating an account: {e}")
-        conn.rollback()
 
         return jsonify({"success": True, "error": str(e)}), 500
 
 @common_bp.route('/get-issuers', methods=['GET'])
 def get_issuers():
-    """Get all issuers from the database"""
+    """
+    Get issuers from the database
+
+    Without parameters every issuer is streamed in the original
+    {success, issuers: [{address, name}]} shape. `limit` and `after` (the
+    nextCursor of the previous page) return one keyset page ordered by
+    address, `format=ndjson` streams a full export one issuer per line, and
+    `q` filters all three by name or address prefix.
+    """
     try:
-        with psycopg2.connect(CONNECTION_STRING) as conn:
-            cursor = conn.cursor()
-            getIssuers = "SELECT * FROM issuers;"
-            cursor.execute(getIssuers)
-            issuers = cursor.fetchall()
-            cursor.close()
-        
-        formatted_issuers = []
-        for issuer in issuers:
-            formatted_issuers.append({
-                'address': issuer[0],
-                'name': issuer[1]
+        prefix = request.args.get('q')
+        after = request.args.get('after')
+        export_format = request.args.get('format')
+        paged = 'limit' in request.args or after is not None
+        limit = page_size(request.args.get('limit'))
+
+        # Only the returned columns, not the signatures and entropy
+        clause, params = where([
+            # lower(id) so the prefix search can use issuers_lower_id_key
+            ("(name LIKE %s OR lower(id) LIKE %s)", [like_prefix(prefix), like_prefix(prefix.lower())]) if prefix else (None, None),
+            ("id > %s", [after]) if after is not None else (None, None)
+        ])
+        getIssuers = "SELECT id, name FROM issuers" + clause
+
+        if paged:
+            issuers, has_more = fetch_page(getIssuers, params, "id", limit)
+            return jsonify({
+                'success': True,
+                'issuers': [format_issuer(issuer) for issuer in issuers],
+                'nextCursor': issuers[-1][0] if has_more else None
             })
-        
-        return jsonify({
-            'success': True,
-            'issuers': formatted_issuers
-        })
-        
+
+        rows = stream_rows(getIssuers + " ORDER BY id", params)
+        if export_format == 'ndjson':
+            return Response(stream_with_context(ndjson(rows, format_issuer)), mimetype='application/x-ndjson')
+        body = json_array(rows, format_issuer, prefix='{"success": true, "issuers": [', suffix=']}')
+        return Response(stream_with_context(body), mimetype='application/json')
+
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
+
+
+def format_issuer(issuer):
+    return {
+        'address': issuer[0],
+        'name': issuer[1]
+    }
     
 @common_bp.route('/get-entropy', methods=['GET'])
 def get_entropy():
     try:
         address = request.args.get('address')
-        address = address.lower()
         if not address:
             return jsonify({"error": "Missing address argument"}), 400
-        with psycopg2.connect(CONNECTION_STRING) as conn:
-            cursor = conn.cursor()
-            doesAddressExistQuery = "SELECT EXISTS(SELECT 1 FROM issuers WHERE id=%s)"
-            cursor.execute(doesAddressExistQuery, (address,))
-            doesAddressExist = cursor.fetchone()[0]
-            if not doesAddressExist:
-                return jsonify({"error": "This address does not exist in the issuers table"}), 404
-                
-            getEntropyQuery = "SELECT entropy FROM issuers WHERE id=%s;"
-            cursor.execute(getEntropyQuery, (address,))
-            entropyResponse = cursor.fetchone()
-            entropy = entropyResponse[0]
-
-            if not entropy:
-                return jsonify({"error": "This issuer has no entropy value"}), 404
-
-            return jsonify({'entropy': entropy}), 200
+        # One query tells a missing issuer (no row) from a missing entropy (NULL)
+        entropyResponse = data_access.issuer_entropy(address)
+        if entropyResponse is None:
+            return jsonify({"error": "This address does not exist in the issuers table"}), 404
+
+        entropy = entropyResponse[0]
+        if not entropy:
+            return jsonify({"error": "This issuer has no entropy value"}), 404
+
+        return jsonify({'entropy': entropy}), 200
 
     except Exception as e:
         print(f"There was an error while trying to pull entropy from DB")
-        conn.rollback()
         return jsonify({"error": str(e)}), 500
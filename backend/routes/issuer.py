@@ -1,11 +1,14 @@
 from backend.routes import issuer_bp
-from flask import request, jsonify
+from flask import request, jsonify, Response, stream_with_context
 from eth_account.messages import encode_defunct
 from eth_account import Account
 from web3 import Web3
-import psycopg2
-from backend.classes.issue_verification import IssuerVerification
-from backend.config import CONNECTION_STRING, w3, credential_verification, PRIVATE_KEY
+import json
+from backend.classes.issue_verification import issuer_verification
+from backend.classes.connection_pool import db_pool
+from backend.classes.issuance_queue import issuance_queue, QueueFull
+from backend.classes import data_access
+from backend.classes.bulk_import import upload_from_request, iter_rows, credential_from_row, RowError
 
 @issuer_bp.route('/register', methods=['POST'])
 def register_issuer():
@@ -18,6 +21,8 @@ def register_issuer():
 
     if not all([issuer_address, issuer_name, signature, entropy]):
         return jsonify({'error': 'Missing required fields'}), 400
+    # One row and one leaf per address whatever its case, like ON CONFLICT ((lower(id)))
+    issuer_address = issuer_address.lower()
 
     try:
         # # Create and sign message
@@ -27,12 +32,12 @@ def register_issuer():
         # signature = '0x' + signed_message.signature.hex()
 
         # Store in database
-        with psycopg2.connect(CONNECTION_STRING) as conn:
+        with db_pool.connection() as conn:
             with conn.cursor() as cur:
                 cur.execute("""
                     INSERT INTO issuers (id, name, signature, entropy) 
                     VALUES (%s, %s, %s, %s)
-                    ON CONFLICT (id) 
+                    ON CONFLICT ((lower(id))) 
                     DO UPDATE SET 
                         name = EXCLUDED.name,
                         signature = EXCLUDED.signature
@@ -41,6 +46,9 @@ def register_issuer():
                 )
             conn.commit()
 
+        # Patch the cached issuer tree instead of rebuilding it
+        issuer_verification.upsert_issuer(issuer_address, issuer_name, signature)
+
         return jsonify({
             'success': True,
             'address': issuer_address,
@@ -54,7 +62,7 @@ def register_issuer():
 
 @issuer_bp.route('/issue-credential', methods=['POST'])
 def issue_credential():
-    """Issue a new credential to a holder"""
+    """Queue a new credential for a holder, returns the job to poll"""
     try:
         # Get request data
         credential_hash = request.form.get('credentialHash')
@@ -67,70 +75,120 @@ def issue_credential():
             return jsonify({'error': 'Missing required fields'}), 400
 
         # Get issuer's Merkle proof
-        verifier = IssuerVerification()
-        try:
-            proof_data = verifier.get_issuer_proof(issuer_address, issuer_name)
-            print(proof_data)
-
-            # Prepare contract call data
-            proof = [Web3.to_bytes(hexstr=p) for p in proof_data['proof']]
-            leaf_hash = Web3.keccak(text=proof_data['leaf'])
-
-            # Convert credential hash to bytes32
-            print(credential_hash)
-            credential_bytes = Web3.to_bytes(hexstr=credential_hash)
-            if len(credential_bytes) != 32:
-                raise ValueError("Credential hash must be exactly 32 bytes")
-
-            # Get account from private key
-            account = w3.eth.account.from_key(PRIVATE_KEY)
-
-            # Get the nonce and gas price
-            nonce = w3.eth.get_transaction_count(account.address)
-            gas_price = w3.eth.gas_price
-
-            credentialInfo = (
-                credential_bytes,
-                Web3.to_checksum_address(issuer_address),
-                Web3.to_checksum_address(holder_address),
-                w3.eth.get_block('latest').timestamp,
-                issuer_name + " " + metadata
-            )
-
-            # Build transaction using legacy format
-            tx = credential_verification.functions.storeCredential(
-                credentialInfo,
-                proof,
-                proof_data['isLeft'],
-                leaf_hash
-            ).build_transaction({
-                'from': account.address,
-                'nonce': nonce,
-                'gas': 300000,  # Adjust gas limit as needed
-                'gasPrice': gas_price,
-                'chainId': 11155111
-            })
-
-            # Sign and send transaction
-            signed_tx = w3.eth.account.sign_transaction(tx, PRIVATE_KEY)
-            tx_hash = w3.eth.send_raw_transaction(signed_tx.rawTransaction)
-
-            # Wait for transaction receipt
-            receipt = w3.eth.wait_for_transaction_receipt(tx_hash)
-
-            # Check if the transaction was successful
-            if receipt.status == 1:  # 1 means success
-                return jsonify({
-                    'success': True,
-                    'transactionHash': receipt.transactionHash.hex(),
-                    'credentialHash': credential_hash
-                })
-            else:
-                return jsonify({'error': 'Transaction failed on the blockchain'}), 500
-
-        finally:
-            verifier.close()
+        # (proof nodes and leaf hash are already bytes32, ready for the contract call)
+        proof_data = issuer_verification.get_issuer_proof(issuer_address, issuer_name)
+
+        # Convert credential hash to bytes32
+        credential_bytes = Web3.to_bytes(hexstr=credential_hash)
+        if len(credential_bytes) != 32:
+            raise ValueError("Credential hash must be exactly 32 bytes")
+
+        # The transaction is sent and tracked in the background
+        job = issuance_queue.enqueue(
+            credential_bytes,
+            Web3.to_checksum_address(issuer_address),
+            Web3.to_checksum_address(holder_address),
+            issuer_name + " " + metadata,
+            proof_data
+        )
+
+        return jsonify({
+            'success': True,
+            'jobId': job['id'],
+            'status': job['status'],
+            'credentialHash': credential_hash
+        }), 202
 
+    except QueueFull as e:
+        return jsonify({'error': str(e)}), 503
     except Exception as e:
         print(f"Error in issue_credential: {str(e)}")  # Add logging
-        return jsonify({'error': str(e)}), 500
\ No newline at end of file
+        return jsonify({'error': str(e)}), 500
+
+@issuer_bp.route('/issue-credentials/bulk', methods=['POST'])
+def issue_credentials_bulk():
+    """
+    Queue every credential of an uploaded CSV or NDJSON file.
+
+    Send the file as the `file` field of a multipart form, or as the raw
+    body (Content-Type text/csv or application/x-ndjson) with the issuer
+    fields in the query string. Rows are read one at a time and answered
+    with one NDJSON line each, so the file is never held in memory.
+    """
+    try:
+        issuer_address = (request.values.get('issuerAddress') or '').lower()
+        issuer_name = request.values.get('issuerName')
+        if not issuer_address or not issuer_name:
+            return jsonify({'error': 'Missing required fields'}), 400
+
+        try:
+            stream, fmt = upload_from_request(request)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        # One proof lookup for the whole file
+        proof_data = issuer_verification.get_issuer_proof(issuer_address, issuer_name)
+        issuer_checksum = Web3.to_checksum_address(issuer_address)
+
+    except Exception as e:
+        print(f"Error in issue_credentials_bulk: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+    entropy = []
+
+    def get_entropy():
+        # Only rows that send the document need it, fetch it once
+        if not entropy:
+            row = data_access.issuer_entropy(issuer_address)
+            if not row or not row[0]:
+                raise RowError('This issuer has no entropy value')
+            entropy.append(row[0])
+        return entropy[0]
+
+    def generate():
+        rows = queued = errors = 0
+        try:
+            for number, row in iter_rows(stream, fmt):
+                rows += 1
+                try:
+                    if isinstance(row, RowError):
+                        raise row
+                    credential_bytes, holder_address, metadata = credential_from_row(row, get_entropy)
+                    # Waits for the submitter when the queue is full, that's the backpressure
+                    job = issuance_queue.enqueue(
+                        credential_bytes,
+                        issuer_checksum,
+                        holder_address,
+                        issuer_name + " " + metadata,
+                        proof_data,
+                        wait=True
+                    )
+                except Exception as e:
+                    errors += 1
+                    yield json.dumps({'row': number, 'error': str(e)}) + '\n'
+                    continue
+                queued += 1
+                yield json.dumps({
+                    'row': number,
+                    'jobId': job['id'],
+                    'status': job['status'],
+                    'credentialHash': job['credentialHash']
+                }) + '\n'
+        except Exception as e:
+            # Undecodable or malformed file, rows before it are already queued
+            errors += 1
+            yield json.dumps({'row': rows + 1, 'error': f'Could not read the file: {e}'}) + '\n'
+        yield json.dumps({'done': True, 'rows': rows, 'queued': queued, 'errors': errors}) + '\n'
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+@issuer_bp.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """Get the status of a queued credential issuance"""
+    job = issuance_queue.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify({
+        'success': True,
+        'job': job
+    })
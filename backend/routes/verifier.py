@@ -1,7 +1,11 @@
 from backend.routes import verifier_bp
-from flask import request, jsonify
+from flask import request, jsonify, Response, stream_with_context
 from web3 import Web3
-from backend.config import credential_verification
+import json
+from backend.config import credential_verification, credential_calls, INDEXER_ENABLED, VERIFY_BATCH_MAX_HASHES
+from backend.classes.chain_indexer import chain_indexer
+from backend.classes.rpc_provider import batch_request, RPCError
+from backend.classes.verification_cache import verification_cache
 
 @verifier_bp.route('/verify-credential', methods=['GET'])
 def verify_credential():
@@ -13,9 +17,14 @@ def verify_credential():
 
         hash_bytes = Web3.to_bytes(hexstr=credential_hash)
         
-        is_valid = credential_verification.functions.verifyCredential(
-            hash_bytes
-        ).call()
+        is_valid = verification_cache.lookup(hash_bytes)
+        if is_valid is None:
+            # Credentials can't be removed, so one found in the local index is valid
+            if INDEXER_ENABLED and chain_indexer.find_credential(hash_bytes) is not None:
+                is_valid = True
+            else:
+                is_valid = credential_calls.verifyCredential(hash_bytes).call()
+            verification_cache.store(hash_bytes, is_valid)
         
         return jsonify({
             'success': True,
@@ -24,3 +33,85 @@ def verify_credential():
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
+
+@verifier_bp.route('/verify-credentials', methods=['POST'])
+def verify_credentials():
+    """Verify many credentials at once, streaming one NDJSON line per hash"""
+    try:
+        data = request.get_json()
+        hashes = data.get('hashes') if data else None
+        if not isinstance(hashes, list) or not hashes:
+            return jsonify({'error': 'Missing credential hashes'}), 400
+        if len(hashes) > VERIFY_BATCH_MAX_HASHES:
+            return jsonify({'error': f'At most {VERIFY_BATCH_MAX_HASHES} hashes per request'}), 400
+
+        # Deduplicate on the normalised hash, keeping the first spelling sent
+        unique = {}
+        invalid = []
+        for credential_hash in hashes:
+            try:
+                hash_bytes = Web3.to_bytes(hexstr=credential_hash)
+                if len(hash_bytes) != 32:
+                    raise ValueError
+            except (TypeError, ValueError):
+                invalid.append(credential_hash)
+                continue
+            unique.setdefault(hash_bytes, credential_hash)
+
+        # Answer what we can from the cache, look the rest up together
+        cached = []
+        uncached = {}
+        for hash_bytes, credential_hash in unique.items():
+            is_valid = verification_cache.lookup(hash_bytes)
+            if is_valid is None:
+                uncached[hash_bytes] = credential_hash
+            else:
+                cached.append((credential_hash, is_valid))
+
+        indexed = set()
+        if INDEXER_ENABLED and uncached:
+            indexed = chain_indexer.find_credentials(list(uncached))
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+    def generate():
+        for credential_hash in invalid:
+            yield json.dumps({'hash': credential_hash, 'error': 'Credential hash must be exactly 32 bytes'}) + '\n'
+        for credential_hash, is_valid in cached:
+            yield json.dumps({'hash': credential_hash, 'isValid': is_valid}) + '\n'
+
+        # Found in the local index: valid without touching the chain
+        remaining = []
+        for hash_bytes, credential_hash in uncached.items():
+            if '0x' + hash_bytes.hex() in indexed:
+                verification_cache.store(hash_bytes, True)
+                yield json.dumps({'hash': credential_hash, 'isValid': True}) + '\n'
+            else:
+                remaining.append((hash_bytes, credential_hash))
+
+        # The rest as batched eth_calls, streamed back chunk by chunk
+        calls = [
+            ('eth_call', [{
+                'to': credential_verification.address,
+                'data': '0x' + credential_calls.verifyCredential.encode(hash_bytes).hex()
+            }, 'latest'])
+            for hash_bytes, _ in remaining
+        ]
+        done = 0
+        try:
+            for results in batch_request(calls):
+                for result in results:
+                    hash_bytes, credential_hash = remaining[done]
+                    done += 1
+                    if isinstance(result, RPCError):
+                        yield json.dumps({'hash': credential_hash, 'error': str(result)}) + '\n'
+                    else:
+                        is_valid = credential_calls.verifyCredential.decode(Web3.to_bytes(hexstr=result))
+                        verification_cache.store(hash_bytes, is_valid)
+                        yield json.dumps({'hash': credential_hash, 'isValid': is_valid}) + '\n'
+        except Exception as e:
+            for _, credential_hash in remaining[done:]:
+                yield json.dumps({'hash': credential_hash, 'error': str(e)}) + '\n'
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
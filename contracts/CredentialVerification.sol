@@ -78,6 +78,27 @@ contract CredentialVerification {
             "Credential already exists"
         );
 
+        _storeCredential(_credential);
+    }
+
+    // Function to store many credentials with a single Merkle proof check
+    // Credentials that already exist are skipped (no CredentialStored event) so
+    // one duplicate doesn't revert the whole batch
+    function storeCredentials(
+        Credential[] calldata _credentials,
+        bytes32[] calldata _merkleProof,
+        bool[] calldata _isLeft,
+        bytes32 signedPairHash
+    ) external onlyVerifiedIssuer(_merkleProof, _isLeft, signedPairHash) {
+        for (uint i = 0; i < _credentials.length; i++) {
+            if (credentials[_credentials[i].credentialHash].issuer == address(0)) {
+                _storeCredential(_credentials[i]);
+            }
+        }
+    }
+
+    // Writes a credential that is known not to exist yet
+    function _storeCredential(Credential calldata _credential) internal {
         credentials[_credential.credentialHash] = Credential(
             _credential.credentialHash,
             _credential.issuer,
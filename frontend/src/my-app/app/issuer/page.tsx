@@ -15,6 +15,11 @@ interface IssueResult {
 
 const backendUrl = process.env.NEXT_PUBLIC_BACKEND;
 
+// How often and how many times to ask for the issuance job's status: 15
+// minutes, enough for the backend's fee bumps before it gives up on a transaction
+const JOB_POLL_INTERVAL = 2000;
+const JOB_POLL_MAX_ATTEMPTS = 450;
+
 export default function IssuerPage() {
   const [selectedFile, setSelectedFile] = useState<File | null>(null);
   const [holderAddress, setHolderAddress] = useState("");
@@ -103,15 +108,39 @@ export default function IssuerPage() {
 
       const result = await response.json();
 
-      if (result.success) {
+      if (!result.success) {
+        throw new Error(result.error || "Failed to issue credential");
+      }
+
+      // The backend sends the transaction in the background, poll the job until it's mined
+      let job = null;
+      let attempts = 0;
+      while (!job || job.status === 'queued' || job.status === 'submitted') {
+        if (attempts++ >= JOB_POLL_MAX_ATTEMPTS) {
+          throw new Error(
+            `The credential is still being issued (job ${result.jobId}` +
+            (job?.transactionHash ? `, transaction ${job.transactionHash}` : '') +
+            `), check its status again later`
+          );
+        }
+        await new Promise((resolve) => setTimeout(resolve, JOB_POLL_INTERVAL));
+        const jobResponse = await fetch(`https://gradtrust-459152f15ccf.herokuapp.com/api/issuer/jobs/${result.jobId}`);
+        const jobResult = await jobResponse.json();
+        if (!jobResult.success) {
+          throw new Error(jobResult.error || "Failed to get the issuance status");
+        }
+        job = jobResult.job;
+      }
+
+      if (job.status === 'confirmed') {
         setResult({
           success: true,
           message: 'Credential Issued Successfully!',
-          transactionHash: result.transactionHash,
+          transactionHash: job.transactionHash,
           credentialHash: result.credentialHash
         });
       } else {
-        throw new Error(result.error || "Failed to issue credential");
+        throw new Error(job.error || "Failed to issue credential");
       }
     } catch (error) {
       setResult({
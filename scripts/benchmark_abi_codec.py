@@ -0,0 +1,101 @@
+import argparse
+import os
+import sys
+import time
+from eth_abi import encode
+from web3 import Web3
+from web3.providers.base import BaseProvider
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.abis.credential_verification import ABI as CREDENTIAL_VERIFICATION_ABI
+from backend.classes.abi_codec import ContractCodec
+
+CONTRACT_ADDRESS = '0xe7f1725E7734CE288F8367e1Bb143E90bb3F0512'
+ISSUER = '0x7E5F4552091A69125d5DfCb7b8C2659029395Bdf'
+HOLDER = '0x2B5AD5c4795c026514f8317c7a215E218DcCD6cF'
+
+
+class CannedProvider(BaseProvider):
+    """Answers eth_call with fixed return data per selector, no node involved"""
+
+    def __init__(self, returns):
+        super().__init__()
+        self.returns = returns
+
+    def make_request(self, method, params):
+        if method == 'eth_call':
+            data = params[0]['data']
+            return {'jsonrpc': '2.0', 'id': 1, 'result': self.returns[data[2:10]]}
+        if method == 'eth_chainId':
+            return {'jsonrpc': '2.0', 'id': 1, 'result': '0x1'}
+        raise ValueError(f"Unexpected {method}")
+
+    def is_connected(self, show_traceback=False):
+        return True
+
+
+def timed(function, count):
+    """Microseconds per call"""
+    start = time.perf_counter()
+    for _ in range(count):
+        function()
+    return (time.perf_counter() - start) / count * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="benchmark_abi_codec", description="per call encode/decode cost of"
+    " web3 contract.functions against the precompiled codecs in backend/classes/abi_codec.py")
+    parser.add_argument('-n', '--count', type=int, default=2000, help='calls timed per case')
+    parser.add_argument('--credentials', type=int, default=5, help='credentials returned by pullCredential')
+    args = parser.parse_args()
+
+    credential_hash = os.urandom(32)
+    proof = [os.urandom(32) for _ in range(10)]
+    is_left = [bool(i % 2) for i in range(10)]
+    credential = (credential_hash, ISSUER, HOLDER, 1700000000, 'Test University Bachelor of Science')
+    pulled = [
+        (os.urandom(32), ISSUER.lower(), HOLDER.lower(), 1700000000 + i, f'Test University credential {i}')
+        for i in range(args.credentials)
+    ]
+
+    codecs = ContractCodec(None, CREDENTIAL_VERIFICATION_ABI, ['verifyCredential', 'pullCredential', 'storeCredential'])
+    returns = {
+        codecs.verifyCredential.encode(credential_hash)[:4].hex(): '0x' + encode(['bool'], [True]).hex(),
+        codecs.pullCredential.encode(HOLDER)[:4].hex():
+            '0x' + encode(['(bytes32,address,address,uint256,string)[]'], [pulled]).hex()
+    }
+    w3 = Web3(CannedProvider(returns))
+    contract = w3.eth.contract(address=CONTRACT_ADDRESS, abi=CREDENTIAL_VERIFICATION_ABI)
+    codecs = ContractCodec(contract, CREDENTIAL_VERIFICATION_ABI, ['verifyCredential', 'pullCredential', 'storeCredential'])
+
+    # Same calldata and results both ways before timing anything
+    assert contract.functions.verifyCredential(credential_hash).call() == codecs.verifyCredential(credential_hash).call()
+    assert contract.functions.pullCredential(HOLDER).call() == codecs.pullCredential(HOLDER).call()
+    assert contract.functions.storeCredential(credential, proof, is_left, proof[0])._encode_transaction_data() == \
+        '0x' + codecs.storeCredential.encode(credential, proof, is_left, proof[0]).hex()
+
+    cases = [
+        ('verifyCredential encode',
+         lambda: contract.functions.verifyCredential(credential_hash)._encode_transaction_data(),
+         lambda: codecs.verifyCredential.encode(credential_hash)),
+        ('verifyCredential call',
+         lambda: contract.functions.verifyCredential(credential_hash).call(),
+         lambda: codecs.verifyCredential(credential_hash).call()),
+        (f'pullCredential call ({args.credentials})',
+         lambda: contract.functions.pullCredential(HOLDER).call(),
+         lambda: codecs.pullCredential(HOLDER).call()),
+        ('storeCredential encode',
+         lambda: contract.functions.storeCredential(credential, proof, is_left, proof[0])._encode_transaction_data(),
+         lambda: codecs.storeCredential.encode(credential, proof, is_left, proof[0])),
+    ]
+
+    print(f"{'':<28} {'web3':>10} {'codec':>10}")
+    for label, before, after in cases:
+        web3_us = timed(before, args.count)
+        codec_us = timed(after, args.count)
+        print(f"{label:<28} {web3_us:>8.1f}us {codec_us:>8.1f}us {web3_us / codec_us:>6.1f}x")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,85 @@
+// Gas per credential and wall clock time of storeCredential (one transaction
+// per credential) against storeCredentials batches.
+//
+//   npx hardhat run --network hardhat scripts/benchmark_batch_issuance.js
+//
+// BENCH_CREDENTIALS sets how many credentials each mode issues (default 500)
+// and BENCH_BATCH_SIZES the batch sizes to try (default 10,50,100).
+const { ethers } = require("hardhat");
+
+const COUNT = parseInt(process.env.BENCH_CREDENTIALS || "500");
+const BATCH_SIZES = (process.env.BENCH_BATCH_SIZES || "10,50,100").split(",").map(Number);
+
+async function deploy() {
+  const registry = await (await ethers.getContractFactory("IssuerRegistry")).deploy();
+  const verification = await (await ethers.getContractFactory("CredentialVerification")).deploy(registry.target);
+
+  // A realistic proof depth: 2^10 registered issuers
+  const leaf = ethers.keccak256(ethers.toUtf8Bytes("0xissuer-signature"));
+  const proof = [];
+  const isLeft = [];
+  let node = leaf;
+  for (let i = 0; i < 10; i++) {
+    const sibling = ethers.keccak256(ethers.toUtf8Bytes(`sibling-${i}`));
+    proof.push(sibling);
+    isLeft.push(false);
+    node = ethers.solidityPackedKeccak256(["bytes32", "bytes32"], [node, sibling]);
+  }
+  await registry.updateMerkleRoot(node);
+  return { verification, leaf, proof, isLeft };
+}
+
+function credentials(prefix, issuer, holders) {
+  return Array.from({ length: COUNT }, (_, n) => ({
+    credentialHash: ethers.keccak256(ethers.toUtf8Bytes(`${prefix}-${n}`)),
+    issuer,
+    holder: holders[n % holders.length],
+    issuedAt: 1700000000,
+    data: `Test University Bachelor of Science ${n}`
+  }));
+}
+
+async function run(label, sends) {
+  const started = performance.now();
+  let gas = 0n;
+  for (const send of sends) {
+    const receipt = await (await send()).wait();
+    gas += receipt.gasUsed;
+  }
+  const seconds = (performance.now() - started) / 1000;
+  const perCredential = Number(gas) / COUNT;
+  console.log(
+    `${label.padEnd(24)} ${String(sends.length).padStart(5)} tx  ` +
+    `${perCredential.toFixed(0).padStart(8)} gas/credential  ` +
+    `${seconds.toFixed(2).padStart(7)}s  ${(COUNT / seconds).toFixed(1).padStart(8)} credentials/s`
+  );
+  return perCredential;
+}
+
+async function main() {
+  const [issuer, ...holders] = (await ethers.getSigners()).map((s) => s.address);
+  console.log(`Issuing ${COUNT} credentials per mode\n`);
+
+  const single = await deploy();
+  const singleCreds = credentials("single", issuer, holders);
+  const baseline = await run("storeCredential", singleCreds.map((cred) => () =>
+    single.verification.storeCredential(cred, single.proof, single.isLeft, single.leaf)
+  ));
+
+  for (const size of BATCH_SIZES) {
+    const batched = await deploy();
+    const creds = credentials(`batch-${size}`, issuer, holders);
+    const sends = [];
+    for (let i = 0; i < creds.length; i += size) {
+      const chunk = creds.slice(i, i + size);
+      sends.push(() => batched.verification.storeCredentials(chunk, batched.proof, batched.isLeft, batched.leaf));
+    }
+    const perCredential = await run(`storeCredentials x${size}`, sends);
+    console.log(`${"".padEnd(24)} ${((1 - perCredential / baseline) * 100).toFixed(1)}% less gas per credential`);
+  }
+}
+
+main().catch((error) => {
+  console.error(error);
+  process.exitCode = 1;
+});
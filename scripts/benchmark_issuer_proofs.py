@@ -0,0 +1,81 @@
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from merkly.mtree import MerkleTree
+from web3 import Web3
+from backend.classes.issue_verification import IssuerVerification
+
+
+class BenchIssuerVerification(IssuerVerification):
+    """IssuerVerification fed with generated rows instead of the database"""
+
+    def __init__(self, rows):
+        super().__init__()
+        self.rows = rows
+
+    def _fetch_issuers(self):
+        return self.rows
+
+
+def make_rows(count):
+    """Fake issuers with signature-sized leaves"""
+    return [
+        (f"0x{i:040x}", f"issuer {i}", "0x" + random.randbytes(65).hex())
+        for i in range(count)
+    ]
+
+
+def old_proof(tree, signature):
+    """What issue_credential used to do: walk merkly, parse repr, convert hex"""
+    proof_nodes = []
+    is_left = []
+    for node in tree.proof(signature):
+        side = repr(node).split('Side.')[1].strip(')')
+        hex_value = repr(node).split('(')[1].split(',')[0]
+        proof_nodes.append(Web3.to_bytes(hexstr=hex_value))
+        is_left.append(side == 'LEFT')
+    return proof_nodes, is_left, Web3.keccak(text=signature)
+
+
+def timed(fn, lookups):
+    start = time.perf_counter()
+    for args in lookups:
+        fn(*args)
+    return (time.perf_counter() - start) / len(lookups)
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="benchmark_issuer_proofs", description="compare issuer proof latency"
+    " of the old merkly walk against the precomputed proof index")
+    parser.add_argument('-s', '--sizes', type=int, nargs='+', default=[100, 10_000, 1_000_000], help='issuer counts to test')
+    parser.add_argument('-n', '--lookups', type=int, default=1000, help='proof lookups per size for the index')
+    parser.add_argument('--old-lookups', type=int, default=20, help='proof lookups per size for the merkly walk (it is O(n) each)')
+    args = parser.parse_args()
+
+    print(f"{'issuers':>10} {'merkly walk':>14} {'index lookup':>14} {'speedup':>10} {'index build':>12}")
+    for size in args.sizes:
+        rows = make_rows(size)
+
+        tree = MerkleTree([row[2] for row in rows])
+        old_lookups = [(tree, row[2]) for row in random.sample(rows, min(args.old_lookups, size))]
+        old = timed(old_proof, old_lookups)
+
+        verifier = BenchIssuerVerification(rows)
+        start = time.perf_counter()
+        verifier.get_merkle_root()
+        build = time.perf_counter() - start
+        new_lookups = [(row[0], row[1]) for row in random.choices(rows, k=args.lookups)]
+        new = timed(verifier.get_issuer_proof, new_lookups)
+
+        print(f"{size:>10} {old * 1e6:>12.1f}us {new * 1e6:>12.2f}us {old / new:>9.0f}x {build:>11.2f}s")
+
+    return 0
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+
+def run(count):
+    """GET /api/me `count` times through the Flask test client, returns requests/s"""
+    # CORS needs origins to compare against, even for same-origin test requests
+    os.environ.setdefault('FRONTEND_ORIGIN', 'http://localhost:3000')
+    os.environ.setdefault('BACKEND_DEPLOYMENT', 'http://localhost:5000')
+    from flask_jwt_extended import create_access_token
+    from backend.app import create_app
+
+    app = create_app()
+    app.config['JWT_SECRET_KEY'] = app.config['JWT_SECRET_KEY'] or 'benchmark-secret'
+    client = app.test_client()
+    with app.app_context():
+        token = create_access_token(identity='benchmark', additional_claims={'role': 'H'})
+    headers = {'Authorization': f'Bearer {token}'}
+
+    response = client.get('/api/me', headers=headers)
+    assert response.status_code == 200, response.get_data(as_text=True)
+
+    start = time.perf_counter()
+    for _ in range(count):
+        client.get('/api/me', headers=headers)
+    return count / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="benchmark_me", description="GET /api/me requests per second with"
+    " the JWT decode cache off (JWT_CACHE_MAX_SIZE=0) and on, each in a fresh interpreter")
+    parser.add_argument('-n', '--count', type=int, default=5000, help='requests per run')
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps({'rate': run(args.count)}))
+        return 0
+
+    rates = {}
+    for label, cache_size in (('cache off', '0'), ('cache on', os.getenv('JWT_CACHE_MAX_SIZE', '10000'))):
+        env = dict(os.environ, JWT_CACHE_MAX_SIZE=cache_size)
+        result = subprocess.run(
+            [sys.executable, '-W', 'ignore', os.path.abspath(__file__), '--child', '-n', str(args.count)],
+            env=env, capture_output=True, text=True
+        )
+        if result.returncode != 0:
+            print(result.stderr, file=sys.stderr)
+            return 1
+        rates[label] = json.loads(result.stdout.strip().splitlines()[-1])['rate']
+        print(f"{label + ':':<11} {rates[label]:>8.0f} requests/s ({args.count} requests)")
+    print(f"{'speedup:':<11} {rates['cache on'] / rates['cache off']:>8.2f}x")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
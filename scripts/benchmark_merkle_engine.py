@@ -0,0 +1,96 @@
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from merkly.mtree import MerkleTree
+from merkly.node import Side
+from backend.classes.merkle_engine import MerkleEngine
+
+
+def make_signatures(count):
+    return ["0x" + random.randbytes(65).hex() for _ in range(count)]
+
+
+def merkly_proof(tree, signature):
+    nodes = tree.proof(signature)
+    bitmap = 0
+    for i, node in enumerate(nodes):
+        if node.side == Side.LEFT:
+            bitmap |= 1 << i
+    return [node.data for node in nodes], bitmap, len(nodes)
+
+
+def check(sizes, incremental_steps):
+    """
+    Differential check against merkly: roots and every proof must be byte
+    identical, both for fresh builds and after incremental set/append.
+    """
+    failures = 0
+    for size in sizes:
+        signatures = make_signatures(size)
+        engine = MerkleEngine.from_leaves(signatures)
+        reference = MerkleTree(signatures)
+        if engine.root != reference.root:
+            print(f"root mismatch for {size} leaves")
+            failures += 1
+            continue
+        for index, signature in enumerate(signatures):
+            if engine.proof(index) != merkly_proof(reference, signature):
+                print(f"proof mismatch for leaf {index} of {size}")
+                failures += 1
+
+        for _ in range(incremental_steps):
+            if random.random() < 0.5:
+                index = random.randrange(len(signatures))
+                signatures[index] = make_signatures(1)[0]
+                engine.set_leaf(index, signatures[index])
+            else:
+                signatures.append(make_signatures(1)[0])
+                engine.append_leaf(signatures[-1])
+            if engine.root != MerkleTree(signatures).root:
+                print(f"root mismatch after incremental update ({len(signatures)} leaves)")
+                failures += 1
+                break
+
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="benchmark_merkle_engine", description="check MerkleEngine against merkly"
+    " and compare tree build times")
+    parser.add_argument('-s', '--sizes', type=int, nargs='+', default=[1_000, 100_000, 500_000], help='issuer counts to time')
+    parser.add_argument('--check-only', action='store_true', help='only run the differential check')
+    args = parser.parse_args()
+
+    check_sizes = list(range(2, 70)) + [127, 128, 129, 1000, 1023]
+    failures = check(check_sizes, incremental_steps=10)
+    if failures:
+        print(f"differential check FAILED ({failures} mismatches)")
+        return 1
+    print(f"differential check passed for {len(check_sizes)} tree sizes")
+    if args.check_only:
+        return 0
+
+    print(f"{'leaves':>10} {'merkly':>10} {'engine':>10} {'speedup':>8}")
+    for size in args.sizes:
+        signatures = make_signatures(size)
+
+        start = time.perf_counter()
+        MerkleTree(signatures).root
+        old = time.perf_counter() - start
+
+        start = time.perf_counter()
+        MerkleEngine.from_leaves(signatures).root
+        new = time.perf_counter() - start
+
+        print(f"{size:>10} {old:>9.3f}s {new:>9.3f}s {old / new:>7.1f}x")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
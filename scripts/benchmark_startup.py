@@ -0,0 +1,80 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Runs in a fresh interpreter so every import is cold, prints one JSON line
+PROBE = """
+import json, os, time
+started = time.perf_counter()
+import backend.app
+imported = time.perf_counter()
+app = backend.app.create_app()
+initialized = time.perf_counter()
+from backend.config import w3, issuer_registry, credential_verification
+created_at_boot = w3.created or issuer_registry.created or credential_verification.created
+credential_verification.functions, issuer_registry.functions
+first_use = time.perf_counter()
+print(json.dumps({
+    'import': imported - started,
+    'create_app': initialized - imported,
+    'first_use': first_use - initialized,
+    'created_at_boot': created_at_boot
+}))
+"""
+
+
+def probe():
+    """Time one cold start in a new interpreter"""
+    result = subprocess.run(
+        [sys.executable, '-W', 'ignore', '-c', PROBE],
+        cwd=REPO_ROOT, capture_output=True, text=True, check=True
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def slowest_imports(count):
+    """Modules with the largest cumulative import time, from python -X importtime"""
+    result = subprocess.run(
+        [sys.executable, '-W', 'ignore', '-X', 'importtime', '-c', 'import backend.app'],
+        cwd=REPO_ROOT, capture_output=True, text=True, check=True
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        rows.append((int(cumulative), name.rstrip()))
+    rows.sort(reverse=True)
+    return rows[:count]
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="benchmark_startup", description="time a cold import of backend.app,"
+    " create_app() and the first use of the Web3/contract handles, each run in a new interpreter")
+    parser.add_argument('-n', '--runs', type=int, default=5, help='number of cold starts to time')
+    parser.add_argument('--imports', type=int, default=0, help='also list the N slowest imports (cumulative)')
+    args = parser.parse_args()
+
+    runs = [probe() for _ in range(args.runs)]
+    for phase in ('import', 'create_app', 'first_use'):
+        times = [run[phase] * 1000 for run in runs]
+        print(f"{phase + ':':<12} median {statistics.median(times):>8.1f}ms  min {min(times):>8.1f}ms"
+              f"  max {max(times):>8.1f}ms")
+    boot = [(run['import'] + run['create_app']) * 1000 for run in runs]
+    print(f"{'boot:':<12} median {statistics.median(boot):>8.1f}ms ({args.runs} runs)")
+    if any(run['created_at_boot'] for run in runs):
+        print("warning: Web3 or a contract was built during import/create_app")
+
+    if args.imports:
+        print("\nslowest imports (cumulative):")
+        for cumulative, name in slowest_imports(args.imports):
+            print(f"{cumulative / 1000:>10.1f}ms  {name}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,46 @@
+import argparse
+import json
+import os
+import sys
+import time
+import requests
+
+def main():
+    parser = argparse.ArgumentParser(prog="benchmark_verify_batch", description="compare credential verification"
+    " throughput of GET /api/verifier/verify-credential against POST /api/verifier/verify-credentials")
+    parser.add_argument('-u', '--url', default='http://127.0.0.1:5000', help='backend base url')
+    parser.add_argument('-n', '--count', type=int, default=1000, help='number of credential hashes')
+    parser.add_argument('--single-count', type=int, default=100, help='hashes to time on the single-hash route')
+    args = parser.parse_args()
+
+    hashes = ['0x' + os.urandom(32).hex() for _ in range(args.count)]
+    session = requests.Session()
+
+    single = hashes[:args.single_count]
+    start = time.perf_counter()
+    for credential_hash in single:
+        response = session.get(f"{args.url}/api/verifier/verify-credential", params={'hash': credential_hash})
+        response.raise_for_status()
+    single_rate = len(single) / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    first_line = None
+    results = 0
+    with session.post(f"{args.url}/api/verifier/verify-credentials", json={'hashes': hashes}, stream=True) as response:
+        response.raise_for_status()
+        for line in response.iter_lines():
+            if line:
+                json.loads(line)
+                results += 1
+                if first_line is None:
+                    first_line = time.perf_counter() - start
+    batch_time = time.perf_counter() - start
+    batch_rate = results / batch_time
+
+    print(f"single-hash route: {single_rate:>10.1f} hashes/s ({len(single)} requests)")
+    print(f"batch route:       {batch_rate:>10.1f} hashes/s ({results} results, first after {first_line * 1000:.0f}ms)")
+    print(f"speedup:           {batch_rate / single_rate:>10.1f}x")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
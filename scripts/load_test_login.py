@@ -0,0 +1,91 @@
+import argparse
+import statistics
+import sys
+import threading
+import time
+import requests
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))] if ordered else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="load_test_login", description="concurrent POST /api/login throughput,"
+    " while a probe keeps timing a cheap route to show whether logins stall the rest of the worker")
+    parser.add_argument('username', help='an existing account')
+    parser.add_argument('password', help="that account's password")
+    parser.add_argument('-u', '--url', default='http://127.0.0.1:5000', help='backend base url')
+    parser.add_argument('-c', '--concurrency', type=int, default=16, help='clients logging in at once')
+    parser.add_argument('-n', '--logins', type=int, default=20, help='logins per client')
+    parser.add_argument('--probe', default='/api/admin/metrics', help='route timed during the test')
+    args = parser.parse_args()
+
+    login_times = []
+    probe_times = []
+    errors = []
+    lock = threading.Lock()
+    done = threading.Event()
+
+    def client():
+        session = requests.Session()
+        for _ in range(args.logins):
+            started = time.perf_counter()
+            try:
+                response = session.post(f"{args.url}/api/login",
+                                        json={'username': args.username, 'password': args.password})
+                if response.status_code != 200:
+                    raise RuntimeError(f"HTTP {response.status_code}: {response.text[:100]}")
+            except Exception as e:
+                with lock:
+                    errors.append(str(e))
+                continue
+            with lock:
+                login_times.append(time.perf_counter() - started)
+
+    def probe():
+        session = requests.Session()
+        while not done.is_set():
+            started = time.perf_counter()
+            try:
+                session.get(f"{args.url}{args.probe}")
+                probe_times.append(time.perf_counter() - started)
+            except Exception:
+                pass
+            time.sleep(0.05)
+
+    prober = threading.Thread(target=probe, daemon=True)
+    prober.start()
+    clients = [threading.Thread(target=client) for _ in range(args.concurrency)]
+    started = time.perf_counter()
+    for thread in clients:
+        thread.start()
+    for thread in clients:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    done.set()
+    prober.join()
+
+    print(f"logins:     {len(login_times)} ok, {len(errors)} failed in {elapsed:.2f}s"
+          f" ({len(login_times) / elapsed:.1f} logins/s, {args.concurrency} clients)")
+    if login_times:
+        print(f"login:      p50 {statistics.median(login_times) * 1000:>7.0f}ms"
+              f"  p95 {percentile(login_times, 0.95) * 1000:>7.0f}ms  max {max(login_times) * 1000:>7.0f}ms")
+    if probe_times:
+        print(f"probe:      p50 {statistics.median(probe_times) * 1000:>7.0f}ms"
+              f"  p95 {percentile(probe_times, 0.95) * 1000:>7.0f}ms  max {max(probe_times) * 1000:>7.0f}ms"
+              f"  ({len(probe_times)} requests to {args.probe})")
+    if errors:
+        print(f"first error: {errors[0]}")
+    try:
+        hasher = requests.get(f"{args.url}/api/admin/metrics").json().get('passwordHasher')
+        if hasher:
+            print(f"hasher:     maxWaiting {hasher['maxWaiting']}  avgWaitMs {hasher['avgWaitMs']:.0f}"
+                  f"  avgHashMs {hasher['avgHashMs']:.0f}  workers {hasher['workers']}  rounds {hasher['rounds']}")
+    except Exception:
+        pass
+    return 1 if errors else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
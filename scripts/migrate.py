@@ -0,0 +1,121 @@
+import argparse
+import json
+import os
+import sys
+import dotenv
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+dotenv.load_dotenv()
+
+
+def hot_queries():
+    """
+    The lookups the routes run per request, with sample parameters. Each one
+    has to be answered from an index: a sequential scan on any of these
+    tables means a missing index (or a query the index can't serve).
+    """
+    from backend.classes.data_access import LOAD_ACCOUNT, ACCOUNT_CONFLICT, DELETE_ACCOUNT, ISSUER_ENTROPY
+    return [
+        ("login", LOAD_ACCOUNT, ['alice']),
+        ("account conflict", ACCOUNT_CONFLICT, ['alice', 'alice', '0xabc']),
+        ("delete account", DELETE_ACCOUNT, ['alice']),
+        ("update role", "UPDATE accounts SET role=%s WHERE address=%s RETURNING username", ['V', '0xabc']),
+        ("accounts page", "SELECT address, username, role FROM accounts WHERE username > %s ORDER BY username LIMIT %s",
+         ['alice', 101]),
+        ("accounts page by role", "SELECT address, username, role FROM accounts WHERE role = %s AND username > %s"
+         " ORDER BY username LIMIT %s", ['H', 'alice', 101]),
+        ("accounts search", "SELECT address, username, role FROM accounts WHERE (username LIKE %s OR lower(address) LIKE %s)"
+         " ORDER BY username LIMIT %s", ['ali%', '0xab%', 101]),
+        ("issuer entropy", ISSUER_ENTROPY, ['0xabc']),
+        ("issuers page", "SELECT id, name FROM issuers WHERE id > %s ORDER BY id LIMIT %s", ['0xabc', 101]),
+        ("issuers search", "SELECT id, name FROM issuers WHERE (name LIKE %s OR lower(id) LIKE %s) ORDER BY id LIMIT %s",
+         ['Test%', '0xab%', 101]),
+        ("indexed credential", "SELECT issuer, holder, issued_at, data FROM indexed_credentials WHERE credential_hash = %s",
+         ['0x' + '00' * 32]),
+        ("holder credentials", "SELECT credential_hash, issuer, holder, issued_at, data FROM indexed_credentials"
+         " WHERE holder = %s ORDER BY block_number, log_index", ['0x' + '00' * 20]),
+    ]
+
+
+def scans(plan):
+    """(node type, relation) of every node in an EXPLAIN (FORMAT JSON) plan that reads a table"""
+    found = []
+    if 'Relation Name' in plan:
+        found.append((plan['Node Type'], plan['Relation Name']))
+    for child in plan.get('Plans', []):
+        found.extend(scans(child))
+    return found
+
+
+def explain(db_pool):
+    """
+    EXPLAIN every hot query and check it reads its tables through an index.
+
+    Sequential scans are priced out for the check: on a small (or empty)
+    table Postgres rightly prefers one anyway, this way it only picks one
+    when no index can answer the query.
+
+    Returns:
+        int: The number of queries that still need a sequential scan
+    """
+    queries = hot_queries()
+    failures = 0
+    with db_pool.connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("SET LOCAL enable_seqscan = off")
+            for name, query, params in queries:
+                cur.execute("EXPLAIN (FORMAT JSON) " + query, params)
+                plan = cur.fetchone()[0]
+                if isinstance(plan, str):
+                    plan = json.loads(plan)
+                nodes = scans(plan[0]['Plan'])
+                seq = [relation for node, relation in nodes if node == 'Seq Scan']
+                failures += bool(seq)
+                print(f"{'SEQ SCAN' if seq else 'ok':<9} {name:<22} " + ', '.join(f"{node} on {relation}" for node, relation in nodes))
+            # Nothing to keep, EXPLAIN without ANALYZE doesn't run the statements
+            conn.rollback()
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="migrate", description="apply the versioned schema migrations in"
+    " backend/migrations and check the route queries use index scans")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    subparsers.add_parser('status', help='list the migrations and whether each one was applied')
+    up = subparsers.add_parser('up', help='apply the pending migrations')
+    up.add_argument('--to', type=int, help='stop after this version')
+    subparsers.add_parser('explain', help='EXPLAIN the hot route queries, exits 1 if any needs a sequential scan')
+    args = parser.parse_args()
+
+    from backend.config import CONNECTION_STRING
+    from backend.classes.connection_pool import db_pool
+    from backend.classes.migrations import schema_migrator
+
+    db_pool.configure(CONNECTION_STRING, max_size=1)
+
+    try:
+        if args.command == 'status':
+            for row in schema_migrator.status():
+                applied_at = f" ({row['appliedAt']:%Y-%m-%d %H:%M})" if row['appliedAt'] else ''
+                print(f"{row['version']:04d} {row['name']:<32} {row['state']}{applied_at}")
+            return 0
+
+        if args.command == 'up':
+            applied = schema_migrator.migrate(args.to)
+            print(f"Applied {len(applied)} migration(s)" if applied else "Already up to date")
+            return 0
+
+        pending = [row for row in schema_migrator.status() if row['state'] != 'applied']
+        if pending:
+            print(f"Warning: {len(pending)} migration(s) not applied, run `up` first for a meaningful check")
+        failures = explain(db_pool)
+        print(f"{failures} of {len(hot_queries())} queries need a sequential scan" if failures
+              else f"All {len(hot_queries())} queries use indexes")
+        return 1 if failures else 0
+    except Exception as e:
+        print(f"Something went wrong: {e}")
+        return 1
+
+if __name__ == "__main__":
+    sys.exit(main())
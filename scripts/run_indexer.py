@@ -0,0 +1,53 @@
+import argparse
+import os
+import sys
+import dotenv
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+dotenv.load_dotenv()
+
+def main():
+    parser = argparse.ArgumentParser(prog="run_indexer", description="mirror CredentialStored and MerkleRootUpdated"
+    " events into Postgres so the read routes can answer from the local database")
+    parser.add_argument('-n', '--network', help='network from config.NETWORKS (defaults to $NETWORK), use local for a Hardhat node')
+    parser.add_argument('-c', '--confirmations', type=int, help='blocks to stay behind the head')
+    parser.add_argument('-b', '--batch-size', type=int, help='blocks per eth_getLogs call')
+    parser.add_argument('-s', '--start-block', type=int, help='first block to index when there is no checkpoint yet')
+    parser.add_argument('-p', '--poll-interval', type=float, default=5, help='seconds to wait when caught up')
+    parser.add_argument('--once', action='store_true', help='index until caught up, then exit')
+    args = parser.parse_args()
+
+    # backend.config picks the network at import time
+    if args.network:
+        os.environ['NETWORK'] = args.network
+
+    from backend.config import CONNECTION_STRING, DB_POOL_MAX_SIZE
+    from backend.classes.connection_pool import db_pool
+    from backend.classes.chain_indexer import chain_indexer
+
+    db_pool.configure(CONNECTION_STRING, max_size=DB_POOL_MAX_SIZE)
+    if args.confirmations is not None:
+        chain_indexer.confirmations = args.confirmations
+    if args.batch_size is not None:
+        chain_indexer.batch_size = args.batch_size
+    if args.start_block is not None:
+        chain_indexer.start_block = args.start_block
+
+    try:
+        if args.once:
+            chain_indexer.ensure_schema()
+            while chain_indexer.run_once():
+                pass
+            print(f"Caught up, checkpoint: {chain_indexer.checkpoint()}")
+        else:
+            chain_indexer.run(args.poll_interval)
+        return 0
+    except KeyboardInterrupt:
+        return 0
+    except Exception as e:
+        print(f"Something went wrong: {e}")
+        return 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,122 @@
+import argparse
+import os
+import sys
+import threading
+import uuid
+import dotenv
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+dotenv.load_dotenv()
+
+
+def race(calls):
+    """
+    Run every call in its own thread, all released at the same moment.
+    Returns:
+        list: 'created', the taken field for an AccountExists, or the error text
+    """
+    from backend.classes.data_access import AccountExists
+
+    barrier = threading.Barrier(len(calls))
+    results = [None] * len(calls)
+
+    def worker(i, call):
+        barrier.wait()
+        try:
+            call()
+            results[i] = 'created'
+        except AccountExists as e:
+            results[i] = e.field
+        except Exception as e:
+            results[i] = f'error: {e}'
+
+    threads = [threading.Thread(target=worker, args=(i, call)) for i, call in enumerate(calls)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def stored(where, value):
+    """How many accounts rows match `where`"""
+    from backend.classes.connection_pool import db_pool
+
+    with db_pool.connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(f"SELECT count(*) FROM accounts WHERE {where}", (value,))
+            return cur.fetchone()[0]
+
+
+def check(label, results, expected_field, rows):
+    """
+    Exactly one registration wins, every other one is told the right field
+    is taken, and the table holds exactly one row for the contested value
+    """
+    created = results.count('created')
+    conflicts = results.count(expected_field)
+    ok = created == 1 and conflicts == len(results) - 1 and rows == 1
+    print(f"{label}: {created} created, {conflicts} '{expected_field}' conflicts, "
+          f"{len(results) - created - conflicts} other, {rows} row(s) stored -> {'ok' if ok else 'FAILED'}")
+    for result in set(results) - {'created', expected_field}:
+        print(f"  unexpected: {result}")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="stress_account_registration", description="register the same username (and"
+    " the same address) from many threads at once against $CONNECTION_STRING and check exactly one account is created")
+    parser.add_argument('-t', '--threads', type=int, default=32, help='concurrent registrations per round')
+    parser.add_argument('-r', '--rounds', type=int, default=5, help='rounds of each race')
+    args = parser.parse_args()
+
+    from backend.config import CONNECTION_STRING
+    from backend.classes.connection_pool import db_pool
+    from backend.classes.data_access import create_account, delete_account
+    from backend.classes.migrations import schema_migrator
+
+    # One connection per thread so the inserts really do run at the same time
+    db_pool.configure(CONNECTION_STRING, max_size=args.threads)
+    # The unique indexes decide the races, migrating is a deploy step (scripts/migrate.py up)
+    try:
+        schema_migrator.require_current()
+    except Exception as e:
+        print(f"Something went wrong: {e}")
+        return 1
+
+    ok = True
+    created = []
+    try:
+        for round_number in range(args.rounds):
+            tag = uuid.uuid4().hex[:12]
+
+            # Same username, a different address each: the username index decides
+            username = f'stress-{tag}'
+            created.append(username)
+            results = race([
+                (lambda i=i: create_account(f'0xstress{tag}{i:04d}', username, 'not-a-hash', 'H'))
+                for i in range(args.threads)
+            ])
+            ok &= check(f"round {round_number + 1} same username", results, 'username',
+                        stored("username = %s", username))
+
+            # Same address (in different cases), a different username each
+            address = f'0xStress{tag}'
+            results = race([
+                (lambda i=i: create_account(address.upper() if i % 2 else address.lower(),
+                                            f'stress-{tag}-{i}', 'not-a-hash', 'H'))
+                for i in range(args.threads)
+            ])
+            created.extend(f'stress-{tag}-{i}' for i in range(args.threads))
+            ok &= check(f"round {round_number + 1} same address", results, 'address',
+                        stored("lower(address) = %s", address.lower()))
+    finally:
+        for username in created:
+            delete_account(username)
+
+    print("all rounds passed" if ok else "some rounds FAILED")
+    return 0 if ok else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
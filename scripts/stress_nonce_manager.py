@@ -0,0 +1,122 @@
+import argparse
+import os
+import sys
+import threading
+import time
+import dotenv
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+dotenv.load_dotenv()
+
+# Hardhat's first default account, only ever funded on a local node
+HARDHAT_KEY = '0xac0974bec39a17e36ba4a6b4d238ff944bacb478cbed5efcae784d7bf4f2ff80'
+
+
+class InjectedFailure(Exception):
+    """Raised on purpose before a send to leave a released nonce behind"""
+
+
+def stress(manager, w3, threads, per_thread, fail_every):
+    """
+    Send threads * per_thread zero value self transfers at once.
+
+    Every `fail_every`-th build raises before anything is sent, so the
+    manager has to hand that nonce out again or the later ones would stall.
+
+    Returns:
+        tuple: (transaction hashes, number of injected failures, seconds)
+    """
+    chain_id = w3.eth.chain_id
+    gas_price = w3.eth.gas_price
+    hashes = []
+    failures = []
+    errors = []
+    counter = [0]
+    lock = threading.Lock()
+
+    def build_tx(nonce):
+        with lock:
+            counter[0] += 1
+            fail = fail_every and counter[0] % fail_every == 0
+        if fail:
+            raise InjectedFailure(f"injected failure for nonce {nonce}")
+        return {
+            'from': manager.address,
+            'to': manager.address,
+            'value': 0,
+            'nonce': nonce,
+            'gas': 21000,
+            'gasPrice': gas_price,
+            'chainId': chain_id
+        }
+
+    def worker():
+        for _ in range(per_thread):
+            try:
+                tx_hash = manager.send_transaction(build_tx)
+            except InjectedFailure:
+                with lock:
+                    failures.append(1)
+                continue
+            except Exception as e:
+                with lock:
+                    errors.append(str(e))
+                continue
+            with lock:
+                hashes.append(tx_hash)
+
+    start = time.perf_counter()
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    for error in errors:
+        print(f"send error: {error}")
+    return hashes, len(failures), elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="stress_nonce_manager", description="send many transactions from concurrent"
+    " threads through the nonce manager and check every one of them is mined with a unique, gap free nonce")
+    parser.add_argument('-n', '--network', default='local', help='network from config.NETWORKS, use local for a Hardhat node')
+    parser.add_argument('-k', '--private-key', help='signer key (defaults to $PRIVATE_KEY, or the first Hardhat account on local)')
+    parser.add_argument('-t', '--threads', type=int, default=16, help='concurrent senders')
+    parser.add_argument('-p', '--per-thread', type=int, default=25, help='transactions per sender')
+    parser.add_argument('-f', '--fail-every', type=int, default=7, help='make every Nth build fail before sending (0 to disable)')
+    args = parser.parse_args()
+
+    # backend.config picks the network at import time
+    os.environ['NETWORK'] = args.network
+    from backend.config import w3
+    from backend.classes.nonce_manager import NonceManager
+
+    private_key = args.private_key or os.getenv('PRIVATE_KEY') or (HARDHAT_KEY if args.network == 'local' else None)
+    if not private_key:
+        print("No private key, pass --private-key or set PRIVATE_KEY")
+        return 1
+
+    manager = NonceManager(private_key)
+    first_nonce = w3.eth.get_transaction_count(manager.address, 'pending')
+    hashes, failures, elapsed = stress(manager, w3, args.threads, args.per_thread, args.fail_every)
+    print(f"sent {len(hashes)} transactions in {elapsed:.2f}s ({len(hashes) / elapsed:.1f} tx/s), {failures} injected failures")
+
+    nonces = []
+    for tx_hash in hashes:
+        receipt = w3.eth.wait_for_transaction_receipt(tx_hash, timeout=120)
+        if receipt.status != 1:
+            print(f"transaction {tx_hash.hex()} reverted")
+        nonces.append(w3.eth.get_transaction(tx_hash)['nonce'])
+
+    expected = list(range(first_nonce, first_nonce + len(hashes)))
+    final_nonce = w3.eth.get_transaction_count(manager.address)
+    ok = sorted(nonces) == expected and final_nonce == first_nonce + len(hashes)
+    print(f"nonces {first_nonce}-{final_nonce - 1} mined, unique and gap free: {ok}")
+    print(f"nonce manager: {manager.stats()}")
+    return 0 if ok else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
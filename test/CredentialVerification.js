@@ -0,0 +1,98 @@
+const { loadFixture } = require("@nomicfoundation/hardhat-toolbox/network-helpers");
+const { expect } = require("chai");
+
+describe("CredentialVerification", function () {
+  // Two registered issuers, so the proof has one sibling to check
+  async function deployFixture() {
+    const [admin, issuer, holder, otherHolder] = await ethers.getSigners();
+
+    const IssuerRegistry = await ethers.getContractFactory("IssuerRegistry");
+    const registry = await IssuerRegistry.deploy();
+
+    const CredentialVerification = await ethers.getContractFactory("CredentialVerification");
+    const verification = await CredentialVerification.deploy(registry.target);
+
+    const leaf = ethers.keccak256(ethers.toUtf8Bytes("0xissuer-signature"));
+    const sibling = ethers.keccak256(ethers.toUtf8Bytes("0xother-issuer-signature"));
+    const root = ethers.solidityPackedKeccak256(["bytes32", "bytes32"], [leaf, sibling]);
+    await registry.updateMerkleRoot(root);
+
+    const proof = [sibling];
+    const isLeft = [false];
+
+    function credential(n, holderAddress = holder.address) {
+      return {
+        credentialHash: ethers.keccak256(ethers.toUtf8Bytes(`diploma-${n}`)),
+        issuer: issuer.address,
+        holder: holderAddress,
+        issuedAt: 1700000000 + n,
+        data: `Test University Diploma ${n}`
+      };
+    }
+
+    return { registry, verification, leaf, proof, isLeft, credential, holder, otherHolder };
+  }
+
+  describe("storeCredentials", function () {
+    it("Should store every credential of the batch", async function () {
+      const { verification, leaf, proof, isLeft, credential, holder, otherHolder } = await loadFixture(deployFixture);
+      const batch = [credential(1), credential(2), credential(3, otherHolder.address)];
+
+      await verification.storeCredentials(batch, proof, isLeft, leaf);
+
+      for (const cred of batch) {
+        expect(await verification.verifyCredential(cred.credentialHash)).to.equal(true);
+      }
+      const stored = await verification.pullCredential(holder.address);
+      expect(stored.map((c) => c.credentialHash)).to.deep.equal([batch[0].credentialHash, batch[1].credentialHash]);
+      expect(stored[1].data).to.equal(batch[1].data);
+    });
+
+    it("Should emit CredentialStored for each credential", async function () {
+      const { verification, leaf, proof, isLeft, credential } = await loadFixture(deployFixture);
+      const batch = [credential(1), credential(2)];
+
+      const tx = verification.storeCredentials(batch, proof, isLeft, leaf);
+      for (const cred of batch) {
+        await expect(tx)
+          .to.emit(verification, "CredentialStored")
+          .withArgs(cred.credentialHash, cred.issuer, cred.holder, cred.issuedAt, cred.data);
+      }
+    });
+
+    it("Should skip credentials that already exist instead of reverting", async function () {
+      const { verification, leaf, proof, isLeft, credential, holder } = await loadFixture(deployFixture);
+      await verification.storeCredential(credential(1), proof, isLeft, leaf);
+
+      const tx = await verification.storeCredentials(
+        [credential(1), credential(2), credential(2)], proof, isLeft, leaf
+      );
+      const receipt = await tx.wait();
+
+      const events = receipt.logs.map((log) => verification.interface.parseLog(log));
+      expect(events.map((e) => e.args.credentialHash)).to.deep.equal([credential(2).credentialHash]);
+      expect((await verification.pullCredential(holder.address)).length).to.equal(2);
+    });
+
+    it("Should revert the whole batch if the issuer proof is invalid", async function () {
+      const { verification, proof, isLeft, credential } = await loadFixture(deployFixture);
+      const forged = ethers.keccak256(ethers.toUtf8Bytes("0xforged-signature"));
+
+      await expect(
+        verification.storeCredentials([credential(1), credential(2)], proof, isLeft, forged)
+      ).to.be.revertedWith("Invalid issuer: Merkle proof failed");
+      expect(await verification.verifyCredential(credential(1).credentialHash)).to.equal(false);
+    });
+  });
+
+  describe("storeCredential", function () {
+    it("Should still revert on a duplicate credential", async function () {
+      const { verification, leaf, proof, isLeft, credential } = await loadFixture(deployFixture);
+      await verification.storeCredential(credential(1), proof, isLeft, leaf);
+
+      await expect(
+        verification.storeCredential(credential(1), proof, isLeft, leaf)
+      ).to.be.revertedWith("Credential already exists");
+    });
+  });
+});